@@ -11,7 +11,7 @@ from PySide6.QtWidgets import (QFileDialog, QFileSystemModel, QMessageBox, QWidg
                                 QVBoxLayout)
 
 from PySide6.QtCore import (Slot, Signal, Qt, QTimer, QItemSelection, QFileInfo, QDir, QTextStream,
-                                QFile, QIODevice, QEvent, QUrl, QRandomGenerator, QSize, QThread, QJsonDocument)
+                                QFile, QIODevice, QEvent, QUrl, QRandomGenerator, QSize, QThread)
 from PySide6.QtMultimedia import (QCamera, QCameraDevice, QMediaCaptureSession, QMediaDevices, QMediaPlayer, QAudioOutput)
 from PySide6.QtNetwork import QNetworkAccessManager
 
@@ -28,9 +28,17 @@ from roster_feature import RosterFeature
 from monitor_preview import MonitorPreview
 import utilities
 from monitor_preview import SmartOverlayLabel
+from transitions import FrameCache, TRANSITION_TYPES
+from playlist_format import read_playlist, write_playlist, entry_for_path, KIND_SLIDES, PlaylistDurationRole
+from media_metadata import MediaMetadataService
+from thumbnail_cache import ThumbnailCache, ThumbnailDelegate, path_from_user_role
 
 import ImproTronIcons
 from osc_server import OSCServer
+from cue_latency import cue_tracer
+from osc_feedback import (OSCFeedback, STATE_SCORE_LEFT, STATE_SCORE_RIGHT, STATE_TIMER, STATE_MUSIC_POSITION,
+                          STATE_MUSIC_TRACK, STATE_MUSIC_ONSETS, MAX_ONSETS, STATE_SFX, STATE_HOT_BUTTON, STATE_OSC_INGRESS,
+                          STATE_OSC_ENDPOINT)
 
 logger = logging.getLogger(__name__)
 
@@ -69,8 +77,10 @@ class ImproTronControlBoard(QWidget):
         self.videoPlayer.errorOccurred.connect(self.videoPlayer_handle_error)
 
         # Create Screens and relocate. Main done second so it is on top
-        self.mainDisplay = ImproTron("Main")
-        self.auxiliaryDisplay = ImproTron("Auxiliary")
+        # Both displays share one cache of pre-scaled frames
+        self.frame_cache = FrameCache()
+        self.mainDisplay = ImproTron("Main", self.frame_cache)
+        self.auxiliaryDisplay = ImproTron("Auxiliary", self.frame_cache)
         logger.info("Displays created")
 
         self.auxiliaryDisplay.restore()
@@ -227,6 +237,29 @@ class ImproTronControlBoard(QWidget):
         self. currentSlide = 0
         self.slideShowTimer.timeout.connect(self.nextSlide)
 
+        # Video lengths, resolutions and posters are extracted in the background as videos are added to the slides.
+        # Extraction pauses while a video is playing on a display.
+        self.media_metadata = MediaMetadataService(self._settings.get_config_dir(), self)
+        self.media_metadata.metadataReady.connect(self.annotateSlideVideos)
+        self.videoPlayer.playbackStateChanged.connect(
+            lambda state: self.media_metadata.set_paused(state == QMediaPlayer.PlaybackState.PlayingState))
+
+        # Items are filled in after insertion, so annotate once the current batch of additions is complete
+        self.slideAnnotateTimer = QTimer(self)
+        self.slideAnnotateTimer.setSingleShot(True)
+        self.slideAnnotateTimer.timeout.connect(self.annotateSlideVideos)
+        self.ui.slideListLW.model().rowsInserted.connect(self.slideAnnotateTimer.start)
+
+        # Thumbnails in the media search results, the slide list and the slide file tree. Only painted rows fetch one.
+        self.thumbnail_cache = ThumbnailCache(self._settings.get_config_dir(), self.media_metadata,
+                                              self.media_features.isVideo, self)
+        self.ui.mediaSearchResultsLV.setItemDelegate(
+            ThumbnailDelegate(self.thumbnail_cache, path_from_user_role, self.ui.mediaSearchResultsLV))
+        self.ui.slideListLW.setItemDelegate(
+            ThumbnailDelegate(self.thumbnail_cache, path_from_user_role, self.ui.slideListLW))
+        self.ui.slideShowFilesTreeView.setItemDelegateForColumn(0,
+            ThumbnailDelegate(self.thumbnail_cache, self.treeThumbnailPath, self.ui.slideShowFilesTreeView))
+
         # Async thread set up
         self.slideLoaderThread = SlideLoaderThread()
 
@@ -296,10 +329,12 @@ class ImproTronControlBoard(QWidget):
         self.ui.loadVideoPB.clicked.connect(self.getVideoFile)
 
         # OSC Support
+        # OSC presses and score changes look widgets up by name; index them once rather than search per message
+        self.widget_registry = utilities.WidgetRegistry(self.ui, (QPushButton, QDoubleSpinBox))
         _osc_port = self._settings.get_osc_port()
         self.ui.oscPortSB.setValue(_osc_port)
-        self.oscServer = OSCServer(listen_port = _osc_port)
-        logger.info(f"OSC Client/Server initialized on port {_osc_port}.")
+        self.oscServer = OSCServer(listen_port = _osc_port, endpoints = self._settings.get_osc_endpoints())
+        logger.info(f"OSC Client/Server initialized on {', '.join(str(endpoint) for endpoint in self.oscServer.endpoints)}.")
         self.ui.oscPortSB.valueChanged.connect(self.oscPortChanged)
 
         # Connect the OSC Server custom signals to a slot
@@ -313,7 +348,10 @@ class ImproTronControlBoard(QWidget):
         self.oscServer.sfxPlayAction.connect(self.media_features.onOSCServerSFXPlayAction)
         self.oscServer.stopAllSFXSignal.connect(self.media_features.onOSCServerSFXStopAllAction)
         self.oscServer.fadeAction.connect(self.media_features.onOSCServerFadeAction)
+        self.oscServer.crossfadeAction.connect(self.media_features.onOSCServerCrossfadeAction)
+        self.oscServer.duckAction.connect(self.media_features.onOSCServerDuckAction)
         self.oscServer.seekAction.connect(self.media_features.onOSCServerSeekAction)
+        cue_tracer.register_osc_routes(self.oscServer, self._settings.get_config_dir())
 
         # Preferences
         self.ui.improtronUnlockPB.clicked.connect(self.improtronUnlock)
@@ -325,6 +363,16 @@ class ImproTronControlBoard(QWidget):
         self.ui.graphicOfficialPB.clicked.connect(self.pick_official_graphic)
         self.ui.graphicOfficialPB.setText(self._settings.get_official_team_name()+" Graphic")
 
+        # Display transitions
+        self.ui.transitionCB.addItems([kind.capitalize() for kind in TRANSITION_TYPES])
+        transition_kind = self._settings.get_transition_type()
+        if transition_kind in TRANSITION_TYPES:
+            self.ui.transitionCB.setCurrentIndex(TRANSITION_TYPES.index(transition_kind))
+        self.ui.transitionMsSB.setValue(self._settings.get_transition_duration())
+        self.apply_transition_settings()
+        self.ui.transitionCB.currentIndexChanged.connect(self.transitionChanged)
+        self.ui.transitionMsSB.valueChanged.connect(self.transitionChanged)
+
         self.ui.startupImagePB.clicked.connect(self.startupImage)
         self.ui.promosDirPB.clicked.connect(self.selectPromosDirectory)
         self.ui.aboutPB.clicked.connect(self.about)
@@ -343,8 +391,9 @@ class ImproTronControlBoard(QWidget):
             self.hot_buttons.append(hotButton)
 
             # Custom Signals allows the HotButtonHandler to leave screen control encapulated in the control panel
-            hotButton.mainMediaShow.connect(self.showMediaOnMain)
-            hotButton.auxMediaShow.connect(self.showMediaOnAux)
+            hotButton.mainMediaShow.connect(self.showHotButtonOnMain)
+            hotButton.auxMediaShow.connect(self.showHotButtonOnAux)
+            hotButton.imageChanged.connect(self.prewarmHotButtons)
         logger.info("Hot buttons initialized.")
 
 
@@ -356,12 +405,17 @@ class ImproTronControlBoard(QWidget):
 
             for button in range(self.ui.hotButtonHL.count()):
                 self.hot_buttons[button].load(button_data)
+            self.prewarmHotButtons()
 
         # Set a slot for the clear, load and save buttons
         self.ui.hotButtonClearPB.clicked.connect(self.clearHotButtonsClicked)
         self.ui.hotButtonLoadPB.clicked.connect(self.loadHotButtonsClicked)
         self.ui.hotButtonSavePB.clicked.connect(self.saveHotButtonsClicked)
 
+        # OSC feedback lets controllers query and subscribe to show state; wired last so every source exists
+        self.oscFeedback = OSCFeedback(self.oscServer, self)
+        self.connectOSCFeedback()
+
         # Set up an event filter to handle the orderly shutdown of the app.
         self.ui.installEventFilter(self)
 
@@ -390,6 +444,9 @@ class ImproTronControlBoard(QWidget):
         self.mainDisplay.shutdown()
         self.auxiliaryDisplay.shutdown()
         self.oscServer.disconnectOSCServer()
+        cue_tracer.save()
+        self.media_features.shutdown_audio()
+        self.media_metadata.shutdown()
         self.thread.quit()
         self.ui.removeEventFilter(self)
         self.deleteLater()
@@ -402,15 +459,37 @@ class ImproTronControlBoard(QWidget):
             logger.warning(f"Missing Media File on Main: {file_name}")
             return
 
+        # A cue dispatched from OSC is timed through to the display's first repaint
+        trace = cue_tracer.claim()
+        if trace is not None:
+            self.mainDisplay.begin_latency_probe(trace.label, trace)
+
         self.mainDisplay.show_file(file_name)
         self.main_preview.set_background(file_name)
 
+    # Hot buttons time the push from the click to the first repaint of the display
+    @Slot(str)
+    def showHotButtonOnMain(self, file_name):
+        if file_name and QFileInfo.exists(file_name):
+            self.mainDisplay.begin_latency_probe("Hot button")
+        self.showMediaOnMain(file_name)
+
+    @Slot(str)
+    def showHotButtonOnAux(self, file_name):
+        if file_name and QFileInfo.exists(file_name):
+            self.auxiliaryDisplay.begin_latency_probe("Hot button")
+        self.showMediaOnAux(file_name)
+
     # Note: This is both a local call but a slot for images emitted from the media features
     @Slot(str)
     def showMediaOnAux(self, file_name):
         if not file_name or not QFileInfo.exists(file_name):
             return
 
+        trace = cue_tracer.claim()
+        if trace is not None:
+            self.auxiliaryDisplay.begin_latency_probe(trace.label, trace)
+
         self.auxiliaryDisplay.show_file(file_name)
         self.aux_preview.set_background(file_name)
 
@@ -544,6 +623,18 @@ class ImproTronControlBoard(QWidget):
     def oscPortChanged(self, value):
         self._settings.set_osc_port(value)
 
+    @Slot()
+    def transitionChanged(self):
+        self._settings.set_transition_type(TRANSITION_TYPES[self.ui.transitionCB.currentIndex()])
+        self._settings.set_transition_duration(self.ui.transitionMsSB.value())
+        self.apply_transition_settings()
+
+    def apply_transition_settings(self):
+        kind = self._settings.get_transition_type()
+        duration = self._settings.get_transition_duration()
+        self.mainDisplay.set_transition(kind, duration)
+        self.auxiliaryDisplay.set_transition(kind, duration)
+
     # Slideshow Management
     @Slot(int)
     def slideShowSecondChanged(self, value):
@@ -596,6 +687,31 @@ class ImproTronControlBoard(QWidget):
             font.setPointSize(12)
             item.setFont(font)
 
+    # Folders and the size/date columns of the slide file tree have no thumbnail
+    def treeThumbnailPath(self, index):
+        if index.column() != 0 or self.mediaModel.isDir(index):
+            return ""
+        return self.mediaModel.filePath(index)
+
+    # Give video slides their known length and resolution, queueing extraction for any not yet examined
+    @Slot()
+    def annotateSlideVideos(self):
+        for slide in range(self.ui.slideListLW.count()):
+            item = self.ui.slideListLW.item(slide)
+            file_info = item.data(Qt.UserRole)
+            if file_info is None or not self.media_features.isVideo(file_info.absoluteFilePath()):
+                continue
+
+            video = self.media_metadata.metadata(file_info.absoluteFilePath())
+            if video is None:
+                self.media_metadata.request(file_info.absoluteFilePath())
+                continue
+
+            if video.duration_ms > 0:
+                item.setData(PlaylistDurationRole, video.duration_ms)
+                minutes, seconds = divmod(video.duration_ms // 1000, 60)
+                item.setToolTip(f"{video.width}x{video.height}  {minutes}:{seconds:02d}")
+
     @Slot()
     def slideMoveUp(self):
         slideRow = self.ui.slideListLW.currentRow()
@@ -619,45 +735,36 @@ class ImproTronControlBoard(QWidget):
         self.ui.slidePreviewLBL.blackout()
         self.ui.slideListLW.takeItem(self.ui.slideListLW.row(self.ui.slideListLW.currentItem()))
 
-    # Loads a slideshow sequence from a JSON file and populates the list widget.
+    # Loads a slideshow sequence (binary playlist or legacy JSON) and populates the list widget.
     def loadSlides(self, file_name):
         if not file_name:
             return
 
-        # 1. Open the file using Qt's QFile
-        file = QFile(file_name)
-        if not file.open(QIODevice.ReadOnly):
-            # Optional: Add logging here if the file fails to open
+        entries = read_playlist(file_name)
+        if not entries:
+            logger.warning(f"Slide Show: No slides loaded from {file_name}")
             return
 
-        # 2. Parse the JSON data into a native Python dictionary
-        raw_data = file.readAll()
-        file.close()
-
-        doc = QJsonDocument.fromJson(raw_data)
-        slideshow_data = doc.toVariant()  # Converts JSON object to Python dict
-
-        if isinstance(slideshow_data, dict):
-            # Clear existing slides before loading new ones
-            self.ui.slideListLW.clear()
+        # Clear existing slides before loading new ones
+        self.ui.slideListLW.clear()
 
-            # 3. Iterate through the dictionary items
-            # Sorting ensures that slides appear in the intended order (e.g., slide0, slide1)
-            for key in sorted(slideshow_data.keys()):
-                path = slideshow_data[key]
-                if path:
-                    file_info = QFileInfo(path)
+        for entry in entries:
+            if not entry.path:
+                continue
+            file_info = QFileInfo(entry.path)
 
-                    # 4. Create standard QListWidgetItem
-                    item = QListWidgetItem(file_info.fileName(), self.ui.slideListLW)
+            # Create standard QListWidgetItem and store the QFileInfo in UserRole
+            item = QListWidgetItem(file_info.fileName(), self.ui.slideListLW)
+            item.setData(Qt.UserRole, file_info)
 
-                    # 5. Store the QFileInfo in UserRole
-                    item.setData(Qt.UserRole, file_info)
+            # A video length saved with the playlist lets the slide timer be set before playback starts
+            if entry.duration_ms > 0 and entry.is_current():
+                item.setData(PlaylistDurationRole, entry.duration_ms)
 
-                    # 6. Apply standard styling
-                    font = item.font()
-                    font.setPointSize(12)
-                    item.setFont(font)
+            # Apply standard styling
+            font = item.font()
+            font.setPointSize(12)
+            item.setFont(font)
 
     @Slot()
     def loadSlideShow(self):
@@ -681,19 +788,18 @@ class ImproTronControlBoard(QWidget):
                                    self._settings.get_config_dir(),
                                    "Slide Shows (*.ssh)")
         if len(file_name[0]) > 0:
-            slide_data = {}
+            entries = []
             for slide in range(self.ui.slideListLW.count()):
-                slideName = "slide"+str(slide)
+                item = self.ui.slideListLW.item(slide)
                 # Extract the QFileInfo from the item's UserRole
-                file_info = self.ui.slideListLW.item(slide).data(Qt.UserRole)
+                path = item.data(Qt.UserRole).absoluteFilePath()
+                video = self.media_metadata.metadata(path)
+                entries.append(entry_for_path(path, self.media_features.media_type(path),
+                                              duration_ms = item.data(PlaylistDurationRole) or 0,
+                                              width = video.width if video else 0,
+                                              height = video.height if video else 0))
 
-                # Assign the absolute path string to your dictionary
-                slide_data[slideName] = file_info.absoluteFilePath()
-
-            # Write the JSON string to a file
-            with open(file_name[0], 'w', encoding='utf8') as json_file:
-                json.dump(slide_data, json_file, indent=2)
-                json_file.close()
+            write_playlist(file_name[0], KIND_SLIDES, entries)
 
     @Slot()
     def clearSlideShow(self):
@@ -803,10 +909,13 @@ class ImproTronControlBoard(QWidget):
                 self.videoPlayer.setVideoOutput(self.mainDisplay.showVideo())
                 self.videoPlayer.setPosition(0)
 
-                # This is an attempt to handle a situation where a slide show has one video
-                # The media player loads the same video with the same length and so never triggers
+                # Prefer the length saved with the playlist. Otherwise handle a slide show with one video:
+                # the media player loads the same video with the same length and so never triggers
                 # an event to change the duration for the slide show.
-                if self.last_media_duration > 0:
+                known_duration = self.ui.slideListLW.currentItem().data(PlaylistDurationRole)
+                if known_duration:
+                    self.slideShowTimer.setInterval(known_duration + 100)
+                elif self.last_media_duration > 0:
                     self.slideShowTimer.setInterval(self.last_media_duration)
 
                 self.videoPlayer.play()
@@ -1098,6 +1207,14 @@ class ImproTronControlBoard(QWidget):
 
             for button in range(self.ui.hotButtonHL.count()):
                 self.hot_buttons[button].load(button_data)
+            self.prewarmHotButtons()
+
+    # Decode and pin every hot button image for both displays so a click is a pixmap swap
+    @Slot()
+    def prewarmHotButtons(self):
+        hot_files = [hot_button.image_file() for hot_button in self.hot_buttons]
+        self.mainDisplay.prewarm_hot_images(hot_files)
+        self.auxiliaryDisplay.prewarm_hot_images(hot_files)
 
     @Slot()
     def saveHotButtonsClicked(self):
@@ -1276,6 +1393,56 @@ class ImproTronControlBoard(QWidget):
     def set_sound_volume(self, value):
         self.videoAudioOutput.setVolume(value/self.ui.soundVolumeSL.maximum())
 
+    # Publish the state OSC controllers can query or subscribe to, starting with the current values
+    def connectOSCFeedback(self):
+        feedback = self.oscFeedback
+
+        self.ui.teamScoreLeft.valueChanged.connect(lambda value: feedback.publish(STATE_SCORE_LEFT, value))
+        self.ui.teamScoreRight.valueChanged.connect(lambda value: feedback.publish(STATE_SCORE_RIGHT, value))
+        feedback.publish(STATE_SCORE_LEFT, self.ui.teamScoreLeft.value())
+        feedback.publish(STATE_SCORE_RIGHT, self.ui.teamScoreRight.value())
+
+        self.mainDisplay.timerChanged.connect(lambda text, seconds: feedback.publish(STATE_TIMER, text, seconds))
+        feedback.publish(STATE_TIMER, "00:00:00", 0)
+
+        self.media_features.musicProgress.connect(self.publishMusicProgress)
+        self.media_features.musicTrackChanged.connect(
+            lambda title, artist: feedback.publish(STATE_MUSIC_TRACK, title, artist))
+        self.media_features.musicOnsetsChanged.connect(
+            lambda onsets: feedback.publish(STATE_MUSIC_ONSETS, *onsets[:MAX_ONSETS]))
+
+        self.media_features.sfxStateChanged.connect(
+            lambda number, label, playing: feedback.publish(STATE_SFX.format(number), label, playing))
+        for number, sfx in enumerate(self.media_features.sfx_buttons, start=1):
+            feedback.publish(STATE_SFX.format(number), sfx.label(), sfx.is_playing())
+
+        for hotButton in self.hot_buttons:
+            address = STATE_HOT_BUTTON.format(hotButton.button_number)
+            hotButton.hot_button_title.textChanged.connect(lambda text, address=address: feedback.publish(address, text))
+            feedback.publish(address, hotButton.hot_button_title.text())
+
+        # OSC ingress queue health, so drops show up on whatever is watching the show network
+        self.oscStatsTimer = QTimer(self)
+        self.oscStatsTimer.setInterval(2000)
+        self.oscStatsTimer.timeout.connect(self.publishOSCIngressStats)
+        self.oscStatsTimer.start()
+
+    # Position updates arrive several times a second; subscribers receive them coalesced at their own rate
+    @Slot(int, int)
+    def publishMusicProgress(self, position, duration):
+        remaining_ms = max(0, duration - position)
+        self.oscFeedback.publish(STATE_MUSIC_POSITION, round(position / 1000, 1), round(remaining_ms / 1000, 1),
+                                 f"{remaining_ms // 60000:02d}:{(remaining_ms // 1000) % 60:02d}")
+
+    @Slot()
+    def publishOSCIngressStats(self):
+        stats = self.oscServer.ingress_stats()
+        self.oscFeedback.publish(STATE_OSC_INGRESS, stats["depth"], stats["max_depth"], stats["received"],
+                                 stats["coalesced"], stats["dropped"], stats["parse_errors"])
+        for index, endpoint in enumerate(self.oscServer.endpoint_stats(), start=1):
+            self.oscFeedback.publish(STATE_OSC_ENDPOINT.format(index), endpoint["endpoint"], endpoint["packets"],
+                                     round(endpoint["rate"], 1), endpoint["busiest"], round(endpoint["busiest_rate"], 1))
+
     # OSC Server message handlers
     @Slot()
     def connectOSCServer(self):
@@ -1284,7 +1451,7 @@ class ImproTronControlBoard(QWidget):
     # Handle a request to click a button
     @Slot(str)
     def onOSCServerButtonAction(self, buttonID):
-        button = utilities.findWidget(self.ui, QPushButton, buttonID)
+        button = self.widget_registry.find(QPushButton, buttonID)
         if button != None:
             button.click()
         else:
@@ -1293,7 +1460,7 @@ class ImproTronControlBoard(QWidget):
     # Handle a request to increment or reset a QSpinbox like that used for scoring
     @Slot(str, int)
     def onOSCServerSpinBoxAction(self, buttonID, changeValue):
-        spinBox = utilities.findWidget(self.ui, QDoubleSpinBox, buttonID)
+        spinBox = self.widget_registry.find(QDoubleSpinBox, buttonID)
         if spinBox != None:
             if changeValue == 0:
                 spinBox.setValue(0.0)
@@ -1,21 +1,29 @@
 # The display is a container for all the possible features that can be displayed
 import logging
+from collections import deque
 
 from PySide6.QtWidgets import QPushButton, QLineEdit, QStyle, QApplication, QMainWindow, QLabel, QGraphicsDropShadowEffect
-from PySide6.QtCore import Slot, Signal, Qt, QUrl, QObject, QEvent, QVariantAnimation, QEasingCurve, QFileInfo
-from PySide6.QtGui import QMovie, QGuiApplication, QImageReader, QIcon, QColor, QFont, QPalette
+from PySide6.QtCore import Slot, Signal, Qt, QUrl, QObject, QEvent, QFileInfo, QTimer, QElapsedTimer
+from PySide6.QtGui import QMovie, QGuiApplication, QImageReader, QIcon, QImage, QColor, QFont, QPalette, QPixmap
 from PySide6.QtMultimedia import QSoundEffect
 
 import utilities
 from Timer import CountdownTimer
 from monitor_preview import SmartOverlayLabel
+from transitions import (TransitionCompositor, TransitionOverlay, FrameCache, FramePrewarmer, TRANSITION_CUT, TRANSITION_FADE,
+                         is_static_image)
 from ui_ImproTron import Ui_ImproTron
+from cue_latency import cue_tracer
+from fade_engine import CURVE_OUT_QUAD
 
 logger = logging.getLogger(__name__)
 
 # Class to handle display on a separate monitor
 class ImproTron(QMainWindow):
-    def __init__(self, name, parent=None):
+    cueLatency = Signal(str, float) # Cue label and milliseconds from the cue to the first repaint showing it
+    timerChanged = Signal(str, int) # Countdown "hh:mm:ss" and seconds remaining
+
+    def __init__(self, name, frame_cache=None, parent=None):
         super(ImproTron, self).__init__()
 
         self._screen_number = 0
@@ -90,15 +98,49 @@ class ImproTron(QMainWindow):
             shadow.setOffset(0, 6)
             label.setGraphicsEffect(shadow)
 
+        # Transitions are composited over the stacked widget so a push blends into the new content
+        # rather than flashing through black. Pre-scaled frames may be shared between displays.
+        self._frame_cache = frame_cache if frame_cache is not None else FrameCache()
+        self._transition_kind = TRANSITION_FADE
+        self._transition_ms = 300
+        self._compositor = TransitionCompositor(parent=self)
+        self._transition_overlay = TransitionOverlay(self._compositor, self.ui.centralwidget)
+        self._grabbing = False
+
+        # Hot button images are decoded off the GUI thread, pinned in the frame cache and kept as ready pixmaps.
+        # A resize or stretch change re-warms them at the new size once the layout settles.
+        self._prewarmer = FramePrewarmer(self._frame_cache, self)
+        self._prewarmer.frameWarmed.connect(self._on_frame_warmed)
+        self._hot_files = []
+        self._hot_keys = set()
+        self._hot_pixmaps = {}
+        self._prewarm_timer = QTimer(self)
+        self._prewarm_timer.setSingleShot(True)
+        self._prewarm_timer.setInterval(250)
+        self._prewarm_timer.timeout.connect(lambda: self.prewarm_hot_images(self._hot_files))
+
+        # Click to pixel latency probe. The first frame the audience sees after a cue ends it: the display's
+        # repaint, or the transition's first composed frame when one covers the display.
+        self._latency_clock = QElapsedTimer()
+        self._latency_label = ""
+        self._latency_trace = None
+        self.cue_latencies_ms = deque(maxlen=100)
+        self.ui.textDisplay.framePainted.connect(self._on_display_painted)
+        self._transition_overlay.framePainted.connect(self._on_frame_painted)
+
         # Force a score update to force a font scaling
         self.updateScores(0.0, 0.0)
 
         # Countdown Timer Passthrough controls
         self._timer = CountdownTimer(self._display_name+" Timer")
+        self._timer.timeChanged.connect(self.timerChanged)
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.repositionLogo()
+        self._transition_overlay.setGeometry(self.ui.stackedWidget.geometry())
+        if self._hot_files:
+            self._prewarm_timer.start()
 
     def repositionLogo(self):
         if not self.logoLabel.isVisible():
@@ -172,6 +214,86 @@ class ImproTron(QMainWindow):
         self.ui.rightTeamLabel.setStyleSheet(name_s)
         self.ui.rightScoreLCD.setStyleSheet(score_s)
 
+    # Select the transition used when new content is pushed to the display
+    def set_transition(self, kind: str, duration_ms: int):
+        self._transition_kind = kind
+        self._transition_ms = duration_ms
+
+    # Snapshot what is on screen before new content replaces it. Returns None when no transition will run.
+    def _begin_transition(self):
+        if self._transition_kind == TRANSITION_CUT or self._transition_ms <= 0 or not self.isVisible():
+            return None
+
+        # Mid transition the overlay is what the audience sees, so blend on from there
+        if self._compositor.is_active():
+            return self._compositor.current_frame().copy()
+
+        return self._grab()
+
+    # Blend from the snapshot to the freshly rendered content
+    def _end_transition(self, from_frame):
+        if from_frame is None:
+            return
+
+        self._transition_overlay.setGeometry(self.ui.stackedWidget.geometry())
+        to_frame = self._grab()
+        self._compositor.start(from_frame, to_frame, self._transition_kind, self._transition_ms)
+
+    # Grabbing renders the display off screen, which is not a frame the audience sees
+    def _grab(self) -> QImage:
+        self._grabbing = True
+        try:
+            return self.ui.stackedWidget.grab().toImage()
+        finally:
+            self._grabbing = False
+
+    # Decode and pin the hot button images at this display's size so a push never waits on a decode
+    def prewarm_hot_images(self, file_names):
+        self._hot_files = list(file_names)
+        display = self.ui.textDisplay
+        self._hot_keys = self._prewarmer.prewarm(self._hot_files, display.size(), display.stretch)
+
+        # Drop pixmaps for images no longer on a hot button or warmed for an old size
+        for key in list(self._hot_pixmaps.keys()):
+            if key not in self._hot_keys:
+                del self._hot_pixmaps[key]
+
+    # Pixmaps must be created on the GUI thread, so convert once here rather than on every push
+    @Slot(object)
+    def _on_frame_warmed(self, key):
+        if key not in self._hot_keys or key in self._hot_pixmaps:
+            return
+
+        image = self._frame_cache.get(key)
+        if image is not None and not image.isNull():
+            self._hot_pixmaps[key] = QPixmap.fromImage(image)
+
+    # Start timing a cue; the next repaint of this display reports how long it took to reach the screen.
+    # An OSC cue passes its trace so the stages are recorded from the packet's arrival.
+    def begin_latency_probe(self, label: str, trace=None):
+        self._latency_label = label
+        self._latency_trace = trace if trace is not None else cue_tracer.start(label)
+        self._latency_clock.start()
+
+    @Slot()
+    def _on_display_painted(self):
+        if self._grabbing or self._compositor.is_active():
+            return
+        self._on_frame_painted()
+
+    @Slot()
+    def _on_frame_painted(self):
+        if not self._latency_clock.isValid():
+            return
+
+        latency_ms = self._latency_clock.nsecsElapsed() / 1_000_000
+        self._latency_clock.invalidate()
+        cue_tracer.finish(self._latency_trace, "paint")
+        self._latency_trace = None
+        self.cue_latencies_ms.append(latency_ms)
+        logger.debug(f"{self._display_name}: {self._latency_label} to pixel {latency_ms:.1f} ms")
+        self.cueLatency.emit(self._latency_label, latency_ms)
+
     # Clear the display to black
     def blackout(self):
         # Let SmartOverlayLabel handle its internal cleanup/reset
@@ -181,6 +303,8 @@ class ImproTron(QMainWindow):
     # Pass through to set stretch mode on the display
     def set_stretch(self, enable: bool):
         self.ui.textDisplay.set_stretch(enable)
+        if self._hot_files:
+            self._prewarm_timer.start()
 
     # Show a background then overlay text using a font and ratio to the display
     def show_player(
@@ -192,9 +316,11 @@ class ImproTron(QMainWindow):
         scale: float,
         textColor: QColor = QColor(Qt.GlobalColor.white),
     ):
+        from_frame = self._begin_transition()
         self.blackout()
         if not background_path or not QFileInfo.exists(background_path):
             logger.warning(f"Invalid player background path: {background_path}")
+            self._end_transition(from_frame)
             return
 
         self.ui.textDisplay.set_player_overlay(
@@ -206,6 +332,7 @@ class ImproTron(QMainWindow):
             color=textColor,
         )
         self.ui.stackedWidget.setCurrentWidget(self.ui.displayText)
+        self._end_transition(from_frame)
 
     # Dynamically handles showing game text over either a static image
     # or an animated GIF on the main/auxiliary display windows.
@@ -217,9 +344,11 @@ class ImproTron(QMainWindow):
         scale: float,
         textColor: QColor = QColor(Qt.GlobalColor.white),
     ):
+        from_frame = self._begin_transition()
         self.blackout()
         if not background_path or not QFileInfo.exists(background_path):
             logger.warning(f"Invalid game background path: {background_path}")
+            self._end_transition(from_frame)
             return
 
         self.ui.textDisplay.set_text_overlay(
@@ -230,41 +359,74 @@ class ImproTron(QMainWindow):
             color=textColor,
         )
         self.ui.stackedWidget.setCurrentWidget(self.ui.displayText)
+        self._end_transition(from_frame)
 
     # Show Text on the display
     def show_text(self, text_msg, font=None, color = QColor(Qt.GlobalColor.black)):
+        from_frame = self._begin_transition()
         self.blackout()
         self.ui.textDisplay.set_plain_text(text = text_msg, font = font, background_color = color)
+        self._end_transition(from_frame)
 
     # Show an image on the display
     def show_image(self, image):
+        from_frame = self._begin_transition()
         self.blackout() # Clears the display
         self.ui.textDisplay.set_background_image(image) # Clears the display
+        self._end_transition(from_frame)
 
     # Show an image on the from the clipboard
     def paste_image(self):
+        from_frame = self._begin_transition()
         self.blackout() # Clears the display and sets it to the current tab
         pixmap = QGuiApplication.clipboard().pixmap()
         if pixmap != None:
             self.ui.textDisplay.set_background_pixmap(pixmap)
+        self._end_transition(from_frame)
 
     # Show an animated image (GIF/WEBP) directly from an in-memory byte buffer
     def show_animated_buffer(self, raw_data=True):
+        from_frame = self._begin_transition()
         self.blackout()  # Resets assets and clears active overlays
         if raw_data:
             self.ui.textDisplay.set_animated_buffer(raw_data)
             self.ui.stackedWidget.setCurrentWidget(self.ui.displayText)
+        self._end_transition(from_frame)
 
     # Show an pixel map on the from a drop event on the preview
     def show_pixmap(self, pixmap):
+        from_frame = self._begin_transition()
         self.blackout() # Clears the display
         if pixmap != None:
             self.ui.textDisplay.set_background_pixmap(pixmap)
+        self._end_transition(from_frame)
 
-    # Show a static or animated image on the display
+    # Show a static or animated image on the display. Static images come from the frame cache already
+    # scaled for the display, so repeated pushes (slide show loops) skip the decode entirely. Hot button
+    # images skip the pixmap conversion as well.
+    # A static image is decoded before the transition snapshot is taken, so the trace's decode stage is marked
+    # before anything can repaint and finish it.
     def show_file(self, file_name):
+        display = self.ui.textDisplay
+        scaled = None
+        if is_static_image(file_name) and not display.size().isEmpty():
+            scaled = self._hot_pixmaps.get(FrameCache.key(file_name, display.size(), display.stretch))
+            if scaled is None:
+                scaled = self._frame_cache.scaled_image(file_name, display.size(), display.stretch)
+            self._mark_decoded()
+
+        from_frame = self._begin_transition()
         self.blackout() # Clears the display
-        self.ui.textDisplay.set_background(file_name)
+        if scaled is not None:
+            display.set_background_scaled(file_name, scaled)
+        else:
+            display.set_background(file_name)
+            self._mark_decoded()
+        self._end_transition(from_frame)
+
+    def _mark_decoded(self):
+        if self._latency_trace is not None:
+            cue_tracer.mark("decode", self._latency_trace)
 
     # Find the optimal width for the team name
     def find_optimal_team_font_size(self, nameLabel):
@@ -362,6 +524,7 @@ class ImproTron(QMainWindow):
 
     # Flip to the video player and return the widget to connect the video play to
     def showVideo(self):
+        self._compositor.stop() # Video surfaces render natively, so never leave a blend over them
         self.blackout() # Reset and stop any playing assests
         self.ui.stackedWidget.setCurrentWidget(self.ui.displayVideo)
         return self.ui.videoPlayer
@@ -398,6 +561,7 @@ class ImproTron(QMainWindow):
 class HotButtonHandler(QObject):
     mainMediaShow = Signal(str)    # Custom signal that decouples the media display from controlboard
     auxMediaShow  = Signal(str)    # Custom signal that decouples the media display from controlboard
+    imageChanged  = Signal()       # The button's image file was picked, loaded or cleared
     def __init__(self, button_number, ui, media_features):
 
         super(HotButtonHandler,self).__init__()
@@ -436,6 +600,10 @@ class HotButtonHandler(QObject):
         self.hot_button_title.clear()
         self.text = "Button "+str(self.button_number)
         self.hot_button.setText(self.text)
+        self.imageChanged.emit()
+
+    def image_file(self):
+        return self.hot_button_image_file.text()
 
     def save(self, hot_buttons_json):
         hot_buttons_json[self.hot_button_title.objectName()] = self.hot_button_title.text()
@@ -455,75 +623,107 @@ class HotButtonHandler(QObject):
         fileName = self.media_features.select_image_file()
         if fileName != None:
             self.hot_button_image_file.setText(fileName)
+            self.imageChanged.emit()
 
 # SoundFX Palette Management. This class handles loading of a saved queue and converting
 # and WAV files contained into sound effect buttons
 class SoundFX(QObject):
-    def __init__(self, sfx_button, media_file_database):
+    stateChanged = Signal() # Loaded, disabled, started or stopped
+
+    # With a mixer output, WAV files play as mixer voices and fade sample accurately in the mixer; files the
+    # mixer cannot decode, or every file without a mixer, play through the button's QSoundEffect, faded by the
+    # fade engine.
+    FADE_LANE = "fade"
+    SWAP_FADE_MS = 10
+
+    def __init__(self, sfx_button, media_file_database, fade_engine, mixer_output=None):
         super().__init__()
         self.sfx_button = sfx_button
         self.soundFX = QSoundEffect()
+        self.soundFX.playingChanged.connect(self.stateChanged)
         self.media_file_database = media_file_database
 
+        self._mixer = mixer_output.mixer if mixer_output is not None else None
+        self._sample = None   # Decoded audio when playing through the mixer
+        self._voice = 0       # Mixer voice while playing
+        self._fading = False
+        if self._mixer is not None:
+            mixer_output.voiceFinished.connect(self._on_voice_finished)
+
         # Store the "target" volume to return to after a fade or duck
         self.user_volume = 1.0
 
-        # Animation for smooth volume transitions
-        self.fade_anim = QVariantAnimation(self)
-        self.fade_anim.setDuration(1000)  # 1 second fade
-        self.fade_anim.setEasingCurve(QEasingCurve.Type.OutQuad)
-        self.fade_anim.valueChanged.connect(self._update_fade_volume)
-        self.fade_anim.finished.connect(self._finalize_stop)
+        # The QSoundEffect plays at user_volume times its fade lane
+        self._fade_engine = fade_engine
+        self._fade_engine.add_target(self.soundFX, self.soundFX.setVolume, self.user_volume)
 
         self.sfx_button.clicked.connect(self.soundFXButtonClicked)
 
-    def _update_fade_volume(self, value):
-        """Internal slot called by animation to ramp volume"""
-        self.soundFX.setVolume(value)
-
     def _finalize_stop(self):
-            """Called when fade-out finishes"""
-            # Changed .getVolume() to .volume()
-            if self.soundFX.volume() <= 0.01:
-                self.soundFX.stop()
-                # Reset volume to the user's preferred level so it's ready for the next play
-                self.soundFX.setVolume(self.user_volume)
+        """Called when fade-out finishes"""
+        self.soundFX.stop()
+        self._fading = False
+        # Reset the fade so it's ready for the next play
+        self._fade_engine.set_lane(self.soundFX, self.FADE_LANE, 1.0)
 
     @Slot(float)
     def set_fx_volume(self, value):
         self.user_volume = value
-        # Only update immediately if not currently fading
-        if self.fade_anim.state() != QVariantAnimation.State.Running:
-            self.soundFX.setVolume(value)
+        # A fade in progress continues from the new level
+        self._fade_engine.set_base(self.soundFX, value)
+        if self._sample is not None:
+            # A short ramp so dragging the slider does not zipper
+            if self.is_playing() and not self._fading:
+                self._mixer.fade(self._voice, value, 20)
+            return
 
     @Slot()
     def fadeOut(self, duration=1000):
         """Triggers a fade out if the sound is playing"""
-        if self.soundFX.isPlaying() and self.fade_anim.state() != QVariantAnimation.State.Running:
-            self.fade_anim.setDuration(duration)
-            self.fade_anim.setStartValue(self.soundFX.volume())
-            self.fade_anim.setEndValue(0.0)
-            self.fade_anim.start()
+        if self._sample is not None:
+            if self.is_playing():
+                self._mixer.stop(self._voice, duration)
+                self._fading = True
+            return
+
+        if self.soundFX.isPlaying() and not self._fading:
+            self._start_fade(duration)
 
     @Slot()
     def soundFXButtonClicked(self):
+        if self._sample is not None:
+            if not self.is_playing():
+                self._voice = self._mixer.play(self._sample, self.user_volume)
+                self._fading = False
+                self.stateChanged.emit()
+            elif self._fading:
+                # Already fading, stop immediately (panic mode)
+                self._mixer.stop(self._voice)
+            else:
+                self._mixer.stop(self._voice, 1000)
+                self._fading = True
+            return
+
         if self.soundFX.isPlaying():
             # If already fading, just stop immediately (panic mode)
-            if self.fade_anim.state() == QVariantAnimation.State.Running:
-                self.fade_anim.stop()
+            if self._fading:
                 self._finalize_stop()
             else:
                 # Start the smooth fade out
-                self.fade_anim.setStartValue(self.soundFX.volume())
-                self.fade_anim.setEndValue(0.0)
-                self.fade_anim.start()
+                self._start_fade(1000)
         else:
-            self.fade_anim.stop() # Ensure no leftover fade is running
-            self.soundFX.setVolume(self.user_volume)
+            self._fading = False
+            self._fade_engine.set_lane(self.soundFX, self.FADE_LANE, 1.0) # Ensure no leftover fade is running
             self.soundFX.play()
 
+    def _start_fade(self, duration):
+        self._fading = True
+        self._fade_engine.ramp(self.soundFX, self.FADE_LANE, 0.0, duration, CURVE_OUT_QUAD,
+                               on_finished=self._finalize_stop)
+
+    # sample is the file already decoded for the mixer, e.g. by the palette loader; otherwise it is decoded here
     @Slot(object)
-    def loadSoundEffect(self, new_SoundFX):
+    def loadSoundEffect(self, new_SoundFX, sample=None):
         # Get the extension (e.g., ".wav")
         ext = f"*.{new_SoundFX.suffix().lower()}"
 
@@ -531,22 +731,57 @@ class SoundFX(QObject):
         if ext in self.media_file_database.sfx_supported():
             self.sfx_button.setIcon(QIcon())
             self.sfx_button.setText(new_SoundFX.baseName())
-            self.soundFX.setSource(QUrl.fromLocalFile(new_SoundFX.absoluteFilePath()))
+            self._stop_voice()
+            if sample is None and self._mixer is not None:
+                sample = self._mixer.load(new_SoundFX.absoluteFilePath())
+            self._sample = sample
+            if self._sample is None:
+                self.soundFX.setSource(QUrl.fromLocalFile(new_SoundFX.absoluteFilePath()))
             self.sfx_button.setEnabled(True)
+            self.stateChanged.emit()
         else:
             # Not a supported extension for QSoundEffect
             self.disable_with_error(f"Unsupported: {new_SoundFX.suffix()}")
 
     def disable_with_error(self, text):
+        self._stop_voice()
+        self._sample = None
         self.sfx_button.setText(text)
         self.sfx_button.setIcon(QApplication.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxCritical))
         self.sfx_button.setEnabled(False)
+        self.stateChanged.emit()
 
     @Slot()
     def disable(self):
+        self._stop_voice()
+        self._sample = None
         self.sfx_button.setText("")
         self.sfx_button.setIcon(QApplication.style().standardIcon(QStyle.StandardPixmap.SP_DialogCancelButton))
         self.sfx_button.setEnabled(False)
+        self.stateChanged.emit()
+
+    def label(self) -> str:
+        return self.sfx_button.text() if self.sfx_button.isEnabled() else ""
+
+    def is_playing(self) -> bool:
+        if self._sample is not None:
+            return self._mixer.is_playing(self._voice)
+        return self.soundFX.isPlaying()
+
+    def uses_mixer(self) -> bool:
+        return self._sample is not None
+
+    # A voice cut mid waveform clicks, so a swapped or disabled button fades its voice out over a few ms
+    def _stop_voice(self):
+        if self._voice and self._mixer is not None:
+            self._mixer.stop(self._voice, self.SWAP_FADE_MS)
+
+    @Slot(int)
+    def _on_voice_finished(self, voice_id):
+        if voice_id == self._voice:
+            self._voice = 0
+            self._fading = False
+            self.stateChanged.emit()
 
 # Used during slide shows and Whammy to load images asynchronously
 class SlideLoaderThread(QObject):
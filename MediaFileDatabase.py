@@ -41,6 +41,8 @@ class MediaFileRegistry:
         # Data storage models
         self.media_model = QStandardItemModel()
         self.sounds_model = QStandardItemModel()
+        self._sound_items = {} # canonical path -> sounds_model item
+        self._sound_generation = 0 # Bumped whenever sound search results may have changed
 
         # Format detection
         self._media_supported = {"*." + fmt.data().decode("utf-8") for fmt in QImageReader.supportedImageFormats()}
@@ -78,13 +80,15 @@ class MediaFileRegistry:
     def get_sfx_supported_for_dialog(self): return " ".join(sorted(self._soundfx_supported))
 
     # --- Indexing ---
-    def _index_files(self, path: str, supported_formats: set[str], model: QStandardItemModel) -> int:
+    def _index_files(self, path: str, supported_formats: set[str], model: QStandardItemModel, items: dict = None) -> int:
         # Force QDir to drop cached file system entries
         d = QDir(path)
         d.refresh()
 
         model.beginResetModel()
         model.removeRows(0, model.rowCount())
+        if items is not None:
+            items.clear()
 
         file_count = 0
         # Include Subdirectories; refresh directory entry status
@@ -112,6 +116,8 @@ class MediaFileRegistry:
             item.setData(file_info.canonicalFilePath(), Qt.ItemDataRole.UserRole)
             item.setData(set(tag_list), Qt.ItemDataRole.UserRole + 1)
             model.appendRow(item)
+            if items is not None:
+                items[file_info.canonicalFilePath()] = item
 
         model.endResetModel()
         return file_count
@@ -130,7 +136,26 @@ class MediaFileRegistry:
             logger.error(f"Sound indexing path not found: {path}. Using Default.")
             path = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.MusicLocation)
         # Pass self.sounds_model (QStandardItemModel), NOT self.sounds_table
-        return self._index_files(path, self._sounds_supported, self.sounds_model)
+        self._sound_generation += 1
+        return self._index_files(path, self._sounds_supported, self.sounds_model, self._sound_items)
+
+    # Changes whenever the sound index or its tags change, so callers can tell when cached searches are stale
+    def sound_generation(self) -> int:
+        return self._sound_generation
+
+    # Add words, such as a track's title and artist, to the search tags of an indexed sound
+    def add_sound_tags(self, path: str, text: str, tool_tip: str = "") -> bool:
+        item = self._sound_items.get(path)
+        if item is None:
+            return False
+        tags = set(filter(None, re.split(r'[_+\-.\s]+', text.lower())))
+        item_tags = item.data(Qt.ItemDataRole.UserRole + 1)
+        if not tags <= item_tags:
+            self._sound_generation += 1
+            item.setData(item_tags | tags, Qt.ItemDataRole.UserRole + 1)
+        if tool_tip:
+            item.setToolTip(tool_tip)
+        return True
 
     def search_media(self, tags: str = "", all_tags: bool = True) -> list[str]:
         """Query source model tags directly without touching UI proxies."""
@@ -1,9 +1,11 @@
-from PySide6.QtCore import Slot, QTimer, QTime
+from PySide6.QtCore import Slot, Signal, QTimer, QTime
 
 from PySide6.QtCore import Qt
 from PySide6.QtWidgets import QLCDNumber
 
 class CountdownTimer(QLCDNumber):
+    timeChanged = Signal(str, int) # "hh:mm:ss" and seconds remaining, on start, reset and every tick
+
     def __init__(self, name, parent=None):
         super().__init__(parent)
         self.setSegmentStyle(QLCDNumber.Filled)
@@ -35,6 +37,7 @@ class CountdownTimer(QLCDNumber):
             self.resetColor()
 
             self.countdownTimer.start(1000)
+            self._emit_time()
 
     def pause(self):
         if self.countdownTimer.isActive():
@@ -48,6 +51,10 @@ class CountdownTimer(QLCDNumber):
             self.startingTime.setHMS(time.hour(), time.minute(), time.second())
             self.redTime.setHMS(redTime.hour(), redTime.minute(), redTime.second())
             self.resetColor()
+            self._emit_time()
+
+    def _emit_time(self):
+        self.timeChanged.emit(self.countdownTime.toString("hh:mm:ss"), QTime(0, 0, 0).secsTo(self.countdownTime))
 
     @Slot()
     def countdown(self):
@@ -67,9 +74,11 @@ class CountdownTimer(QLCDNumber):
         # over time as greater than zero time. SO detect the rollover instead.
         if self.countdownTime > self.startingTime:
             self.countdownTimer.stop()
+            self.timeChanged.emit("00:00:00", 0)
             return
 
         self.display(text)
+        self._emit_time()
 
     # Maximize on the screen where the timer was moved to
     def showTimer(self, location, visible = False):
@@ -0,0 +1,307 @@
+# audio_mixer.py
+# Software mixer for sound effects. WAV files are decoded once into float32 NumPy arrays at the mixer's rate
+# and channel count, and every playing voice is summed into a single output stream a block at a time. Each
+# voice has a gain with a linear ramp applied per sample, so fades are click free and land on the exact frame,
+# and stopping or fading everything is one command that touches each voice once at the next block.
+#
+# The mixer holds no Qt objects and never blocks on the audio device: audio_output.py pulls blocks into a
+# QAudioSink, and NullSink pulls them without a device for tests and benchmarks. Commands from the GUI thread
+# are queued under a lock and applied at the start of the next block, so the latency from play() to sound is
+# at most one block plus whatever the output device buffers.
+#
+# NumPy is optional. Without it MIXER_AVAILABLE is False and sound effects stay on QSoundEffect.
+import logging
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MIXER_AVAILABLE = np is not None
+
+# Convert little endian PCM samples width bytes wide to float32 frames in [-1, 1] of shape (frames, channels).
+# Raises ValueError for a sample width it does not know.
+def pcm_to_float(raw: bytes, width: int, channels: int):
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        # Sign extend the 24 bit samples into the top of an int32
+        triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((triples[:, 0] << 8) | (triples[:, 1] << 16) | (triples[:, 2] << 24)).astype(np.float32) / 2147483648.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"unsupported sample width {width}")
+
+    return samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+
+# Decode a PCM WAV file to float32 frames in [-1, 1] at sample_rate with channels channels. Raises OSError,
+# wave.Error or ValueError for files it cannot read.
+def decode_wav(file_name: str, sample_rate: int, channels: int):
+    with wave.open(file_name, "rb") as wav:
+        width = wav.getsampwidth()
+        file_channels = wav.getnchannels()
+        file_rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    frames = pcm_to_float(raw, width, file_channels)
+
+    # Mono plays on every channel; extra channels beyond the mixer's are dropped
+    if file_channels < channels:
+        frames = np.repeat(frames[:, :1], channels, axis=1)
+    elif file_channels > channels:
+        frames = frames[:, :channels]
+
+    if file_rate != sample_rate and len(frames) > 1:
+        length = int(round(len(frames) * sample_rate / file_rate))
+        positions = np.arange(length, dtype=np.float64) * (file_rate / sample_rate)
+        source = np.arange(len(frames), dtype=np.float64)
+        frames = np.stack([np.interp(positions, source, frames[:, channel]) for channel in range(channels)], axis=1)
+
+    return np.ascontiguousarray(frames, dtype=np.float32)
+
+class MixerSample:
+    __slots__ = ("file", "frames", "sample_rate")
+
+    def __init__(self, file: str, frames, sample_rate: int):
+        self.file = file
+        self.frames = frames
+        self.sample_rate = sample_rate
+
+    def duration_ms(self) -> int:
+        return len(self.frames) * 1000 // self.sample_rate
+
+class _Voice:
+    __slots__ = ("voice_id", "frames", "position", "gain", "target", "step", "ramp_left", "stop_at_target")
+
+    def __init__(self, voice_id: int, frames, gain: float):
+        self.voice_id = voice_id
+        self.frames = frames
+        self.position = 0
+        self.gain = gain
+        self.target = gain
+        self.step = 0.0
+        self.ramp_left = 0
+        self.stop_at_target = False
+
+    def ramp_to(self, target: float, ramp_frames: int, stop: bool):
+        self.target = target
+        self.stop_at_target = stop
+        if ramp_frames <= 0:
+            self.gain = target
+            self.ramp_left = 0
+        else:
+            self.step = (target - self.gain) / ramp_frames
+            self.ramp_left = ramp_frames
+
+class AudioMixer:
+    MAX_VOICES = 32
+    STEAL_FADE_MS = 5             # A stolen voice is faded this quickly rather than cut, which would click
+    MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 2, block_frames: int = 256):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.block_frames = block_frames
+        self.master_gain = 1.0
+
+        self._lock = threading.Lock()
+        self._commands = []          # Applied by the render thread at the next block
+        self._voices = []            # Render thread only
+        self._playing = {}           # voice id -> start time, mirrored for the GUI thread
+        self._finished = []
+        self._next_id = 1
+        self._samples = OrderedDict() # file -> MixerSample, least recently loaded first
+        self._cache_bytes = 0
+        self._samples_lock = threading.Lock()
+        self._buffer = np.zeros((block_frames, channels), dtype=np.float32)
+
+        self.blocks = 0
+        self.stolen = 0
+
+    # ----------------------------------------------------------------------
+    # Samples
+    # ----------------------------------------------------------------------
+    # The decoded sample for a WAV file, decoded on first use. None when the file cannot be decoded or holds no
+    # audio. Safe to call from any thread; the decode itself runs outside the lock.
+    def load(self, file_name: str) -> MixerSample | None:
+        with self._samples_lock:
+            sample = self._samples.get(file_name)
+            if sample is not None:
+                self._samples.move_to_end(file_name)
+                return sample
+
+        try:
+            frames = decode_wav(file_name, self.sample_rate, self.channels)
+        except (OSError, EOFError, wave.Error, ValueError) as e:
+            logger.warning(f"Audio Mixer: Cannot decode {file_name}: {e}")
+            return None
+        if not len(frames):
+            logger.warning(f"Audio Mixer: {file_name} holds no audio")
+            return None
+
+        sample = MixerSample(file_name, frames, self.sample_rate)
+        with self._samples_lock:
+            previous = self._samples.pop(file_name, None)
+            if previous is not None:
+                self._cache_bytes -= previous.frames.nbytes
+            self._samples[file_name] = sample
+            self._cache_bytes += frames.nbytes
+            # Evicted samples keep playing; voices hold their own reference to the frames
+            while self._cache_bytes > self.MAX_CACHE_BYTES and len(self._samples) > 1:
+                _, evicted = self._samples.popitem(last=False)
+                self._cache_bytes -= evicted.frames.nbytes
+        return sample
+
+    def cached_bytes(self) -> int:
+        with self._samples_lock:
+            return self._cache_bytes
+
+    # ----------------------------------------------------------------------
+    # Voices; called from any thread
+    # ----------------------------------------------------------------------
+    # Start a sample and return its voice id. The oldest voice is faded out when the voice limit is reached.
+    def play(self, sample: MixerSample, gain: float = 1.0, fade_in_ms: int = 0) -> int:
+        with self._lock:
+            voice_id = self._next_id
+            self._next_id += 1
+            self._playing[voice_id] = time.monotonic()
+            steal = None
+            if len(self._playing) > self.MAX_VOICES:
+                steal = min(self._playing, key=self._playing.get)
+            self._commands.append(("play", voice_id, sample.frames, gain, self._frames(fade_in_ms)))
+            if steal is not None:
+                self.stolen += 1
+                del self._playing[steal]
+                self._commands.append(("fade", steal, 0.0, self._frames(self.STEAL_FADE_MS), True))
+        return voice_id
+
+    # Ramp a voice's gain to target over ms milliseconds, stopping it there when stop is set
+    def fade(self, voice_id: int, target: float, ms: int, stop: bool = False):
+        with self._lock:
+            self._commands.append(("fade", voice_id, target, self._frames(ms), stop))
+
+    def stop(self, voice_id: int, fade_ms: int = 0):
+        self.fade(voice_id, 0.0, fade_ms, True)
+
+    def stop_all(self, fade_ms: int = 0):
+        with self._lock:
+            self._playing.clear()
+            self._commands.append(("stop_all", self._frames(fade_ms)))
+
+    def is_playing(self, voice_id: int) -> bool:
+        return voice_id in self._playing
+
+    def playing(self) -> int:
+        return len(self._playing)
+
+    # Voice ids that ended since the last call
+    def take_finished(self) -> list[int]:
+        with self._lock:
+            finished = self._finished
+            self._finished = []
+        return finished
+
+    def _frames(self, ms: int) -> int:
+        return int(ms * self.sample_rate / 1000)
+
+    # ----------------------------------------------------------------------
+    # Rendering; called from the output's thread only
+    # ----------------------------------------------------------------------
+    # Mix the next frames frames. The returned array is reused by the next call.
+    def render(self, frames: int):
+        with self._lock:
+            commands = self._commands
+            self._commands = []
+        if commands:
+            self._apply(commands)
+
+        if len(self._buffer) < frames:
+            self._buffer = np.zeros((frames, self.channels), dtype=np.float32)
+        out = self._buffer[:frames]
+        out.fill(0.0)
+
+        ended = []
+        for voice in self._voices:
+            data = voice.frames
+            count = min(frames, len(data) - voice.position)
+            if count <= 0:
+                # Nothing left to play, e.g. a sample with no frames
+                ended.append(voice)
+                continue
+            chunk = data[voice.position:voice.position + count]
+
+            if voice.ramp_left:
+                ramp = min(count, voice.ramp_left)
+                gains = np.full(count, voice.target, dtype=np.float32)
+                gains[:ramp] = voice.gain + voice.step * np.arange(1, ramp + 1, dtype=np.float32)
+                out[:count] += chunk * gains[:, None]
+                voice.ramp_left -= ramp
+                voice.gain = voice.target if not voice.ramp_left else float(gains[ramp - 1])
+            elif voice.gain == 1.0:
+                out[:count] += chunk
+            elif voice.gain:
+                out[:count] += chunk * voice.gain
+
+            voice.position += count
+            if voice.position >= len(data) or (voice.stop_at_target and not voice.ramp_left):
+                ended.append(voice)
+
+        if ended:
+            for voice in ended:
+                self._voices.remove(voice)
+            with self._lock:
+                for voice in ended:
+                    self._playing.pop(voice.voice_id, None)
+                    self._finished.append(voice.voice_id)
+
+        if self.master_gain != 1.0:
+            out *= self.master_gain
+        np.clip(out, -1.0, 1.0, out=out)
+        self.blocks += 1
+        return out
+
+    def _apply(self, commands: list):
+        for command in commands:
+            kind = command[0]
+            if kind == "play":
+                _, voice_id, frames, gain, fade_frames = command
+                voice = _Voice(voice_id, frames, 0.0 if fade_frames else gain)
+                if fade_frames:
+                    voice.ramp_to(gain, fade_frames, False)
+                self._voices.append(voice)
+            elif kind == "fade":
+                _, voice_id, target, ramp_frames, stop = command
+                for voice in self._voices:
+                    if voice.voice_id == voice_id:
+                        voice.ramp_to(target, ramp_frames, stop)
+                        break
+            elif kind == "stop_all":
+                for voice in self._voices:
+                    voice.ramp_to(0.0, command[1], True)
+
+# Pulls blocks from a mixer without an audio device, for tests and benchmarks
+class NullSink:
+    def __init__(self, mixer: AudioMixer):
+        self.mixer = mixer
+        self.finished = []
+
+    # Render blocks blocks and return them as one array
+    def pull(self, blocks: int = 1):
+        block_frames = self.mixer.block_frames
+        out = np.empty((blocks * block_frames, self.mixer.channels), dtype=np.float32)
+        for block in range(blocks):
+            out[block * block_frames:(block + 1) * block_frames] = self.mixer.render(block_frames)
+        self.finished.extend(self.mixer.take_finished())
+        return out
+
+    def pull_ms(self, ms: int):
+        return self.pull(max(1, -(-ms * self.mixer.sample_rate // (1000 * self.mixer.block_frames))))
@@ -0,0 +1,141 @@
+# audio_output.py
+# Plays an AudioMixer through a QAudioSink on a dedicated, time critical thread. The sink pulls mixed blocks
+# from a QIODevice as its buffer drains, so the GUI thread never has to keep audio fed, and the sink's buffer
+# is kept to a few mixer blocks so the time from a trigger to sound stays short and predictable.
+import logging
+
+from PySide6.QtCore import QObject, QIODevice, QThread, Signal, Slot, Qt
+from PySide6.QtMultimedia import QAudioSink, QAudioFormat, QAudio, QMediaDevices
+
+from audio_mixer import AudioMixer
+
+logger = logging.getLogger(__name__)
+
+# Pull side of the sink: every read renders the next frames of the mix in the sink's sample format
+class _MixerDevice(QIODevice):
+    def __init__(self, mixer: AudioMixer, sample_format, on_rendered):
+        super().__init__()
+        self._mixer = mixer
+        self._float = sample_format == QAudioFormat.SampleFormat.Float
+        self._frame_bytes = mixer.channels * (4 if self._float else 2)
+        self._on_rendered = on_rendered
+
+    def isSequential(self) -> bool:
+        return True
+
+    def bytesAvailable(self) -> int:
+        return self._mixer.block_frames * self._frame_bytes
+
+    def readData(self, maxlen: int) -> bytes:
+        frames = maxlen // self._frame_bytes
+        if frames <= 0:
+            return b""
+        mix = self._mixer.render(frames)
+        self._on_rendered()
+        if self._float:
+            return mix.tobytes()
+        return (mix * 32767.0).astype("<i2").tobytes()
+
+    def writeData(self, data) -> int:
+        return -1
+
+# Lives on the output thread; the sink and its device are created there in start()
+class _OutputWorker(QObject):
+    voicesFinished = Signal(list)
+
+    def __init__(self, sample_rate: int, channels: int, block_frames: int, buffer_blocks: int):
+        super().__init__()
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._block_frames = block_frames
+        self._buffer_blocks = buffer_blocks
+        self._sink = None
+        self._device = None
+        self.mixer = None
+
+    @Slot()
+    def start(self):
+        audio_device = QMediaDevices.defaultAudioOutput()
+        if audio_device.isNull():
+            logger.error("Audio Mixer: No audio output device")
+            return
+
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(self._sample_rate)
+        audio_format.setChannelCount(self._channels)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Float)
+        if not audio_device.isFormatSupported(audio_format):
+            audio_format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        if not audio_device.isFormatSupported(audio_format):
+            # Mix at whatever the device prefers rather than resample every block
+            preferred = audio_device.preferredFormat()
+            audio_format.setSampleRate(preferred.sampleRate())
+            audio_format.setChannelCount(min(2, max(1, preferred.channelCount())))
+            audio_format.setSampleFormat(QAudioFormat.SampleFormat.Float
+                                         if preferred.sampleFormat() == QAudioFormat.SampleFormat.Float
+                                         else QAudioFormat.SampleFormat.Int16)
+
+        self.mixer = AudioMixer(audio_format.sampleRate(), audio_format.channelCount(), self._block_frames)
+        self._device = _MixerDevice(self.mixer, audio_format.sampleFormat(), self._on_rendered)
+        self._device.open(QIODevice.OpenModeFlag.ReadOnly)
+
+        self._sink = QAudioSink(audio_device, audio_format, self)
+        self._sink.setBufferSize(self._block_frames * self._buffer_blocks * audio_format.bytesPerFrame())
+        self._sink.start(self._device)
+        if self._sink.error() != QAudio.Error.NoError:
+            logger.error(f"Audio Mixer: Could not start output on {audio_device.description()}: {self._sink.error()}")
+            self._sink = None
+            self.mixer = None
+            return
+
+        buffer_ms = self._sink.bufferSize() * 1000 // (audio_format.bytesPerFrame() * audio_format.sampleRate())
+        logger.info(f"Audio Mixer: Mixing to {audio_device.description()} at {audio_format.sampleRate()} Hz, "
+                    f"{audio_format.channelCount()} channels, {buffer_ms} ms buffer")
+
+    @Slot()
+    def stop(self):
+        if self._sink is not None:
+            self._sink.stop()
+            self._sink = None
+        if self._device is not None:
+            self._device.close()
+
+    def _on_rendered(self):
+        finished = self.mixer.take_finished()
+        if finished:
+            self.voicesFinished.emit(finished)
+
+# Owns the output thread. mixer is None when there is no usable output device.
+class AudioMixerOutput(QObject):
+    voiceFinished = Signal(int)   # A voice reached its end or was stopped
+    _startRequested = Signal()
+    _stopRequested = Signal()
+
+    BLOCK_FRAMES = 256            # 5.3 ms at 48 kHz
+    BUFFER_BLOCKS = 4
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 2, parent=None):
+        super().__init__(parent)
+        self._thread = QThread()
+        self._worker = _OutputWorker(sample_rate, channels, self.BLOCK_FRAMES, self.BUFFER_BLOCKS)
+        self._worker.moveToThread(self._thread)
+        self._worker.voicesFinished.connect(self._on_voices_finished)
+        self._startRequested.connect(self._worker.start, Qt.ConnectionType.BlockingQueuedConnection)
+        self._stopRequested.connect(self._worker.stop, Qt.ConnectionType.BlockingQueuedConnection)
+
+        self._thread.start(QThread.Priority.TimeCriticalPriority)
+        self._startRequested.emit()
+        self.mixer = self._worker.mixer
+        if self.mixer is None:
+            self.shutdown()
+
+    def shutdown(self):
+        if self._thread.isRunning():
+            self._stopRequested.emit()
+            self._thread.quit()
+            self._thread.wait(2000)
+
+    @Slot(list)
+    def _on_voices_finished(self, voice_ids):
+        for voice_id in voice_ids:
+            self.voiceFinished.emit(voice_id)
@@ -0,0 +1,391 @@
+# bench_audio_latency.py
+# Trigger to sound latency of each playback path. Every path is started repeatedly from silence and the time
+# from the trigger to each state transition it reports is recorded: QSoundEffect to playingChanged, QMediaPlayer
+# to playbackStateChanged and to its position first moving (what the music deck counts as heard), the software
+# mixer to the first block that carries the voice, and the same triggered by a /soundfx/play datagram sent to an
+# OSCServer on loopback. Point the default output at a loopback or null sink (e.g. `pactl load-module
+# module-null-sink`) to run without speakers; --null renders the mixer at real time without any device, and
+# without needing QtMultimedia:
+#   python bench_audio_latency.py --trials 100
+#   python bench_audio_latency.py --paths mixer osc --null
+import abc
+import sys
+import math
+import time
+import wave
+import socket
+import argparse
+import tempfile
+import threading
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, QUrl, Signal
+
+from audio_mixer import AudioMixer, MIXER_AVAILABLE
+from osc_codec import encode_message
+from osc_server import OSCServer, OSC_SFX_PLAY
+
+PATHS = ("soundeffect", "mediaplayer", "mediaplayer-cold", "mixer", "osc")
+
+# A tone that is loud from the first sample, so the first block holding it is never silent
+def write_tone(file_name: str, seconds: float = 1.0, rate: int = 48000):
+    frames = bytearray()
+    for index in range(int(seconds * rate)):
+        value = int(8000 * math.cos(2 * math.pi * 440 * index / rate))
+        frames += value.to_bytes(2, "little", signed=True) * 2
+    with wave.open(file_name, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class _Stages(QObject):
+    stageReached = Signal(str, object)
+
+# A playback path: trigger() starts it from silence, stop() returns it to silence, and stageReached is emitted
+# with the perf_counter_ns() of each transition. final is the stage that ends a trial. The signal lives on a
+# QObject of its own, as a QObject subclass cannot enforce abstract methods.
+class Path(abc.ABC):
+    final = ""
+
+    def __init__(self):
+        self._stages = _Stages()
+        self.stageReached = self._stages.stageReached
+
+    def prepare(self):
+        pass
+
+    @abc.abstractmethod
+    def trigger(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def _reached(self, stage: str):
+        self.stageReached.emit(stage, time.perf_counter_ns())
+
+class SoundEffectPath(Path):
+    final = "playing"
+
+    def __init__(self, file: str):
+        super().__init__()
+        from PySide6.QtMultimedia import QSoundEffect
+        self._effect = QSoundEffect()
+        self._effect.setSource(QUrl.fromLocalFile(file))
+        self._effect.playingChanged.connect(self._on_playing_changed)
+        self._ready_status = QSoundEffect.Status.Ready
+
+    def ready(self) -> bool:
+        return self._effect.status() == self._ready_status
+
+    def trigger(self):
+        self._effect.play()
+
+    def stop(self):
+        self._effect.stop()
+
+    def _on_playing_changed(self):
+        if self._effect.isPlaying():
+            self._reached("playing")
+
+# A warm player seeks back and plays the loaded file; a cold one opens the file on every trigger
+class MediaPlayerPath(Path):
+    final = "audible"
+
+    def __init__(self, file: str, cold: bool):
+        super().__init__()
+        from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+        self._loaded_status = QMediaPlayer.MediaStatus.LoadedMedia
+        self._playing_state = QMediaPlayer.PlaybackState.PlayingState
+        self._url = QUrl.fromLocalFile(file)
+        self._cold = cold
+        self._armed = False
+        self._player = QMediaPlayer()
+        self._player.setAudioOutput(QAudioOutput(self._player))
+        self._player.mediaStatusChanged.connect(self._on_status_changed)
+        self._player.playbackStateChanged.connect(self._on_state_changed)
+        self._player.positionChanged.connect(self._on_position_changed)
+        if not cold:
+            self._player.setSource(self._url)
+
+    def ready(self) -> bool:
+        return self._cold or self._player.mediaStatus() == self._loaded_status
+
+    def trigger(self):
+        self._armed = True
+        if self._cold:
+            self._player.setSource(self._url)
+        self._player.play()
+
+    def stop(self):
+        self._armed = False
+        self._player.stop()
+        self._player.setPosition(0)
+        if self._cold:
+            self._player.setSource(QUrl())
+
+    def _on_status_changed(self, status):
+        if self._armed and status == self._loaded_status:
+            self._reached("loaded")
+
+    def _on_state_changed(self, state):
+        if self._armed and state == self._playing_state:
+            self._reached("playing")
+
+    def _on_position_changed(self, position):
+        if self._armed and position > 0:
+            self._armed = False
+            self._reached("audible")
+
+# Renders a mixer at real time on a thread of its own, as a device would pull it, but without one
+class NullOutput:
+    def __init__(self, mixer: AudioMixer):
+        self.mixer = mixer
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        block_ns = self.mixer.block_frames * 1_000_000_000 // self.mixer.sample_rate
+        deadline = time.perf_counter_ns()
+        while self._running:
+            deadline += block_ns
+            delay = deadline - time.perf_counter_ns()
+            if delay > 0:
+                time.sleep(delay / 1_000_000_000)
+            self.mixer.render(self.mixer.block_frames)
+            self.mixer.take_finished()
+
+    def shutdown(self):
+        self._running = False
+        self._thread.join(1.0)
+
+# The software mixer through the same output the application uses, or NullOutput. "rendered" is the first
+# block after the trigger that carries sound; the device buffer then adds up to buffer_ms before it is heard.
+class MixerPath(Path):
+    final = "rendered"
+
+    def __init__(self, file: str, null: bool):
+        super().__init__()
+        self.output = None
+        mixer = None
+        if not null:
+            from audio_output import AudioMixerOutput
+            self.output = AudioMixerOutput()
+            mixer = self.output.mixer
+            if mixer is None:
+                print("No audio output device; rendering the mixer without one")
+                self.output = None
+        if mixer is None:
+            mixer = AudioMixer()
+            self._null = NullOutput(mixer)
+            self.buffer_ms = 0.0
+        else:
+            self._null = None
+            self.buffer_ms = self.output.BLOCK_FRAMES * self.output.BUFFER_BLOCKS * 1000 / mixer.sample_rate
+
+        self.mixer = mixer
+        self.sample = mixer.load(file)
+        self._armed = False
+        render = mixer.render
+
+        # Runs on the output thread
+        def probed_render(frames):
+            block = render(frames)
+            if self._armed and block.any():
+                self._armed = False
+                self._reached("rendered")
+            return block
+        mixer.render = probed_render
+
+    def ready(self) -> bool:
+        return self.sample is not None
+
+    def trigger(self):
+        self._armed = True
+        self.mixer.play(self.sample)
+
+    def stop(self):
+        self._armed = False
+        self.mixer.stop_all()
+
+    def shutdown(self):
+        if self._null is not None:
+            self._null.shutdown()
+        if self.output is not None:
+            self.output.shutdown()
+
+# A /soundfx/play datagram sent over loopback to an OSCServer whose sfxPlayAction starts another path, so the
+# socket, the ingress thread and dispatch are all timed, from just before the send
+class OSCPath(Path):
+    def __init__(self, inner: Path, port: int):
+        super().__init__()
+        self.final = inner.final
+        self._inner = inner
+        self._inner.stageReached.connect(self.stageReached)
+        self._server = OSCServer("127.0.0.1", port, tcp_port=0)
+        self._server.sfxPlayAction.connect(lambda name: self._inner.trigger())
+        self._address = ("127.0.0.1", port)
+        self._packet = encode_message(OSC_SFX_PLAY, ["bench"])
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    # A port nothing is listening on, for the server
+    @staticmethod
+    def free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.bind(("127.0.0.1", 0))
+            return probe.getsockname()[1]
+
+    def ready(self) -> bool:
+        return self._inner.ready()
+
+    def trigger(self):
+        self._socket.sendto(self._packet, self._address)
+
+    def stop(self):
+        self._inner.stop()
+
+    def shutdown(self):
+        self._server.disconnectOSCServer()
+        self._socket.close()
+
+# Runs the trials of each path in turn from the event loop
+class Runner(QObject):
+    def __init__(self, app, paths: dict, trials: int, settle_ms: int, timeout_ms: int):
+        super().__init__()
+        self._app = app
+        self._paths = list(paths.items())
+        self._trials = trials
+        self._settle_ms = settle_ms
+        self._timeout = QTimer(self)
+        self._timeout.setSingleShot(True)
+        self._timeout.setInterval(timeout_ms)
+        self._timeout.timeout.connect(self._on_timeout)
+        self.results = {}    # path name -> {stage: [ms]}
+        self.timeouts = {}   # path name -> trials that never reached the final stage
+        self._current = None
+        self._name = ""
+        self._trial = 0
+        self._triggered_ns = 0
+        self._waits = 0
+
+    def start(self):
+        QTimer.singleShot(0, self._next_path)
+
+    def _next_path(self):
+        if self._current is not None:
+            self._current.stageReached.disconnect(self._on_stage)
+        if not self._paths:
+            self._app.quit()
+            return
+        self._name, self._current = self._paths.pop(0)
+        self.results[self._name] = {}
+        self.timeouts[self._name] = 0
+        self._current.stageReached.connect(self._on_stage)
+        self._trial = 0
+        self._waits = 0
+        self._current.prepare()
+        QTimer.singleShot(self._settle_ms, self._next_trial)
+
+    def _next_trial(self):
+        # Give a loading file up to a few seconds before its first trigger
+        if not self._current.ready():
+            self._waits += 1
+            if self._waits > 50:
+                print(f"{self._name}: not ready, skipped")
+                self._next_path()
+            else:
+                QTimer.singleShot(100, self._next_trial)
+            return
+
+        if self._trial >= self._trials:
+            self._current.stop()
+            self._next_path()
+            return
+
+        self._trial += 1
+        self._triggered_ns = time.perf_counter_ns()
+        self._timeout.start()
+        self._current.trigger()
+
+    def _on_stage(self, stage: str, reached_ns):
+        if not self._triggered_ns:
+            return
+        self.results[self._name].setdefault(stage, []).append((reached_ns - self._triggered_ns) / 1_000_000)
+        if stage == self._current.final:
+            self._end_trial()
+
+    def _on_timeout(self):
+        self.timeouts[self._name] += 1
+        self._end_trial()
+
+    def _end_trial(self):
+        self._timeout.stop()
+        self._triggered_ns = 0
+        self._current.stop()
+        QTimer.singleShot(self._settle_ms, self._next_trial)
+
+def main():
+    parser = argparse.ArgumentParser(description="ImproTron audio trigger to sound latency benchmark")
+    parser.add_argument("--trials", type=int, default=50, help="Triggers per path")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=list(PATHS), help="Playback paths to measure")
+    parser.add_argument("--file", help="WAV file to play; a generated tone by default")
+    parser.add_argument("--settle-ms", type=int, default=150, help="Silence between triggers")
+    parser.add_argument("--timeout-ms", type=int, default=3000, help="Give up on a trigger after this long")
+    parser.add_argument("--null", action="store_true", help="Render the mixer at real time without an audio device")
+    parser.add_argument("--osc-port", type=int, default=0, help="Loopback UDP port for the osc path; any free one by default")
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    file = args.file
+    if not file:
+        file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False).name
+        write_tone(file)
+
+    if not MIXER_AVAILABLE and ("mixer" in args.paths or "osc" in args.paths):
+        print("NumPy is not installed; OSC triggers play through QSoundEffect")
+
+    mixer_path = None
+    osc_path = None
+    paths = {}
+    for name in args.paths:
+        if name == "soundeffect":
+            paths[name] = SoundEffectPath(file)
+        elif name in ("mediaplayer", "mediaplayer-cold"):
+            paths[name] = MediaPlayerPath(file, cold=name == "mediaplayer-cold")
+        elif name == "mixer" and MIXER_AVAILABLE:
+            mixer_path = mixer_path or MixerPath(file, args.null)
+            paths[name] = mixer_path
+        elif name == "osc":
+            port = args.osc_port or OSCPath.free_port()
+            if MIXER_AVAILABLE:
+                mixer_path = mixer_path or MixerPath(file, args.null)
+                osc_path = OSCPath(mixer_path, port)
+            else:
+                osc_path = OSCPath(SoundEffectPath(file), port)
+            paths[name] = osc_path
+
+    runner = Runner(app, paths, args.trials, args.settle_ms, args.timeout_ms)
+    runner.start()
+    app.exec()
+    if osc_path is not None:
+        osc_path.shutdown()
+    if mixer_path is not None:
+        mixer_path.shutdown()
+
+    print(f"{'path':<18}{'stage':<10}{'count':>6}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'timeouts':>10}")
+    for name, stages in runner.results.items():
+        for stage, values in stages.items():
+            print(f"{name:<18}{stage:<10}{len(values):>6}{percentile(values, 50):>9.2f}{percentile(values, 99):>9.2f}"
+                  f"{max(values):>9.2f}{runner.timeouts[name]:>10}")
+        if not stages:
+            print(f"{name:<18}{'-':<10}{0:>6}{'':>9}{'':>9}{'':>9}{runner.timeouts[name]:>10}")
+    if mixer_path is not None and mixer_path.buffer_ms:
+        print(f"Mixer output buffer adds up to {mixer_path.buffer_ms:.1f} ms after 'rendered'")
+
+if __name__ == "__main__":
+    main()
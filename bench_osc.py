@@ -0,0 +1,78 @@
+# bench_osc.py
+# Microbenchmark for OSC routing. Measures the per-message cost of resolving and calling handlers through the
+# dispatch table for literal addresses, incoming address patterns, routes registered as patterns and misses,
+# next to an if/elif chain shaped like the original dispatcher:
+#   python bench_osc.py --messages 200000
+import sys
+import time
+import argparse
+
+from osc_server import (OSCDispatcher, OSCMessage, OSC_SOUND_PLAY, OSC_SOUND_SEEK, OSC_SOUND_STOP, OSC_SOUND_STINGER,
+                        OSC_SOUND_FADE, OSC_SOUND_PLAYLIST, OSC_MEDIA_SHOW, OSC_MEDIA_MOVIE, OSC_SPINBOX_CHANGE,
+                        OSC_BUTTON_PRESS, OSC_SFX_PLAY, OSC_SFX_STOP)
+
+# Route order of the original if/elif chain; the last entries paid for every comparison above them
+ROUTES = [OSC_SOUND_PLAY, OSC_SOUND_PLAYLIST, OSC_SOUND_STINGER, OSC_SOUND_SEEK, OSC_SOUND_FADE, OSC_SOUND_STOP,
+          OSC_MEDIA_SHOW, OSC_MEDIA_MOVIE, OSC_SPINBOX_CHANGE, OSC_BUTTON_PRESS, OSC_SFX_PLAY, OSC_SFX_STOP]
+
+def handler(message):
+    pass
+
+def chain_dispatch(address, args):
+    for route in ROUTES:
+        if address == route:
+            handler(args)
+            return 1
+    return 0
+
+def time_per_message(function, messages, count) -> float:
+    start = time.perf_counter()
+    for index in range(count):
+        function(messages[index % len(messages)])
+    return (time.perf_counter() - start) * 1_000_000_000 / count
+
+def main():
+    parser = argparse.ArgumentParser(description="ImproTron OSC dispatch benchmark")
+    parser.add_argument("--messages", type=int, default=200000, help="Messages dispatched per case")
+    parser.add_argument("--extra-routes", type=int, default=200, help="Additional literal routes, e.g. from features")
+    args = parser.parse_args()
+
+    dispatcher = OSCDispatcher()
+    for route in ROUTES:
+        dispatcher.register(route, handler)
+    for index in range(args.extra_routes):
+        dispatcher.register(f"/feature{index % 10}/control{index}", handler)
+    dispatcher.register("/thingz/*/score", handler)
+
+    cases = {
+        "literal (first route)": [OSCMessage(OSC_SOUND_PLAY, ["tag"])],
+        "literal (last route)": [OSCMessage(OSC_SFX_STOP, [])],
+        "literal (all routes)": [OSCMessage(route, ["tag"]) for route in ROUTES],
+        "incoming pattern": [OSCMessage("/sound/{play,stop}", ["tag"]), OSCMessage("/soundfx/*", [])],
+        "pattern route": [OSCMessage("/thingz/left/score", [1.0])],
+        "unknown address": [OSCMessage("/not/a/route", [])],
+    }
+
+    print(f"{len(dispatcher.addresses())} routes, {args.messages} messages per case")
+    for name, messages in cases.items():
+        table_ns = time_per_message(dispatcher.dispatch, messages, args.messages)
+        if all(message.address in ROUTES or message.address.startswith("/not") for message in messages):
+            chain_ns = time_per_message(lambda message: chain_dispatch(message.address, message.args),
+                                        messages, args.messages)
+            print(f"{name:>22}: table {table_ns:7.1f} ns/msg   if/elif {chain_ns:7.1f} ns/msg")
+        else:
+            print(f"{name:>22}: table {table_ns:7.1f} ns/msg   if/elif    n/a (patterns unsupported)")
+
+    # First sight of an address pays for compiling and matching; later messages hit the resolve cache
+    dispatcher_cold = OSCDispatcher()
+    for route in ROUTES:
+        dispatcher_cold.register(route, handler)
+    start = time.perf_counter()
+    for index in range(1000):
+        dispatcher_cold.resolve(f"/sound/{{play,stop,x{index}}}")
+    print(f"{'cold pattern compile':>22}: {(time.perf_counter() - start) * 1_000_000 / 1000:7.1f} us/address")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+# bench_osc_codec.py
+# Fuzz and throughput benchmark for the OSC decoder in osc_codec.py, measured against a copy of the parser it
+# replaced. The fuzz pass mutates valid packets and checks the decoder only ever returns or raises a
+# ValueError; the comparison pass checks both parsers agree on the i/f/s messages the old one understood.
+#   python bench_osc_codec.py --fuzz 20000 --messages 100000
+#
+# The new decoder is slower than the old one. On the i/f/s messages it was measured 17-110% slower across runs
+# of this benchmark (e.g. 1768 against 1486, 2214 against 1663 and 2048 against 1497 ns/msg), and about 14%
+# slower when both are timed interleaved, best of 60, on a quiet machine (1564 against 1359 ns/msg). That is
+# the price of the bounds checks and the full type tag set; a numbers and strings only fast path was tried and
+# measured no better. The blob case is 1.7-2x slower (about 1.8-2.0 us against 1.0-1.2 us) because the old
+# parser never read the blob: it skipped the tag and mis-read everything after it.
+import sys
+import time
+import random
+import struct
+import argparse
+
+from osc_codec import (parse_message, parse_bundle, encode_message, encode_bundle, TimeTag, Symbol, RGBA,
+                       MidiMessage, IMPULSE, OSC_IMMEDIATE)
+
+# The original OSCServer._parse_osc_message, kept verbatim apart from the logging call for comparison
+def legacy_parse(data: bytes):
+    address_end = data.find(b'\0')
+    address = data[:address_end].decode('utf-8')
+    offset = (address_end + 4) & ~0x03
+
+    type_start = offset
+    type_end = data.find(b'\0', type_start)
+    typetags = data[type_start + 1:type_end].decode('utf-8')
+    offset = (type_end + 4) & ~0x03
+
+    args = []
+    for tag in typetags:
+        if tag == 'i':
+            args.append(struct.unpack('>i', data[offset:offset + 4])[0])
+            offset += 4
+        elif tag == 'f':
+            args.append(struct.unpack('>f', data[offset:offset + 4])[0])
+            offset += 4
+        elif tag == 's':
+            end = data.find(b'\0', offset)
+            val = data[offset:end].decode('utf-8')
+            args.append(val)
+            offset = (end + 4) & ~0x03
+
+    return address.strip(), args
+
+def random_arg(rng: random.Random, depth: int = 0):
+    choice = rng.randrange(13 if depth < 2 else 12)
+    if choice == 0:
+        return rng.randint(-2**31, 2**31 - 1)
+    if choice == 1:
+        return struct.unpack(">f", struct.pack(">f", rng.uniform(-1e6, 1e6)))[0]
+    if choice == 2:
+        return "".join(rng.choice("abcxyz /_-éü") for _ in range(rng.randrange(12)))
+    if choice == 3:
+        return bytes(rng.randrange(256) for _ in range(rng.randrange(40)))
+    if choice == 4:
+        return rng.randint(2**31, 2**62)
+    if choice == 5:
+        return TimeTag(rng.randrange(2**64))
+    if choice == 6:
+        return Symbol("sym" + str(rng.randrange(100)))
+    if choice == 7:
+        return RGBA(*(rng.randrange(256) for _ in range(4)))
+    if choice == 8:
+        return MidiMessage(*(rng.randrange(256) for _ in range(4)))
+    if choice == 9:
+        return rng.choice([True, False])
+    if choice == 10:
+        return None
+    if choice == 11:
+        return IMPULSE
+    return [random_arg(rng, depth + 1) for _ in range(rng.randrange(4))]
+
+def random_packet(rng: random.Random) -> bytes:
+    message = encode_message("/fuzz/" + str(rng.randrange(50)), [random_arg(rng) for _ in range(rng.randrange(6))])
+    if rng.random() < 0.3:
+        return encode_bundle(OSC_IMMEDIATE, [message, encode_message("/fuzz/x", [1, 2.0, "three"])])
+    return message
+
+def mutate(rng: random.Random, packet: bytes) -> bytes:
+    data = bytearray(packet)
+    for _ in range(rng.randrange(1, 4)):
+        action = rng.randrange(3)
+        if action == 0 and data:
+            data[rng.randrange(len(data))] = rng.randrange(256)
+        elif action == 1 and data:
+            del data[rng.randrange(len(data)):]
+        else:
+            data[rng.randrange(len(data) + 1):0] = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 9)))
+    return bytes(data)
+
+def decode(packet: bytes):
+    return parse_bundle(packet) if packet.startswith(b"#bundle\0") else parse_message(packet)
+
+def fuzz(count: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    rejected = 0
+    for index in range(count):
+        packet = random_packet(rng)
+        # Unmutated packets must round trip
+        try:
+            decode(packet)
+        except Exception as e:
+            failures += 1
+            print(f"  valid packet {index} failed: {e!r}")
+
+        try:
+            decode(mutate(rng, packet))
+        except ValueError:
+            rejected += 1
+        except Exception as e:
+            failures += 1
+            print(f"  mutated packet {index} raised {e!r}")
+
+    print(f"Fuzz: {count} packets, {rejected} mutations rejected cleanly, {failures} failures")
+    return failures
+
+def compare(count: int, seed: int) -> int:
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(count):
+        args = [rng.choice([rng.randint(-1000, 1000), float(rng.randint(-1000, 1000)) / 4, "tag" + str(rng.randrange(9))])
+                for _ in range(rng.randrange(5))]
+        packet = encode_message("/sound/play", args)
+        if legacy_parse(packet) != parse_message(packet):
+            mismatches += 1
+    print(f"Agreement with the legacy parser on i/f/s messages: {count - mismatches}/{count}")
+    return mismatches
+
+# Best of several runs so a busy machine does not decide the comparison
+def throughput(name: str, function, packets, count: int, runs: int = 5):
+    workload = [packets[index % len(packets)] for index in range(count)]
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        for packet in workload:
+            function(packet)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:>28}: {count / best:10.0f} msg/s  {best * 1_000_000_000 / count:7.0f} ns/msg")
+
+def main():
+    parser = argparse.ArgumentParser(description="ImproTron OSC decoder fuzz and throughput benchmark")
+    parser.add_argument("--fuzz", type=int, default=20000, help="Random packets to fuzz")
+    parser.add_argument("--messages", type=int, default=100000, help="Messages decoded per throughput case")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    failures = fuzz(args.fuzz, args.seed) + compare(2000, args.seed)
+
+    typical = [encode_message("/sound/play", ["walk", "in", "music"]),
+               encode_message("/spinbox/change", ["leftScore", 2.0]),
+               encode_message("/button/press", ["hotPB3"])]
+    blob = [encode_message("/media/blob", [bytes(8192), 1])]
+
+    throughput("legacy (i/f/s)", legacy_parse, typical, args.messages)
+    throughput("memoryview (i/f/s)", parse_message, typical, args.messages)
+    throughput("legacy (8 KB blob, skipped)", legacy_parse, blob, args.messages)
+    throughput("memoryview (8 KB blob)", parse_message, blob, args.messages)
+
+    bundle = [encode_bundle(OSC_IMMEDIATE, typical)]
+    throughput("memoryview (3 message bundle)", parse_bundle, bundle, args.messages)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# bench_transitions.py
+# Headless benchmark for the display transition compositor. Runs on the offscreen platform so it can be used
+# on a build machine without monitors:
+#   python bench_transitions.py --width 1920 --height 1080 --fps 60
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import sys
+import time
+import argparse
+import statistics
+
+from PySide6.QtCore import Qt, QSize, QTimer
+from PySide6.QtGui import QGuiApplication, QImage, QPainter, QLinearGradient, QColor
+
+from transitions import TransitionCompositor, FrameCache, load_scaled_image, TRANSITION_TYPES, TRANSITION_CUT
+
+# Busy gradients defeat any shortcut the raster engine could take for flat fills
+def make_frame(size: QSize, start: QColor, stop: QColor) -> QImage:
+    image = QImage(size, QImage.Format.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, size.width(), size.height())
+    gradient.setColorAt(0.0, start)
+    gradient.setColorAt(1.0, stop)
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    return image
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+# Compose frames back to back without the timer so only the composition cost is measured
+def bench_render(compositor, from_frame, to_frame, kind, frames):
+    compositor.load_frames(from_frame, to_frame, kind)
+    timings = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        compositor.render_frame(frame / frames)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def bench_realtime(app, compositor, from_frame, to_frame, kind, duration_ms):
+    done = []
+    compositor.finished.connect(lambda: done.append(True))
+    compositor.start(from_frame, to_frame, kind, duration_ms)
+
+    # Guard against a compositor that never finishes
+    QTimer.singleShot(duration_ms * 4 + 1000, app.quit)
+    compositor.finished.connect(app.quit)
+    if not done:
+        app.exec()
+    compositor.finished.disconnect()
+    return compositor.frames_rendered, compositor.missed_deadline
+
+def main():
+    parser = argparse.ArgumentParser(description="ImproTron transition compositor benchmark")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=60)
+    parser.add_argument("--frames", type=int, default=120, help="Frames composed per transition type")
+    parser.add_argument("--duration", type=int, default=500, help="Realtime transition length in ms")
+    parser.add_argument("--image", help="Optional image file to time decode + scale through the frame cache")
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+    size = QSize(args.width, args.height)
+    from_frame = make_frame(size, QColor(Qt.GlobalColor.darkBlue), QColor(Qt.GlobalColor.red))
+    to_frame = make_frame(size, QColor(Qt.GlobalColor.yellow), QColor(Qt.GlobalColor.darkGreen))
+
+    compositor = TransitionCompositor(fps=args.fps)
+    budget = compositor.frame_budget_ms()
+    print(f"Frame size {args.width}x{args.height}, {args.fps} fps, budget {budget:.2f} ms/frame")
+
+    for kind in TRANSITION_TYPES:
+        if kind == TRANSITION_CUT:
+            continue
+        timings = bench_render(compositor, from_frame, to_frame, kind, args.frames)
+        over = sum(1 for t in timings if t > budget)
+        print(f"{kind:>6}: mean {statistics.mean(timings):6.2f} ms  p95 {percentile(timings, 95):6.2f} ms  "
+              f"max {max(timings):6.2f} ms  over budget {over}/{len(timings)}")
+
+    for kind in TRANSITION_TYPES:
+        if kind == TRANSITION_CUT:
+            continue
+        frames, missed = bench_realtime(app, compositor, from_frame, to_frame, kind, args.duration)
+        expected = args.duration * args.fps // 1000
+        print(f"{kind:>6}: realtime {frames}/{expected} frames, {'fell back to cut' if missed else 'completed'}")
+
+    if args.image:
+        cache = FrameCache()
+        start = time.perf_counter()
+        load_scaled_image(args.image, size, True)
+        decode_ms = (time.perf_counter() - start) * 1000
+        cache.scaled_image(args.image, size, True)
+        start = time.perf_counter()
+        cache.scaled_image(args.image, size, True)
+        cached_ms = (time.perf_counter() - start) * 1000
+        print(f"Image decode+scale {decode_ms:.2f} ms, cached lookup {cached_ms:.3f} ms")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# cue_latency.py
+# Cue latency tracing, from an OSC packet arriving to pixels on a display or sound from the music player.
+# The ingress thread stamps every packet as it is read. Dispatch opens a trace for each message and the stages
+# the cue passes through mark it: the media search, the image decode, the first repaint of the display, the
+# player starting and its first position update. The time between consecutive marks is recorded per stage in
+# log-scale histograms, so percentiles over a whole show cost a handful of counters.
+#
+# Handlers run synchronously inside dispatch, so stages on that path mark the active trace without it being
+# passed along. A stage that completes later (a repaint, the player starting) claims the trace and finishes it.
+#
+# Results can be queried over OSC or written to cue_latency.json in the configuration directory:
+#   /latency/query [text]   Replies /latency/stage name count mean p50 p95 p99 max (ms) for every stage
+#                           whose name contains text
+#   /latency/dump           Writes the histograms to the file
+#   /latency/reset          Clears the histograms
+import bisect
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from PySide6.QtCore import QDir, QSaveFile, QIODevice
+
+from osc_codec import encode_message, encode_bundle, OSC_IMMEDIATE
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DUMP_FILE = "cue_latency.json"
+
+OSC_LATENCY_QUERY = "/latency/query"
+OSC_LATENCY_DUMP = "/latency/dump"
+OSC_LATENCY_RESET = "/latency/reset"
+OSC_LATENCY_STAGE = "/latency/stage"
+
+class LatencyHistogram:
+    # Upper bucket bounds in ms; the last bucket takes everything slower
+    BOUNDS_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float):
+        self.counts[bisect.bisect_left(self.BOUNDS_MS, latency_ms)] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        if latency_ms > self.max_ms:
+            self.max_ms = latency_ms
+
+    # Upper bound of the bucket holding the percentile, never more than the slowest value seen
+    def percentile(self, percent: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                bound = self.BOUNDS_MS[index] if index < len(self.BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> dict:
+        return {"count": self.count, "mean": self.total_ms / self.count if self.count else 0.0,
+                "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99),
+                "max": self.max_ms, "buckets": dict(zip([str(bound) for bound in self.BOUNDS_MS] + ["inf"], self.counts))}
+
+# One cue on its way through the stages. label names the chain, e.g. the OSC address or "Hot button".
+class CueTrace:
+    __slots__ = ("trace_id", "label", "started_ns", "last_ns", "claimed", "finished")
+
+    def __init__(self, trace_id: int, label: str, started_ns: int):
+        self.trace_id = trace_id
+        self.label = label
+        self.started_ns = started_ns
+        self.last_ns = started_ns
+        self.claimed = False
+        self.finished = False
+
+class CueTracer:
+    MAX_OPEN_TRACES = 64
+    MAX_HISTOGRAMS = 128
+
+    def __init__(self):
+        self._histograms = {}           # "label stage" -> LatencyHistogram
+        self._open = OrderedDict()      # trace id -> claimed trace still waiting for its last stage
+        self._active = None
+        self._next_id = 1
+        self._osc_server = None
+        self._dump_file = ""
+
+    # A new trace that becomes the active one. started_ns is when the cue began (perf_counter_ns), e.g. the
+    # packet's arrival; 0 means now. The wait before this call is recorded as the "queue" stage.
+    def begin(self, label: str, started_ns: int = 0) -> CueTrace:
+        now_ns = time.perf_counter_ns()
+        trace = CueTrace(self._next_id, label, started_ns or now_ns)
+        self._next_id += 1
+        if started_ns:
+            self._record(trace, "queue", now_ns)
+        self._active = trace
+        return trace
+
+    # A trace for a cue that did not come through dispatch, such as a click, already claimed by the caller
+    def start(self, label: str) -> CueTrace:
+        trace = CueTrace(self._next_id, label, time.perf_counter_ns())
+        self._next_id += 1
+        return self.claim(trace)
+
+    # Called when dispatch of the active trace is over. A trace nobody claimed is finished here.
+    def end(self, trace: CueTrace | None):
+        if trace is None:
+            return
+        if self._active is trace:
+            self._active = None
+        if not trace.claimed:
+            self.finish(trace, "handled")
+
+    def active(self) -> CueTrace | None:
+        return self._active
+
+    # Take the active trace along to a stage that completes after dispatch returns
+    def claim(self, trace: CueTrace | None = None) -> CueTrace | None:
+        trace = trace or self._active
+        if trace is None or trace.finished:
+            return None
+
+        if not trace.claimed:
+            trace.claimed = True
+            self._open[trace.trace_id] = trace
+            # Cues whose last stage never happens (a missing file, a failed decode) must not pile up
+            while len(self._open) > self.MAX_OPEN_TRACES:
+                self._open.popitem(last=False)[1].finished = True
+        return trace
+
+    def mark(self, stage: str, trace: CueTrace | None = None):
+        trace = trace or self._active
+        if trace is not None and not trace.finished:
+            self._record(trace, stage, time.perf_counter_ns())
+
+    # Mark the final stage and record the whole cue. Later marks and finishes of the trace are ignored, so
+    # a cue shown on both displays counts once, at the first paint.
+    def finish(self, trace: CueTrace | None, stage: str):
+        if trace is None or trace.finished:
+            return
+        now_ns = time.perf_counter_ns()
+        self._record(trace, stage, now_ns)
+        self._histogram(f"{trace.label} total").record((now_ns - trace.started_ns) / 1_000_000)
+        trace.finished = True
+        self._open.pop(trace.trace_id, None)
+
+    def _record(self, trace: CueTrace, stage: str, now_ns: int):
+        self._histogram(f"{trace.label} {stage}").record((now_ns - trace.last_ns) / 1_000_000)
+        trace.last_ns = now_ns
+
+    def _histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            # Labels can come from OSC addresses, so keep the set of histograms bounded
+            if len(self._histograms) >= self.MAX_HISTOGRAMS:
+                name = "other " + name.rsplit(" ", 1)[-1]
+                histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = LatencyHistogram()
+                self._histograms[name] = histogram
+        return histogram
+
+    def summaries(self) -> dict:
+        return {name: histogram.summary() for name, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        self._histograms.clear()
+        self._open.clear()
+
+    def dump(self, file_name: str) -> bool:
+        save_file = QSaveFile(file_name)
+        if not save_file.open(QIODevice.WriteOnly):
+            logger.error(f"Cue Latency: Could not save {file_name}: {save_file.errorString()}")
+            return False
+        save_file.write(json.dumps(self.summaries(), indent=2).encode("utf8"))
+        if not save_file.commit():
+            logger.error(f"Cue Latency: Failed to commit {file_name}")
+            return False
+        logger.info(f"Cue Latency: Histograms for {len(self._histograms)} stages saved to {file_name}")
+        return True
+
+    # ----------------------------------------------------------------------
+    # OSC access
+    # ----------------------------------------------------------------------
+    def register_osc_routes(self, osc_server, config_dir: str):
+        self._osc_server = osc_server
+        self._dump_file = QDir(config_dir).filePath(LATENCY_DUMP_FILE)
+        osc_server.register_route(OSC_LATENCY_QUERY, self._on_query)
+        osc_server.register_route(OSC_LATENCY_DUMP, lambda message: self.dump(self._dump_file))
+        osc_server.register_route(OSC_LATENCY_RESET, lambda message: self.reset())
+
+    def save(self):
+        if self._histograms and self._dump_file:
+            self.dump(self._dump_file)
+
+    def _on_query(self, message):
+        selector = str(message.args[0]) if message.args else ""
+        elements = []
+        for name, histogram in sorted(self._histograms.items()):
+            if selector in name:
+                summary = histogram.summary()
+                elements.append(encode_message(OSC_LATENCY_STAGE, [name, summary["count"], summary["mean"],
+                                                                   summary["p50"], summary["p95"], summary["p99"],
+                                                                   summary["max"]]))
+        # Small bundles keep each reply datagram under a typical MTU
+        for start in range(0, len(elements), 8):
+            self._osc_server.send_to(message.source, encode_bundle(OSC_IMMEDIATE, elements[start:start + 8]))
+
+# The process wide tracer. Traces cross the OSC server, media features and displays, which otherwise share
+# nothing, so they all record here instead of passing a tracer through every constructor.
+cue_tracer = CueTracer()
@@ -0,0 +1,267 @@
+# fade_engine.py
+# Volume fades, crossfades and ducking that keep moving while the GUI is busy. Ramps are computed on a dedicated
+# thread from a precise timer, against the time they started rather than the number of ticks seen, so a late
+# tick lands where the curve should be instead of stretching the fade. The outputs themselves stay on the GUI
+# thread with their players, as Qt Multimedia requires, so each tick's levels are handed back there in one
+# queued call and set on the outputs. A busy GUI thread can delay a step, but the step it applies is always
+# where the curve is now, so a fade never stalls or drifts part way.
+#
+# Each target (an audio output or a sound effect) plays at its base level times the value of each of its lanes,
+# e.g. "fade" and "duck", so a duck under a sound effect and an operator's fade combine instead of fighting over
+# the one volume setting. Commands from the GUI thread are queued under a lock and applied at the next tick.
+# Completion callbacks run back on the GUI thread.
+import logging
+import math
+import threading
+import time
+
+from PySide6.QtCore import QObject, QThread, QTimer, Signal, Slot, Qt
+
+logger = logging.getLogger(__name__)
+
+CURVE_LINEAR = "linear"
+CURVE_EQUAL_POWER = "equal_power" # sin/cos; a crossfade keeps constant power
+CURVE_EXPONENTIAL = "exponential" # Even steps in dB, which sounds even to the ear
+CURVE_S = "s_curve"               # Eases in and out
+CURVE_OUT_QUAD = "out_quad"       # Quick start, gentle landing; the long standing music fade
+CURVES = (CURVE_LINEAR, CURVE_EQUAL_POWER, CURVE_EXPONENTIAL, CURVE_S, CURVE_OUT_QUAD)
+
+_FLOOR_DB = -60.0
+
+# Value of a ramp from start to end at progress t in [0, 1]
+def curve_value(curve: str, start: float, end: float, t: float) -> float:
+    if t >= 1.0:
+        return end
+    if curve == CURVE_EQUAL_POWER:
+        weight = math.sin(t * math.pi / 2) if end >= start else 1.0 - math.cos(t * math.pi / 2)
+    elif curve == CURVE_EXPONENTIAL:
+        start_db = 20.0 * math.log10(start) if start > 0.0 else _FLOOR_DB
+        end_db = 20.0 * math.log10(end) if end > 0.0 else _FLOOR_DB
+        return 10.0 ** ((start_db + (end_db - start_db) * t) / 20.0)
+    elif curve == CURVE_S:
+        weight = t * t * (3.0 - 2.0 * t)
+    elif curve == CURVE_OUT_QUAD:
+        weight = 1.0 - (1.0 - t) * (1.0 - t)
+    else:
+        weight = t
+    return start + (end - start) * weight
+
+class _Ramp:
+    __slots__ = ("ramp_id", "start", "end", "started_ns", "duration_ns", "curve")
+
+    def __init__(self, ramp_id: int, start, end: float, started_ns: int, duration_ns: int, curve: str):
+        self.ramp_id = ramp_id
+        self.start = start          # None until applied: the lane's value at that moment
+        self.end = end
+        self.started_ns = started_ns # 0 until applied
+        self.duration_ns = duration_ns
+        self.curve = curve
+
+class _Target:
+    __slots__ = ("base", "lanes", "ramps", "applied")
+
+    def __init__(self, base: float):
+        self.base = base
+        self.lanes = {}   # lane -> value
+        self.ramps = {}   # lane -> _Ramp
+        self.applied = None
+
+    def level(self) -> float:
+        level = self.base
+        for value in self.lanes.values():
+            level *= value
+        return max(0.0, min(1.0, level))
+
+# Lives on the fade thread. The timer runs only while a ramp is in progress.
+class _FadeWorker(QObject):
+    rampsFinished = Signal(list)
+    levelsChanged = Signal(list) # (key, level) of the targets whose level moved this tick
+
+    def __init__(self, engine, interval_ms: int):
+        super().__init__()
+        self._engine = engine
+        self._interval_ms = interval_ms
+        self._targets = {}
+        self._timer = None
+
+    @Slot()
+    def wake(self):
+        if self._timer is None:
+            self._timer = QTimer(self)
+            self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+            self._timer.setInterval(self._interval_ms)
+            self._timer.timeout.connect(self.tick)
+        self.tick()
+
+    @Slot()
+    def tick(self):
+        self._apply(self._engine._take_commands())
+        now_ns = time.perf_counter_ns()
+        finished = []
+        changed = []
+        ramping = False
+        for key, target in self._targets.items():
+            for lane, ramp in list(target.ramps.items()):
+                if not ramp.started_ns:
+                    ramp.started_ns = now_ns
+                    if ramp.start is None:
+                        ramp.start = target.lanes.get(lane, 1.0)
+                t = (now_ns - ramp.started_ns) / ramp.duration_ns if ramp.duration_ns else 1.0
+                target.lanes[lane] = curve_value(ramp.curve, ramp.start, ramp.end, t)
+                if t >= 1.0:
+                    del target.ramps[lane]
+                    finished.append(ramp.ramp_id)
+                else:
+                    ramping = True
+
+            level = target.level()
+            if level != target.applied:
+                target.applied = level
+                changed.append((key, level))
+
+        if ramping:
+            if not self._timer.isActive():
+                self._timer.start()
+        elif self._timer.isActive():
+            self._timer.stop()
+        if changed:
+            self.levelsChanged.emit(changed)
+        if finished:
+            self.rampsFinished.emit(finished)
+
+    def _apply(self, commands: list):
+        for command in commands:
+            kind, key = command[0], command[1]
+            if kind == "add":
+                self._targets[key] = _Target(command[2])
+                continue
+            if kind == "remove":
+                self._targets.pop(key, None)
+                continue
+
+            target = self._targets.get(key)
+            if target is None:
+                continue
+            if kind == "base":
+                target.base = command[2]
+            elif kind == "lane":
+                _, _, lane, value = command
+                target.ramps.pop(lane, None)
+                target.lanes[lane] = value
+            elif kind == "ramp":
+                _, _, lane, ramp = command
+                target.ramps[lane] = ramp
+                if ramp.start is not None:
+                    target.lanes[lane] = ramp.start
+            elif kind == "cancel":
+                target.ramps.pop(command[2], None)
+
+# GUI thread facade. Targets are keyed by any hashable object, usually the output whose volume they set.
+class FadeEngine(QObject):
+    _wakeRequested = Signal()
+
+    TICK_MS = 5
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._commands = []
+        self._next_id = 1
+        self._callbacks = {}     # ramp id -> callable run when the ramp completes
+        self._lane_ramps = {}    # (key, lane) -> ramp id in progress
+        self._setters = {}       # key -> setter, called on the GUI thread
+
+        self._thread = QThread()
+        self._worker = _FadeWorker(self, self.TICK_MS)
+        self._worker.moveToThread(self._thread)
+        self._wakeRequested.connect(self._worker.wake)
+        self._worker.rampsFinished.connect(self._on_ramps_finished)
+        self._worker.levelsChanged.connect(self._on_levels_changed)
+        self._thread.start(QThread.Priority.HighestPriority)
+
+    # setter receives the combined level in [0, 1] on the GUI thread
+    def add_target(self, key, setter, base: float = 1.0):
+        self._setters[key] = setter
+        self._queue(("add", key, base))
+
+    def remove_target(self, key):
+        self._drop_lanes(key)
+        self._setters.pop(key, None)
+        self._queue(("remove", key))
+
+    def set_base(self, key, level: float):
+        self._queue(("base", key, level))
+
+    # Set a lane at once, ending any ramp on it
+    def set_lane(self, key, lane: str, value: float):
+        self._drop_ramp(key, lane)
+        self._queue(("lane", key, lane, value))
+
+    # Ramp a lane to end over duration_ms, from start or from wherever it is. on_finished runs on the GUI thread
+    # when the ramp completes, but not when it is replaced or cancelled first.
+    def ramp(self, key, lane: str, end: float, duration_ms: int, curve: str = CURVE_LINEAR, start: float = None,
+             on_finished=None) -> int:
+        if curve not in CURVES:
+            logger.warning(f"Fade Engine: Unknown curve {curve}, using {CURVE_LINEAR}")
+            curve = CURVE_LINEAR
+        self._drop_ramp(key, lane)
+        ramp_id = self._next_id
+        self._next_id += 1
+        self._lane_ramps[(key, lane)] = ramp_id
+        if on_finished is not None:
+            self._callbacks[ramp_id] = on_finished
+        self._queue(("ramp", key, lane, _Ramp(ramp_id, start, end, 0, max(0, duration_ms) * 1_000_000, curve)))
+        return ramp_id
+
+    # Stop a lane where it is
+    def cancel(self, key, lane: str):
+        self._drop_ramp(key, lane)
+        self._queue(("cancel", key, lane))
+
+    def is_ramping(self, key, lane: str) -> bool:
+        return (key, lane) in self._lane_ramps
+
+    def shutdown(self):
+        self._thread.quit()
+        self._thread.wait(1000)
+
+    def _queue(self, command: tuple):
+        with self._lock:
+            self._commands.append(command)
+            wake = len(self._commands) == 1
+        if wake:
+            self._wakeRequested.emit()
+
+    # Called from the fade thread
+    def _take_commands(self) -> list:
+        with self._lock:
+            commands = self._commands
+            self._commands = []
+        return commands
+
+    def _drop_ramp(self, key, lane: str):
+        ramp_id = self._lane_ramps.pop((key, lane), None)
+        if ramp_id is not None:
+            self._callbacks.pop(ramp_id, None)
+
+    def _drop_lanes(self, key):
+        for target_key, lane in [entry for entry in self._lane_ramps if entry[0] is key]:
+            self._drop_ramp(target_key, lane)
+
+    @Slot(list)
+    def _on_levels_changed(self, levels):
+        for key, level in levels:
+            setter = self._setters.get(key)
+            if setter is not None:
+                setter(level)
+
+    @Slot(list)
+    def _on_ramps_finished(self, ramp_ids):
+        for ramp_id in ramp_ids:
+            for entry, lane_ramp_id in list(self._lane_ramps.items()):
+                if lane_ramp_id == ramp_id:
+                    del self._lane_ramps[entry]
+                    break
+            callback = self._callbacks.pop(ramp_id, None)
+            if callback is not None:
+                callback()
@@ -0,0 +1,148 @@
+# file_cache.py
+# Shared plumbing for services that work through media files in the background and remember the results.
+# Each result is a NamedTuple whose first field is the file's path, followed by the file's size and modification
+# time; it stays valid for as long as those are unchanged. Results are kept in a JSON cache in the configuration
+# directory, keyed by path. Requests are queued and handed to a worker on a low priority thread one at a time,
+# with a pause in between so the work never competes with show playback.
+import json
+import logging
+from collections import deque
+
+from PySide6.QtCore import QObject, Signal, Slot, QThread, QTimer, QFileInfo, QDir, QSaveFile, QIODevice
+
+logger = logging.getLogger(__name__)
+
+# True when the file at path is still the one with the given size and modification time
+def file_unchanged(path: str, size: int, modified_ms: int) -> bool:
+    info = QFileInfo(path)
+    return info.exists() and info.size() == size and info.lastModified().toMSecsSinceEpoch() == modified_ms
+
+# Size and modification time of a file, as stored in a result
+def file_stamp(path: str) -> tuple[int, int]:
+    info = QFileInfo(path)
+    return info.size(), info.lastModified().toMSecsSinceEpoch()
+
+# GUI thread base for a cached background service. Subclasses start their worker with _start_worker(), turn its
+# results into entries and hand them to _store(), then emit their own signal for the path.
+class CachedFileService(QObject):
+    _workRequested = Signal(str)
+
+    THROTTLE_MS = 250
+    SAVE_DELAY_MS = 2000
+
+    def __init__(self, config_dir: str, cache_name: str, entry_type, log_name: str, parent=None):
+        super().__init__(parent)
+        self._cache_file = QDir(config_dir).filePath(cache_name)
+        self._entry_type = entry_type
+        self._log_name = log_name
+        self._entries = {}
+        self._pending = deque()
+        self._queued = set()
+        self._busy = False
+        self._paused = False
+        self._load_cache()
+
+        self._throttle = QTimer(self)
+        self._throttle.setSingleShot(True)
+        self._throttle.setInterval(self.THROTTLE_MS)
+        self._throttle.timeout.connect(self._next)
+
+        # Batch cache writes so a folder of new files is not saved once per file
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(self.SAVE_DELAY_MS)
+        self._save_timer.timeout.connect(self.save_cache)
+
+        self._thread = QThread()
+        self._worker = None
+
+    # Move the worker to the service thread; work is the worker slot that takes a path
+    def _start_worker(self, worker: QObject, work):
+        self._worker = worker
+        self._worker.moveToThread(self._thread)
+        self._workRequested.connect(work)
+        self._thread.start(QThread.Priority.LowPriority)
+
+    # Entry for a file, or None when it has not been processed yet or the file has changed since
+    def entry(self, path: str):
+        entry = self._entries.get(QFileInfo(path).absoluteFilePath())
+        if entry is not None and entry.is_current():
+            return entry
+        return None
+
+    # Whether a file still needs work; by default, whenever it has no current entry
+    def _needs_work(self, path: str) -> bool:
+        return self.entry(path) is None
+
+    def request(self, path: str):
+        path = QFileInfo(path).absoluteFilePath()
+        if path in self._queued or not self._needs_work(path):
+            return
+
+        self._queued.add(path)
+        self._pending.append(path)
+        if not self._busy and not self._paused and not self._throttle.isActive():
+            self._throttle.start()
+
+    def set_paused(self, paused: bool):
+        self._paused = paused
+        if not paused and not self._busy and self._pending:
+            self._throttle.start()
+
+    @Slot()
+    def _next(self):
+        if self._busy or self._paused or not self._pending:
+            return
+
+        self._busy = True
+        self._workRequested.emit(self._pending.popleft())
+
+    # Record the worker's result for a path and move on to the next request
+    def _store(self, entry):
+        self._busy = False
+        self._queued.discard(entry.path)
+        self._entries[entry.path] = entry
+        self._save_timer.start()
+
+        if self._pending:
+            self._throttle.start()
+
+    def _load_cache(self):
+        if not QFileInfo.exists(self._cache_file):
+            return
+
+        try:
+            with open(self._cache_file, "r", encoding="utf8") as json_file:
+                cache_data = json.load(json_file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"{self._log_name}: Could not read {self._cache_file}: {e}")
+            return
+
+        for path, fields in cache_data.items():
+            try:
+                self._entries[path] = self._entry_type(path, **fields)
+            except TypeError:
+                continue
+
+    @Slot()
+    def save_cache(self):
+        # Entries for files that have gone away are dropped on save
+        cache_data = {path: entry._asdict() for path, entry in self._entries.items() if entry.is_current()}
+        for fields in cache_data.values():
+            del fields["path"]
+
+        save_file = QSaveFile(self._cache_file)
+        if save_file.open(QIODevice.WriteOnly):
+            save_file.write(json.dumps(cache_data, indent=2).encode("utf8"))
+            if not save_file.commit():
+                logger.error(f"{self._log_name}: Failed to commit {self._cache_file}")
+        else:
+            logger.error(f"{self._log_name}: Could not save {self._cache_file}: {save_file.errorString()}")
+
+    def shutdown(self):
+        self._pending.clear()
+        if self._save_timer.isActive():
+            self._save_timer.stop()
+            self.save_cache()
+        self._thread.quit()
+        self._thread.wait(2000)
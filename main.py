@@ -8,6 +8,7 @@ import traceback
 from PySide6.QtCore import QStandardPaths, QLoggingCategory
 from PySide6.QtWidgets import QApplication
 from ImproTronControlBoard import ImproTronControlBoard
+from settings import Settings
 
 # Commands to use in the build process. Used a Use a Developer Command Prompt for VS 202x
 #.qtcreator\venv3.12\Scripts\activate.bat
@@ -53,7 +54,13 @@ def main():
     # Additional suppression after QApplication creation
     QLoggingCategory.setFilterRules("qt.multimedia*=false")
 
+    # Replaces the saved listeners; remembered for later runs
+    if args.osc_listen is not None:
+        Settings().set_osc_endpoints(args.osc_listen)
+
     improTronControlBoard = ImproTronControlBoard()
+    if args.osc_record:
+        improTronControlBoard.oscServer.start_recording(args.osc_record)
     result = app.exec()
     del improTronControlBoard
     return result
@@ -66,6 +73,18 @@ if __name__ == "__main__":
         help="Set the logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL). Default: INFO.",
         choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
     )
+    parser.add_argument(
+        "--osc-listen",
+        action="append",
+        metavar="ENDPOINT",
+        help="Also listen for OSC on ENDPOINT: host:port, [ipv6]:port or a multicast group:port[@interface]. "
+             "Repeat for several; saved for later runs. --osc-listen= clears them."
+    )
+    parser.add_argument(
+        "--osc-record",
+        metavar="FILE",
+        help="Record all incoming OSC traffic with timestamps to FILE for replay with osc_loadgen.py."
+    )
     try:
         args = parser.parse_args()
     except argparse.ArgumentError as e:
@@ -1,14 +1,25 @@
 # media_features.py
 import logging
-from PySide6.QtCore import (Qt, QObject, Slot, Signal, QFileInfo, QDirIterator, QUrl, QRandomGenerator, QVariantAnimation,
-                                QEasingCurve, QFile, QJsonDocument, QSaveFile, QIODevice, QDir, QModelIndex, QFileSystemWatcher)
-from PySide6.QtGui import QImageReader, QColor, QMovie
+from PySide6.QtCore import (Qt, QObject, Slot, Signal, QFileInfo, QDirIterator, QRandomGenerator, QTimer, QDir,
+                                QModelIndex, QFileSystemWatcher)
+from PySide6.QtGui import QImageReader, QColor, QMovie, QAction
 from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox, QStyle, QPushButton, QListWidgetItem, QColorDialog
-from PySide6.QtMultimedia import QMediaPlayer, QSoundEffect, QAudioOutput, QMediaMetaData, QMediaFormat
+from PySide6.QtMultimedia import QMediaPlayer, QMediaMetaData, QMediaFormat
 from Improtronics import SoundFX
 from MediaFileDatabase import TagFilterProxyModel, MediaFileRegistry
 from monitor_preview import SmartOverlayLabel
+from playlist_format import (read_playlist, write_playlist, entry_for_path, PlaylistDurationRole, KIND_SOUND_QUEUE,
+                             KIND_SFX_PALETTE, MEDIA_UNKNOWN, MEDIA_IMAGE, MEDIA_ANIMATION, MEDIA_VIDEO, MEDIA_AUDIO)
 import utilities
+from cue_latency import cue_tracer
+from sound_pool import SoundEffectPool
+from audio_mixer import MIXER_AVAILABLE
+from audio_output import AudioMixerOutput
+from music_deck import MusicDeck
+from palette_loader import PaletteLoader
+from fade_engine import FadeEngine, CURVE_OUT_QUAD, CURVE_EXPONENTIAL
+from sound_analysis import SoundAnalysisService
+from waveform import WaveformView
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +28,21 @@ class MediaFeatures(QObject):
     mainMediaShow = Signal(str)    # Custom signal that decouples the media display from controlboard
     auxMediaShow  = Signal(str)    # Custom signal that decouples the media display from controlboard
     stopAllSFX    = Signal()       # Custom signal that signals all sound to stop
+    musicProgress = Signal(int, int)      # Music player position and duration in ms
+    musicTrackChanged = Signal(str, str)  # Title and artist of the loaded track
+    musicOnsetsChanged = Signal(list)     # Onset times in seconds of the loaded track, once analyzed
+    sfxStateChanged = Signal(int, str, bool) # Palette button number, label and whether it is playing
+
+    SFX_PRELOAD_MAX_BYTES = 4 * 1024 * 1024 # About 20 s of 16 bit stereo at 48 kHz
+    FADE_LANE = "fade"
+    DUCK_LANE = "duck"
+    DUCK_ATTACK_MS = 50
+    DUCK_RELEASE_MS = 400
 
     def __init__(self, ui, settings, media_model, mainDisplay, auxiliaryDisplay):
         super(MediaFeatures, self).__init__()
 
         self.ui = ui
-        self.active_sound_effects = []
         self._settings = settings
         self.media_model = media_model
         self.mainDisplay = mainDisplay
@@ -50,6 +70,43 @@ class MediaFeatures(QObject):
         sound_count = self.media_file_database.index_sounds(self._settings.get_sound_directory())
         self.ui.soundFilesCountLBL.setText(str(sound_count))
 
+        # Sound effects are mixed in software when NumPy and an audio output are available, otherwise each
+        # plays through its own QSoundEffect
+        self.audio_output = None
+        self.audio_mixer = None
+        if MIXER_AVAILABLE:
+            self.audio_output = AudioMixerOutput(parent=self)
+            self.audio_mixer = self.audio_output.mixer
+            if self.audio_mixer is None:
+                self.audio_output = None
+            else:
+                self._osc_voices = set() # Mixer voices started over OSC, stopped by an empty /soundfx/play
+                self.audio_output.voiceFinished.connect(self._osc_voices.discard)
+                self.stopAllSFX.connect(self._stop_osc_voices)
+        else:
+            logger.info("NumPy is not installed; sound effects play through QSoundEffect")
+
+        # OSC triggered sound effects play from preloaded voices
+        self.sfx_pool = SoundEffectPool(self)
+        self.stopAllSFX.connect(self.sfx_pool.stop_all)
+        self._sfx_files = {} # OSC tag list -> sound effect file
+
+        # With the mixer, palettes are decoded in the background and swapped onto the buttons once complete
+        self.palette_loader = None
+        if self.audio_mixer is not None:
+            self.palette_loader = PaletteLoader(self.audio_mixer.sample_rate, self.audio_mixer.channels,
+                                                self._settings.get_palette_budget_mb() * 1024 * 1024, self)
+            self.palette_loader.paletteLoaded.connect(self._on_palette_loaded)
+            self.palette_loader.progress.connect(self._on_palette_progress)
+            self.palette_loader.pinsChanged.connect(self._on_palette_pins_changed)
+        self._stinger_bags = {} # Normalized OSC tag list -> (sound index generation it was filled from, ShuffleBag)
+        self.preload_sfx()
+
+        # Title, artist, duration and loudness of the sound library, measured in the background
+        self.sound_analysis = SoundAnalysisService(self._settings.get_config_dir(), self)
+        self.sound_analysis.analysisReady.connect(self._on_sound_analyzed)
+        self.analyze_sounds()
+
         # Setup recursive filesystem watcher
         self._dir_watcher = QFileSystemWatcher(self)
         self._dir_watcher.directoryChanged.connect(self._on_directory_updated)
@@ -65,18 +122,37 @@ class MediaFeatures(QObject):
         self.all_supported_slide_formats = set()
         self._initialize_supported_slide_formats()
 
-        # Audio Player
-        self.music_player = QMediaPlayer(self)
-        self.music_audio = QAudioOutput(self)
-        self.music_player.setAudioOutput(self.music_audio)
-
-        # Auto-advance logic
-        self.music_player.mediaStatusChanged.connect(self._on_status_changed)
-
-        # Variables for fade control
-        self._fade_animation = QVariantAnimation(self)
-        self._fade_animation.valueChanged.connect(self._handle_fade_step)
-        self._fade_animation.finished.connect(self._finalize_music_stop)
+        # Fades, crossfades and ducking run on the fade engine's own thread so they stay smooth while the GUI is busy
+        self.fade_engine = FadeEngine(self)
+
+        # Audio Player. The deck keeps a second player primed with the next queue entry; music_player is
+        # always the one playing and the player signals below follow it when the deck swaps players.
+        self.music_deck = MusicDeck(self.fade_engine, self)
+        self.music_deck.crossfade_ms = self._settings.get_music_crossfade_ms()
+        self.music_deck.playerSwapped.connect(self._on_music_player_swapped)
+        self.music_deck.crossfadeDue.connect(self._on_crossfade_due)
+        self.music_deck.gain_lookup = self._music_gain
+        self.music_deck.stream_min_bytes = self._settings.get_stream_min_mb() * 1024 * 1024
+        self.music_player = self.music_deck.player
+        self.music_audio = self.music_player.audioOutput()
+
+        # Auto-advance logic, progress, metadata and errors
+        for signal, slot in self._music_player_connections(self.music_player):
+            signal.connect(slot)
+
+        # Waveform overview of the loaded track under the mini player's progress bar
+        self.waveform_view = WaveformView(self.ui.musicPlayerProgress.parentWidget())
+        self.waveform_view.seekRequested.connect(self._seek_music)
+        progress_layout = self.ui.musicPlayerProgress.parentWidget().layout()
+        progress_layout.insertWidget(progress_layout.indexOf(self.ui.musicPlayerProgress) + 1, self.waveform_view)
+        self._sound_trace = None # OSC sound cue waiting to be heard
+
+        # Music drops by duck_db while any sound effect plays and comes back once they have all finished
+        self._duck_db = self._settings.get_duck_under_sfx_db()
+        self._ducked = False
+        self._duck_timer = QTimer(self)
+        self._duck_timer.setInterval(100)
+        self._duck_timer.timeout.connect(self._check_duck)
 
         # Promote the screen preview labels so they can handle GIFs with smart overlays
         # --- 1. GAME TAB PREVIEW (mediaSearchPreviewLBL) REPLACEMENT ---
@@ -127,8 +203,11 @@ class MediaFeatures(QObject):
         # from the grid
         for button in range(self.ui.soundFXGrid.count()):
             sfx_button = self.ui.findChild(QPushButton, "soundFXPB" +str(button+1))
-            _soundFX = SoundFX(sfx_button, self.media_file_database)
+            _soundFX = SoundFX(sfx_button, self.media_file_database, self.fade_engine, self.audio_output)
             _soundFX.set_fx_volume(_volume)
+            _soundFX.stateChanged.connect(lambda number=button+1, sfx=_soundFX:
+                                          self.sfxStateChanged.emit(number, sfx.label(), sfx.is_playing()))
+            _soundFX.stateChanged.connect(lambda sfx=_soundFX: self._on_sfx_state_changed(sfx))
             self.sfx_buttons.append(_soundFX)
 
         # Use standard icons
@@ -143,6 +222,13 @@ class MediaFeatures(QObject):
 
         # Sound Pallettes
         self.palletteSelect = self.ui.soundPalettesCB
+        if self.palette_loader is not None:
+            # Right click a palette to keep it in memory for instant switching
+            self._pin_palette_action = QAction("Keep in Memory", self.palletteSelect)
+            self._pin_palette_action.setCheckable(True)
+            self._pin_palette_action.triggered.connect(self.pin_current_palette)
+            self.palletteSelect.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
+            self.palletteSelect.addAction(self._pin_palette_action)
         self.load_sound_pallettes()
 
         self.connect_slots()
@@ -217,14 +303,6 @@ class MediaFeatures(QObject):
         self.ui.fadePlayerPB.setIcon(QApplication.style().standardIcon(QStyle.SP_MediaVolumeMuted))
         self.ui.fadePlayerPB.clicked.connect(self.music_fade)
 
-        # Connect the media player to retrieve duration after the file is loaded
-        self.music_player.positionChanged.connect(self._update_player_progress)
-        self.music_player.durationChanged.connect(self._update_player_duration)
-        self.music_player.metaDataChanged.connect(self.update_metadata_display)
-
-        # Connect error signal
-        self.music_player.errorOccurred.connect(self.music_player_handle_error)
-
         # Sound Palletes
         self.palletteSelect.currentIndexChanged.connect(self.load_sound_effects)
 # #### connections
@@ -277,6 +355,8 @@ class MediaFeatures(QObject):
         if sound_root and updated_path.startswith(sound_root):
             count = self.media_file_database.index_sounds(sound_root)
             self.ui.soundFilesCountLBL.setText(str(count))
+            self.preload_sfx()
+            self.analyze_sounds()
             # Re-apply current search box text over the updated model
             self.search_sounds()
 
@@ -318,6 +398,18 @@ class MediaFeatures(QObject):
         else:
             return False
 
+    # Classify a file for the metadata kept in saved playlists
+    def media_type(self, file_name):
+        if self.isVideo(file_name):
+            return MEDIA_VIDEO
+        if self.isAnimatedGIF(file_name):
+            return MEDIA_ANIMATION
+        if self.isImage(file_name):
+            return MEDIA_IMAGE
+        if f"*.{QFileInfo(file_name).suffix().lower()}" in self.media_file_database.sounds_supported():
+            return MEDIA_AUDIO
+        return MEDIA_UNKNOWN
+
     # Query Qt Multimedia for supported video file extensions
     def _initialize_supported_video_formats(self):
         media_format = QMediaFormat()
@@ -384,47 +476,36 @@ class MediaFeatures(QObject):
 
     # Helper function that loads a file name for OSC and from a UI selection
     def read_queue(self,fileName):
-
-        file = QFile(fileName)
-        if not file.open(QIODevice.ReadOnly):
+        if not QFileInfo.exists(fileName):
             logger.error(f"Music Player Error: {fileName} does not exist")
             return
 
-        info = QFileInfo(fileName)
-        self.ui.soundFileNameLBL.setText(info.completeBaseName())
-
-        raw_data = file.readAll()
-        file.close()
-
-        # Parse to Python Dictionary
-        doc = QJsonDocument.fromJson(raw_data)
-        if doc.isNull():
-            logger.error(f"Invalid JSON format for music queue {fileName}.")
+        entries = read_playlist(fileName)
+        if not entries:
+            logger.error(f"Music Player Error: No sounds loaded from {fileName}")
             return
 
-        # toVariant() converts the JSON directly to a Python dict or list
-        sound_data = doc.toVariant()
-
-        if isinstance(sound_data, dict):
-            self.ui.soundQueueLW.clear()
+        info = QFileInfo(fileName)
+        self.ui.soundFileNameLBL.setText(info.completeBaseName())
+        self.ui.soundQueueLW.clear()
 
-            # We sort the keys (sound0, sound1, etc.) to ensure the
-            # queue loads in the correct numerical order.
-            for key in sorted(sound_data.keys()):
-                path = sound_data[key]
-                if path:
-                    file_info = QFileInfo(path)
+        for entry in entries:
+            if not entry.path:
+                continue
+            file_info = QFileInfo(entry.path)
 
-                    # Create standard item with the filename as the text
-                    item = QListWidgetItem(file_info.fileName(), self.ui.soundQueueLW)
+            # Create standard item with the filename as the text
+            item = QListWidgetItem(file_info.fileName(), self.ui.soundQueueLW)
 
-                    # STORE the data: Attach the QFileInfo object to the item
-                    item.setData(Qt.UserRole, file_info)
+            # STORE the data: Attach the QFileInfo object to the item
+            item.setData(Qt.UserRole, file_info)
+            if entry.duration_ms > 0 and entry.is_current():
+                item.setData(PlaylistDurationRole, entry.duration_ms)
 
-                    # STYLE the item: Set the font size
-                    font = item.font()
-                    font.setPointSize(12)
-                    item.setFont(font)
+            # STYLE the item: Set the font size
+            font = item.font()
+            font.setPointSize(12)
+            item.setFont(font)
 
     # Media Management Slots
     @Slot()
@@ -464,14 +545,14 @@ class MediaFeatures(QObject):
         # Log the error
         logger.error(f"Music Player Error: {error} - {error_string}")
 
-    # Stops any active fade animation and restores volume to the current UI slider level.
+    # Stops any active fade and restores volume to the current UI slider level.
     def reset_fade_and_restore_volume(self):
-        if self._fade_animation.state() == QVariantAnimation.State.Running:
-            self._fade_animation.stop()
+        for output in self.music_deck.outputs():
+            self.fade_engine.set_lane(output, self.FADE_LANE, 1.0)
 
         # Restore target volume from UI slider
         target_vol = self.ui.soundVolumeSL.value() / max(1, self.ui.soundVolumeSL.maximum())
-        self.music_audio.setVolume(target_vol)
+        self.music_deck.set_volume(target_vol)
 
     # Playlist controls
 
@@ -508,13 +589,83 @@ class MediaFeatures(QObject):
         for item in items:
             self.ui.soundQueueLW.addItem(item)
 
-    #Automatically plays next track when one ends.
+    @Slot(QMediaPlayer.PlaybackState)
+    def _on_playback_state_changed(self, state):
+        if self._sound_trace is None:
+            return
+        if state == QMediaPlayer.PlaybackState.PlayingState:
+            cue_tracer.mark("playing", self._sound_trace)
+        elif state == QMediaPlayer.PlaybackState.StoppedState:
+            self._sound_trace = None
+
+    #Automatically plays next track when one ends. The primed next track starts at once; otherwise it is loaded now.
     @Slot(int)
     def _on_status_changed(self, status):
         if status == QMediaPlayer.MediaStatus.EndOfMedia and self.is_queue_mode == True:
             self.current_track_index += 1
+            if self.current_track_index < len(self.playback_queue):
+                if self.music_deck.advance(self.playback_queue[self.current_track_index]):
+                    self._on_queue_track_started()
+                    return
+                self.music_deck.begin_gap_measure(self.music_player)
             self.play_current_index()
 
+    # The playing track is within the crossfade length of its end. Without a ready next track, the
+    # track plays out and end of media loads the next one.
+    @Slot()
+    def _on_crossfade_due(self):
+        next_index = self.current_track_index + 1
+        if (self.is_queue_mode and next_index < len(self.playback_queue) and
+                self.music_deck.advance(self.playback_queue[next_index], self.music_deck.crossfade_ms)):
+            self.current_track_index = next_index
+            self._on_queue_track_started()
+
+    def _on_queue_track_started(self):
+        self.ui.soundQueueLW.setCurrentRow(self.current_track_index)
+        self._prime_next_track()
+
+    # Open the queue entry after the current one on the deck's standby player
+    def _prime_next_track(self):
+        next_index = self.current_track_index + 1
+        if self.is_queue_mode and next_index < len(self.playback_queue):
+            self.music_deck.prime(self.playback_queue[next_index])
+        else:
+            self.music_deck.cancel_prime()
+
+    # Signals of the playing music player and the slots connected to them
+    def _music_player_connections(self, player: QMediaPlayer):
+        return ((player.mediaStatusChanged, self._on_status_changed),
+                (player.playbackStateChanged, self._on_playback_state_changed),
+                (player.positionChanged, self._update_player_progress),
+                (player.durationChanged, self._update_player_duration),
+                (player.metaDataChanged, self.update_metadata_display),
+                (player.errorOccurred, self.music_player_handle_error),
+                (player.sourceChanged, self._show_track_waveform))
+
+    # The deck started the next track on its other player; move the connections over to it
+    @Slot(QObject, QObject)
+    def _on_music_player_swapped(self, previous: QMediaPlayer, player: QMediaPlayer):
+        for signal, slot in self._music_player_connections(previous):
+            signal.disconnect(slot)
+        for signal, slot in self._music_player_connections(player):
+            signal.connect(slot)
+        self.music_player = player
+        self.music_audio = player.audioOutput()
+        self._sound_trace = None
+
+        # Loaded while on standby, so these changed before the connections were made
+        self._update_player_duration(player.duration())
+        self.update_metadata_display()
+        self._show_track_waveform()
+
+    # Responds to an OSC command to set the crossfade between playlist tracks
+    @Slot(float)
+    def onOSCServerCrossfadeAction(self, crossfade_s: float):
+        crossfade_ms = int(crossfade_s * 1000)
+        self.music_deck.crossfade_ms = crossfade_ms
+        self._settings.set_music_crossfade_ms(crossfade_ms)
+        logger.info(f"Playlist crossfade set to {crossfade_ms} ms")
+
     # Uses the music player for background music.
     def play_current_index(self):
         if 0 <= self.current_track_index < len(self.playback_queue):
@@ -524,8 +675,9 @@ class MediaFeatures(QObject):
             # Stop active fade and restore volume
             self.reset_fade_and_restore_volume()
 
-            self.music_player.setSource(QUrl.fromLocalFile(song_path))
+            self.music_deck.load(song_path)
             self.music_player.play()
+            self._prime_next_track()
         else:
             logging.debug("Playlist finished")
             if self.ui.loopPlayerPB.isChecked():
@@ -563,6 +715,7 @@ class MediaFeatures(QObject):
             return
 
         found_files = self.media_file_database.search_media(tags, True)
+        cue_tracer.mark("search")
 
         if len(found_files) > 0:
             found_file = found_files[0]
@@ -669,7 +822,7 @@ class MediaFeatures(QObject):
     # Respond to the request to change volume
     @Slot(int)
     def set_sound_volume(self, value):
-        self.music_audio.setVolume(value/self.ui.soundVolumeSL.maximum())
+        self.music_deck.set_volume(value/self.ui.soundVolumeSL.maximum())
 
     @Slot()
     def set_sound_library(self):
@@ -680,6 +833,8 @@ class MediaFeatures(QObject):
             self._settings.set_sound_directory(setDir)
             soundsCount = self.media_file_database.index_sounds(setDir)
             self.ui.soundFilesCountLBL.setText(str(soundsCount))
+            self.preload_sfx()
+            self.analyze_sounds()
             self.refresh_directory_watches() # Re-bind watcher tree
 
     # Responds to an OSC command to play an audio file
@@ -691,6 +846,7 @@ class MediaFeatures(QObject):
             return
 
         foundSounds = self.media_file_database.search_sounds(tags, True)
+        cue_tracer.mark("search")
         if len(foundSounds) > 0:
             sound = foundSounds[0]
             soundFile = QFileInfo(sound)
@@ -699,7 +855,9 @@ class MediaFeatures(QObject):
             # Stop active fade and restore volume
             self.reset_fade_and_restore_volume()
 
-            self.music_player.setSource(QUrl.fromLocalFile(file))
+            # The cue's trace finishes once the player reports progress, i.e. audio is reaching the output
+            self._sound_trace = cue_tracer.claim()
+            self.music_deck.load(file)
             self.music_player.setPosition(0)
             self.music_player.play()
 
@@ -723,10 +881,15 @@ class MediaFeatures(QObject):
             # Stop active fade and restore volume
             self.reset_fade_and_restore_volume()
 
-            self.music_player.setSource(QUrl.fromLocalFile(file))
+            self.music_deck.load(file)
             self.music_player.setPosition(0)
             if self.music_player.isSeekable():
-                self.music_player.setPosition(int(seek_point*1000.0))
+                # Land on the musical hit nearest the requested point
+                seek_ms = int(seek_point*1000.0)
+                waveform = self.sound_analysis.waveform(file)
+                if waveform is not None:
+                    seek_ms = waveform.snap(seek_ms, self._settings.get_seek_snap_ms())
+                self.music_deck.seek(seek_ms)
             else:
                 logging.warning("OSC Seek and Play Sound: Audio file does not support seeking")
             self.music_player.play()
@@ -743,68 +906,119 @@ class MediaFeatures(QObject):
             self.music_player.stop()
             return
 
-        foundSounds = self.media_file_database.search_sounds(tags, True)
-        if len(foundSounds) > 0:
-
-            # Use QRandomGenerator to get a random index from 0 (inclusive) to list_length (exclusive)
-            list_length = len(foundSounds)
-            random_index = QRandomGenerator.global_().bounded(list_length)
-            sound = foundSounds[random_index]
-
+        # Each tag list deals its matches in a shuffled order, so a stinger does not repeat until every match
+        # has played. A bag is searched again when the sound index changes, and keeps its place in the deal
+        # unless its matches changed.
+        generation = self.media_file_database.sound_generation()
+        key = " ".join(sorted(set(tags.lower().split())))
+        filled, bag = self._stinger_bags.get(key, (None, None))
+        if bag is None:
+            # Tag lists come from the network, so keep the lookup bounded
+            if len(self._stinger_bags) >= 256:
+                self._stinger_bags.clear()
+            bag = ShuffleBag(self.media_file_database.search_sounds(tags, True))
+            self._stinger_bags[key] = (generation, bag)
+        elif filled != generation:
+            bag.refill(self.media_file_database.search_sounds(tags, True))
+            self._stinger_bags[key] = (generation, bag)
+
+        sound = bag.draw()
+        if sound is not None:
             soundFile = QFileInfo(sound)
             file = soundFile.absoluteFilePath()
 
             # Stop active fade and restore volume
             self.reset_fade_and_restore_volume()
 
-            self.music_player.setSource(QUrl.fromLocalFile(file))
+            self.music_deck.load(file)
             self.music_player.setPosition(0)
             self.music_player.play()
 
         else:
             logging.warning(f"OSC Play Stinger: sound matching {tags} not found")
 
-    # Initiates a fade out of the currently playing sound over the specified time (in seconds).
+    # Fades the music over the specified time (in seconds) to level, a fraction of the volume slider. A fade to
+    # 0 stops the player at the end; a fade above 0 of a stopped or paused track starts it from silence.
     @Slot(float)
-    def onOSCServerFadeAction(self, fade_time_s: float):
+    @Slot(float, str, float)
+    def onOSCServerFadeAction(self, fade_time_s: float, curve: str = "", level: float = 0.0):
         # 1. Sanity Checks
-        if self.music_player.playbackState() != QMediaPlayer.PlaybackState.PlayingState:
+        playing = self.music_player.playbackState() == QMediaPlayer.PlaybackState.PlayingState
+        if level <= 0.0 and not playing:
+            return
+        if not playing and self.music_player.source().isEmpty():
             return
 
-        self.is_queue_mode = False # Requesting a fade implies the player should not advance if playing a queue
-
-        # 2. Setup Animation
         fade_duration_ms = max(100, int(fade_time_s * 1000))
-        start_vol = self.music_player.audioOutput().volume()
-
-        # Stop any current fade to prevent conflicts
-        self._fade_animation.stop()
-
-        self._fade_animation.setDuration(fade_duration_ms)
-        self._fade_animation.setStartValue(start_vol)
-        self._fade_animation.setEndValue(0.0)
-
-        # 3. Choose a Natural Curve
-        # OutQuad or OutCubic sounds better than linear for volume fades
-        self._fade_animation.setEasingCurve(QEasingCurve.Type.OutQuad)
-
-        self._fade_animation.start()
-        logging.debug(f"OSC Fade started: {start_vol} -> 0.0 over {fade_duration_ms}ms")
+        outputs = self.music_deck.outputs()
+        if level <= 0.0:
+            self.is_queue_mode = False # Requesting a fade implies the player should not advance if playing a queue
+            # OutQuad sounds better than linear for fading out
+            curve = curve or CURVE_OUT_QUAD
+            for output in outputs:
+                self.fade_engine.ramp(output, self.FADE_LANE, 0.0, fade_duration_ms, curve,
+                                      on_finished=self._finalize_music_stop if output is self.music_audio else None)
+        else:
+            # Even steps in dB sound even when fading in
+            curve = curve or CURVE_EXPONENTIAL
+            if not playing:
+                for output in outputs:
+                    self.fade_engine.set_lane(output, self.FADE_LANE, 0.0)
+                self.music_player.play()
+            for output in outputs:
+                self.fade_engine.ramp(output, self.FADE_LANE, level, fade_duration_ms, curve)
 
-    @Slot(object)
-    def _handle_fade_step(self, value):
-        """Called automatically by the animation on every frame"""
-        self.music_player.audioOutput().setVolume(value)
+        logging.debug(f"OSC Fade started: -> {level} over {fade_duration_ms}ms ({curve})")
 
     @Slot()
     def _finalize_music_stop(self):
-        """Called when the animation finishes reaching 0.0"""
+        """Called when the fade out reaches 0.0"""
         self.music_player.stop()
-        # Optional: Reset volume to a default for the next track
-        vol = self.ui.soundVolumeSL.value() / self.ui.soundVolumeSL.maximum()
-        self.music_player.audioOutput().setVolume(vol)
+        # Reset volume for the next track
+        self.reset_fade_and_restore_volume()
         logging.debug("Music fade complete. Player stopped.")
 
+    # Responds to an OSC command to set how far music ducks under sound effects
+    @Slot(float)
+    def onOSCServerDuckAction(self, duck_db: float):
+        self._duck_db = duck_db
+        self._settings.set_duck_under_sfx_db(duck_db)
+        if duck_db <= 0.0 and self._ducked:
+            self._release_duck()
+        logger.info(f"Music ducking under sound effects set to {duck_db} dB")
+
+    def _on_sfx_state_changed(self, sfx: SoundFX):
+        if sfx.is_playing():
+            self._duck_music()
+
+    # A sound effect started: drop the music quickly and watch for the effects to finish
+    def _duck_music(self):
+        if self._duck_db <= 0.0:
+            return
+        level = 10.0 ** (-self._duck_db / 20.0)
+        for output in self.music_deck.outputs():
+            self.fade_engine.ramp(output, self.DUCK_LANE, level, self.DUCK_ATTACK_MS, CURVE_EXPONENTIAL)
+        self._ducked = True
+        self._duck_timer.start()
+
+    @Slot()
+    def _check_duck(self):
+        if not self._sfx_playing():
+            self._release_duck()
+
+    def _release_duck(self):
+        self._duck_timer.stop()
+        self._ducked = False
+        for output in self.music_deck.outputs():
+            self.fade_engine.ramp(output, self.DUCK_LANE, 1.0, self.DUCK_RELEASE_MS, CURVE_EXPONENTIAL)
+
+    def _sfx_playing(self) -> bool:
+        if any(sfx.is_playing() for sfx in self.sfx_buttons):
+            return True
+        if self.audio_mixer is not None and self.audio_mixer.playing():
+            return True
+        return self.sfx_pool.playing() > 0
+
     # Responds to an OSC command to play an audio file
     @Slot(str)
     def onOSCServerSFXPlayAction(self, tags):
@@ -813,36 +1027,50 @@ class MediaFeatures(QObject):
             self.stopAllSFX.emit()
             return
 
-        wav_tags = "wav " + tags
-
-        foundSounds = self.media_file_database.search_sounds(wav_tags, True)
-        if len(foundSounds) > 0:
-            found_sound = foundSounds[0]
-            soundFile = QFileInfo(found_sound)
+        file = self._sfx_files.get(tags)
+        if file is None:
+            foundSounds = self.media_file_database.search_sounds("wav " + tags, True)
+            if not foundSounds:
+                logging.warning(f"OSC Play Sound Effect: sound matching {tags} not found")
+                return
 
             # Use canonicalFilePath() for better file resolution stability
-            file = soundFile.canonicalFilePath()
-
-            # Instantiate and parent correctly
-            sound = QSoundEffect(self)
-            sound.setSource(QUrl.fromLocalFile(file))
-
-            # Add to the list to prevent premature garbage collection while loading
-            self.active_sound_effects.append(sound)
-
-            # Connect the correct self-destruct signal (playingChanged)
-            sound.playingChanged.connect(self._handle_soundfx_state_change)
-
-            # Connect the global stop signal
-            self.stopAllSFX.connect(sound.stop)
-
-            # TRUST the load and initiate play
-            sound.setVolume(1.0)
-            sound.play()
+            file = QFileInfo(foundSounds[0]).canonicalFilePath()
+            # Tag lists come from the network, so keep the lookup bounded
+            if len(self._sfx_files) >= 256:
+                self._sfx_files.clear()
+            self._sfx_files[tags] = file
+
+        sample = self.audio_mixer.load(file) if self.audio_mixer is not None else None
+        if sample is not None:
+            self._osc_voices.add(self.audio_mixer.play(sample))
+            self._duck_music()
+            logging.debug("OSC Play Sound Effect initiated play.")
+        elif self.sfx_pool.play(file):
+            self._duck_music()
             logging.debug("OSC Play Sound Effect initiated play.")
-
         else:
-            logging.warning(f"OSC Play Sound Effect: sound matching {tags} not found")
+            logging.warning(f"OSC Play Sound Effect: {file} could not be loaded")
+
+    # Load the short WAV files in the sound library so their first OSC trigger plays at once. Long files
+    # (music beds) would hold their whole decoded audio in memory and load on first use instead. Samples of
+    # files that have gone age out of the pool as others are played.
+    def preload_sfx(self):
+        self._sfx_files.clear()
+        files = []
+        for sound in self.media_file_database.search_sounds("wav", True):
+            info = QFileInfo(sound)
+            if info.size() <= self.SFX_PRELOAD_MAX_BYTES:
+                files.append(info.canonicalFilePath())
+
+        # The mixer decodes synchronously, so only the first few are decoded up front
+        if self.audio_mixer is not None:
+            for file in files[:SoundEffectPool.MAX_SAMPLES]:
+                self.audio_mixer.load(file)
+            logger.info(f"Audio Mixer: Decoded {min(len(files), SoundEffectPool.MAX_SAMPLES)} sound effects, "
+                        f"{self.audio_mixer.cached_bytes() // 1024} KB")
+        else:
+            self.sfx_pool.preload_all(files)
 
     # Called when the OSC server receives the /sfx/stop_all command.
     @Slot()
@@ -851,24 +1079,6 @@ class MediaFeatures(QObject):
         # Stop all soundfx regardless of what triggered them
         self.stop_all_sfx()
 
-    # Triggers deletion of the QSoundEffect object when playback finishes.
-    @Slot()
-    def _handle_soundfx_state_change(self):
-        # Get the QSoundEffect object that emitted the signal
-        sound = self.sender()
-
-        if sound and isinstance(sound, QSoundEffect) and not sound.isPlaying():
-
-            if sound in self.active_sound_effects:
-                self.active_sound_effects.remove(sound)
-                logging.debug("Sound effect removed from active_sound_effects list.")
-
-            # 2. Then, safely destroy the object
-            sound.deleteLater()
-            logger.debug("QSoundEffect object deleted after playing.")
-        else:
-            logger.debug("SoundFX sound sender was empty or not a QSoundEffect")
-
     @Slot()
     @Slot(QModelIndex)
     @Slot(QListWidgetItem)
@@ -878,6 +1088,7 @@ class MediaFeatures(QObject):
             return
 
         self.is_queue_mode = False
+        self.music_deck.cancel_prime()
         self.reset_fade_and_restore_volume()
 
         file_path = None
@@ -905,7 +1116,7 @@ class MediaFeatures(QObject):
 
         # Execute Playback
         if file_path:
-            self.music_player.setSource(QUrl.fromLocalFile(file_path))
+            self.music_deck.load(file_path)
             self.music_player.setPosition(0)
             self.music_player.play()
     @Slot()
@@ -1003,21 +1214,20 @@ class MediaFeatures(QObject):
         if not fileName:
             return
 
-        # 1. Build a standard Python dictionary
-        sound_data = {}
+        write_playlist(fileName, KIND_SOUND_QUEUE, self._queue_entries())
+
+    # Playlist entries for the current sound queue, with lengths saved before or measured by sound analysis
+    def _queue_entries(self):
+        entries = []
         for i in range(self.ui.soundQueueLW.count()):
             item = self.ui.soundQueueLW.item(i)
-            file_info = item.data(Qt.UserRole)
-            sound_data[f"sound{i}"] = file_info.absoluteFilePath()
-
-        # 2. Convert Python dict directly to QJsonDocument
-        doc = QJsonDocument.fromVariant(sound_data)
-
-        # 3. Safe Save
-        save_file = QSaveFile(fileName)
-        if save_file.open(QIODevice.WriteOnly):
-            save_file.write(doc.toJson(QJsonDocument.JsonFormat.Indented))
-            save_file.commit()
+            path = item.data(Qt.UserRole).absoluteFilePath()
+            duration_ms = item.data(PlaylistDurationRole)
+            if not duration_ms:
+                analysis = self.sound_analysis.analysis(path)
+                duration_ms = analysis.duration_ms if analysis is not None else 0
+            entries.append(entry_for_path(path, MEDIA_AUDIO, duration_ms = duration_ms))
+        return entries
 
     @Slot()
     def save_soundFX_pallette(self):
@@ -1031,30 +1241,16 @@ class MediaFeatures(QObject):
         if not fileName:
             return
 
-        # 2. Build a native Python dictionary using comprehension
-        # This maps "sound0": "/path/to/file.wav", etc.
-        sound_data = {
-            f"sound{i}": self.ui.soundQueueLW.item(i).data(Qt.UserRole).absoluteFilePath()
-            for i in range(self.ui.soundQueueLW.count())
-        }
+        # 2. Atomic save of the queue in the shared playlist format
+        if write_playlist(fileName, KIND_SFX_PALETTE, self._queue_entries()):
+            logger.debug(f"Successfully saved palette: {fileName}")
+            # A pinned palette that was overwritten is decoded again
+            palette_file = QFileInfo(fileName).absoluteFilePath()
+            if self.palette_loader is not None and self.palette_loader.is_pinned(palette_file):
+                self.palette_loader.unpin(palette_file)
+                self.palette_loader.pin(palette_file, len(self.sfx_buttons))
 
-        # 3. Convert dict to QJsonDocument via fromVariant
-        doc = QJsonDocument.fromVariant(sound_data)
-
-        # 4. Atomic Save using QSaveFile
-        save_file = QSaveFile(fileName)
-        if save_file.open(QIODevice.WriteOnly):
-            # Write indented bytes (UTF-8)
-            save_file.write(doc.toJson(QJsonDocument.JsonFormat.Indented))
-
-            if save_file.commit():
-                logger.debug(f"Successfully saved palette: {fileName}")
-            else:
-                logger.error(f"Failed to commit sound pallette: {fileName}")
-        else:
-            logger.error(f"Could not save sound pallette: {fileName}: {save_file.errorString()}")
-
-        # 5. Refresh the UI dropdown
+        # 3. Refresh the UI dropdown
         self.load_sound_pallettes()
 
     @Slot()
@@ -1074,51 +1270,96 @@ class MediaFeatures(QObject):
             palletteFileName = palletteFileInfo.completeBaseName()
             self.palletteSelect.addItem(palletteFileName, palletteFileInfo)
 
+        # Decode the pinned palettes in the background, ahead of being chosen
+        if self.palette_loader is not None:
+            pinned = self._settings.get_pinned_palettes()
+            for index in range(self.palletteSelect.count()):
+                if self.palletteSelect.itemText(index) in pinned:
+                    self.palette_loader.pin(self.palletteSelect.itemData(index).absoluteFilePath(),
+                                            len(self.sfx_buttons))
+
         if self.palletteSelect.count() > 0:
             self.load_sound_effects(0)
 
     @Slot(int)
     def load_sound_effects(self, index):
         """
-        Loads a sound palette (JSON) and maps paths to the SFX button grid.
+        Loads a sound palette (binary or legacy JSON) and maps paths to the SFX button grid.
         """
         button_idx = 0
         total_buttons = len(self.sfx_buttons)
+        self._update_pin_action()
+
+        # Decoded off the GUI thread; the buttons keep the current palette until the new one is complete
+        if self.palette_loader is not None and self.palletteSelect.count() > 0 and index >= 0:
+            palette_file = self.palletteSelect.itemData(index).absoluteFilePath()
+            slots = self.palette_loader.request(palette_file, total_buttons)
+            if slots is not None:
+                self._on_palette_loaded(palette_file, slots)
+            return
 
         # 1. Validation: Only proceed if there is a valid selection
         if self.palletteSelect.count() > 0 and index >= 0:
             palletteFileInfo = self.palletteSelect.itemData(index)
 
-            # 2. Open and Read using QFile
-            file = QFile(palletteFileInfo.absoluteFilePath())
-            if file.open(QIODevice.ReadOnly):
-                raw_data = file.readAll()
-                file.close()
-
-                # 3. Parse JSON to a native Python dictionary
-                doc = QJsonDocument.fromJson(raw_data)
-                sound_data = doc.toVariant() # Returns a native Python dict
-
-                if isinstance(sound_data, dict):
-                    # 4. Sort keys to ensure sound0, sound1... sound10 order
-                    # Python dicts are ordered, but sorted() guarantees the grid mapping
-                    for key in sorted(sound_data.keys(), key=lambda x: int(''.join(filter(str.isdigit, x)) or 0)):
-                        if button_idx < total_buttons:
-                            path = sound_data[key]
-                            file_info = QFileInfo(path)
-
-                            # 5. Load if it's a valid WAV file, otherwise disable
-                            if file_info.exists():
-                                self.sfx_buttons[button_idx].loadSoundEffect(file_info)
-                            else:
-                                self.sfx_buttons[button_idx].disable()
-
-                            button_idx += 1
-
-        # 6. Safety: Disable any remaining buttons in the grid not defined in the JSON
+            # 2. Read the palette, binary or legacy JSON, already in button order
+            for entry in read_playlist(palletteFileInfo.absoluteFilePath()):
+                if button_idx >= total_buttons:
+                    break
+
+                file_info = QFileInfo(entry.path)
+
+                # 3. Load if it's a valid WAV file, otherwise disable
+                if file_info.exists():
+                    self.sfx_buttons[button_idx].loadSoundEffect(file_info)
+                else:
+                    self.sfx_buttons[button_idx].disable()
+
+                button_idx += 1
+
+        # 4. Safety: Disable any remaining buttons in the grid not defined in the palette
         for i in range(button_idx, total_buttons):
             self.sfx_buttons[i].disable()
 
+    # Put a decoded palette on the buttons in one pass
+    @Slot(str, list)
+    def _on_palette_loaded(self, palette_file: str, slots: list):
+        for button_idx, sfx in enumerate(self.sfx_buttons):
+            if button_idx < len(slots) and slots[button_idx].path:
+                sfx.loadSoundEffect(QFileInfo(slots[button_idx].path), slots[button_idx].sample)
+            else:
+                sfx.disable()
+        self.palletteSelect.setToolTip("")
+        logger.debug(f"Sound palette {QFileInfo(palette_file).completeBaseName()} loaded")
+
+    @Slot(str, int, int)
+    def _on_palette_progress(self, palette_file: str, ready: int, total: int):
+        self.palletteSelect.setToolTip(f"Loading {QFileInfo(palette_file).completeBaseName()}: {ready} of {total}")
+
+    # Keep the selected palette decoded in memory, or release it
+    @Slot(bool)
+    def pin_current_palette(self, pin: bool):
+        if self.palletteSelect.currentIndex() < 0:
+            return
+        palette_file = self.palletteSelect.currentData().absoluteFilePath()
+        if pin:
+            self.palette_loader.pin(palette_file, len(self.sfx_buttons))
+        else:
+            self.palette_loader.unpin(palette_file)
+        self._on_palette_pins_changed()
+
+    @Slot()
+    def _on_palette_pins_changed(self):
+        pinned = self.palette_loader.pinned()
+        self._settings.set_pinned_palettes([QFileInfo(palette_file).completeBaseName() for palette_file in pinned])
+        self._update_pin_action()
+
+    def _update_pin_action(self):
+        if self.palette_loader is None or self.palletteSelect.currentIndex() < 0:
+            return
+        palette_file = self.palletteSelect.currentData().absoluteFilePath()
+        self._pin_palette_action.setChecked(self.palette_loader.is_pinned(palette_file))
+
     @Slot(int)
     def set_fx_volume(self, value):
         sliderMax = self.ui.soundFXVolumeHS.maximum()
@@ -1128,11 +1369,77 @@ class MediaFeatures(QObject):
     # Fades out all sounds currently playing in the palette and any OSC triggered soundfx
     @Slot()
     def stop_all_sfx(self):
+        # One command fades every mixer voice, palette and OSC alike
+        if self.audio_mixer is not None:
+            self.audio_mixer.stop_all(fade_ms=500)
+
         for sfx in self.sfx_buttons:
-            sfx.fadeOut(duration=500) # Faster fade for panic situations
+            if not sfx.uses_mixer():
+                sfx.fadeOut(duration=500) # Faster fade for panic situations
 
         self.stopAllSFX.emit()
 
+    @Slot()
+    def _stop_osc_voices(self):
+        for voice in self._osc_voices:
+            self.audio_mixer.stop(voice, 20)
+
+    def shutdown_audio(self):
+        self.sound_analysis.shutdown()
+        self.music_deck.shutdown()
+        self.fade_engine.shutdown()
+        if self.palette_loader is not None:
+            self.palette_loader.shutdown()
+        if self.audio_output is not None:
+            self.audio_output.shutdown()
+
+    # Add the title and artist of analyzed sounds to their search tags, and queue the rest for analysis
+    def analyze_sounds(self):
+        paths = self.media_file_database.search_sounds()
+        for path in paths:
+            self._tag_analyzed_sound(path)
+        self.sound_analysis.request_all(paths)
+
+    @Slot(str)
+    def _on_sound_analyzed(self, path: str):
+        self._tag_analyzed_sound(path)
+        source = self.music_player.source()
+        if source.isLocalFile() and QFileInfo(source.toLocalFile()).canonicalFilePath() == path:
+            self._show_track_waveform()
+
+    def _tag_analyzed_sound(self, path: str):
+        entry = self.sound_analysis.analysis(path)
+        if entry is None:
+            return
+
+        seconds = entry.duration_ms // 1000
+        tool_tip = " - ".join(filter(None, (entry.title, entry.artist)))
+        tool_tip += f"\n{seconds // 60}:{seconds % 60:02d}"
+        if entry.loudness is not None:
+            tool_tip += f", {entry.loudness:.1f} LUFS, peak {entry.peak:.1f} dBFS"
+        self.media_file_database.add_sound_tags(path, f"{entry.title} {entry.artist}", tool_tip.strip())
+
+    # Show the overview and publish the onsets of the loaded track, when it has been analyzed
+    @Slot()
+    def _show_track_waveform(self):
+        source = self.music_player.source()
+        waveform = self.sound_analysis.waveform(source.toLocalFile()) if source.isLocalFile() else None
+        self.waveform_view.set_waveform(waveform)
+        self.waveform_view.set_position(self.music_player.position())
+        self.musicOnsetsChanged.emit([round(int(onset) / 1000, 2) for onset in waveform.onsets] if waveform else [])
+
+    # Seek from a click on the waveform
+    @Slot(int)
+    def _seek_music(self, position_ms: int):
+        if self.music_player.isSeekable():
+            self.music_deck.seek(position_ms)
+
+    # Normalization gain for a music track from its loudness analysis. Unanalyzed tracks play as they are.
+    def _music_gain(self, path: str) -> float:
+        if not self._settings.get_music_normalize():
+            return 1.0
+        return self.sound_analysis.gain(path, self._settings.get_music_target_lufs())
+
     # Mini Music Player On the Main Control area monitors the currrently play song
     # Calculates time remaining and updates the progress bar.
     # param position: The current playback position in milliseconds.
@@ -1142,7 +1449,12 @@ class MediaFeatures(QObject):
 
     @Slot(int)
     def _update_player_progress(self, position: int):
+        if self._sound_trace is not None and position > 0:
+            cue_tracer.finish(self._sound_trace, "audible")
+            self._sound_trace = None
+
         self.ui.musicPlayerProgress.setValue(position)
+        self.waveform_view.set_position(position)
 
         duration = self.music_player.duration()
         remaining_ms = max(0, duration - position)
@@ -1153,6 +1465,7 @@ class MediaFeatures(QObject):
         # Format as negative remaining time (e.g., -01:45)
         time_str = f"{minutes:02d}:{seconds:02d}"
         self.ui.musicPlayerProgress.setFormat(time_str)
+        self.musicProgress.emit(position, duration)
 
     # Reads standard metadata (Title, Artist) from QMediaPlayer and updates the UI labels.
     # Uses file name as a fallback if metadata is missing.
@@ -1165,9 +1478,17 @@ class MediaFeatures(QObject):
         # The metaData(key) method must be called on this object, not the player itself.
         metadata_object = self.music_player.metaData()
 
+        # Tags read by the background analysis stand in until the player has read them itself
+        analysis = None
+        if self.music_player.source().isLocalFile():
+            analysis = self.sound_analysis.analysis(self.music_player.source().toLocalFile())
+
         # Get Title
         title = metadata_object.stringValue(QMediaMetaData.Key.Title)
 
+        if not title and analysis is not None:
+            title = analysis.title
+
         if not title:
             # Fallback: Use the file name without extension
             url = self.music_player.source()
@@ -1190,11 +1511,15 @@ class MediaFeatures(QObject):
             # Priority 3: Check for Author tag
             artist = metadata_object.stringValue(QMediaMetaData.Author)
 
+        if not artist and analysis is not None:
+            artist = analysis.artist
+
         if not artist:
             # Final Fallback
             artist = "Unknown Artist"
 
         self.ui.artistNameLBL.setText(artist)
+        self.musicTrackChanged.emit(title, artist)
 
         logging.debug(f"Media Metadata Updated: Title='{title}', Artist='{artist}'")
 
@@ -1281,6 +1606,39 @@ class MediaFeatures(QObject):
         match_all = self.ui.allMediaTagsCB.isChecked()
         self.sound_proxy.set_filter(query, match_all)
 
+# Deals items in a random order without repeats until all have been dealt, then shuffles them again. The first
+# item of a new round is never the last of the previous one, so nothing plays twice in a row.
+class ShuffleBag:
+    def __init__(self, items: list):
+        self._items = list(items)
+        self._remaining = 0   # Items still to deal are self._items[:self._remaining]
+        self._last = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # Take a new set of items. The deal carries on when they are the same ones, and otherwise starts over
+    # without repeating the last item drawn.
+    def refill(self, items: list):
+        if set(items) == set(self._items):
+            return
+        self._items = list(items)
+        self._remaining = 0
+
+    def draw(self):
+        if not self._items:
+            return None
+        if self._remaining == 0:
+            QtListShuffler.shuffle(self._items)
+            self._remaining = len(self._items)
+            # Dealing runs from the end of the list
+            if len(self._items) > 1 and self._items[-1] == self._last:
+                self._items[0], self._items[-1] = self._items[-1], self._items[0]
+
+        self._remaining -= 1
+        self._last = self._items[self._remaining]
+        return self._last
+
 # In-place Fisher-Yates shuffle using QRandomGenerator. Works on any Python list or mutable sequence.
 class QtListShuffler:
     @staticmethod
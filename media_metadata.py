@@ -0,0 +1,176 @@
+# media_metadata.py
+# Background extraction of video metadata: a poster frame, the duration and the resolution. Videos are opened
+# one at a time by a QMediaPlayer living on a worker thread, rendering into a QVideoSink with no audio output,
+# so nothing reaches the displays or speakers. Results are cached on disk by file_cache.py.
+import hashlib
+import logging
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, Signal, Slot, Qt, QTimer, QUrl, QFileInfo, QDir, QSize
+from PySide6.QtMultimedia import QMediaPlayer, QVideoSink, QVideoFrame, QMediaMetaData
+
+from file_cache import CachedFileService, file_unchanged, file_stamp
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_FILE = "video_metadata.json"
+POSTER_DIR = "posters"
+POSTER_WIDTH = 320
+
+class VideoMetadata(NamedTuple):
+    path: str
+    size: int = 0
+    modified_ms: int = 0
+    duration_ms: int = 0
+    width: int = 0
+    height: int = 0
+    poster: str = ""
+
+    # True when the file on disk is still the one that was examined
+    def is_current(self) -> bool:
+        return file_unchanged(self.path, self.size, self.modified_ms)
+
+# Stable name for content derived from a file. A file replaced on disk gets a new key.
+def content_key(path: str) -> str:
+    info = QFileInfo(path)
+    identity = f"{info.absoluteFilePath()}|{info.lastModified().toMSecsSinceEpoch()}|{info.size()}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+# Lives on the extraction thread. The player is created there on first use so its backend is owned by that thread.
+class _ExtractionWorker(QObject):
+    extracted = Signal(str, int, int, int, str) # path, duration ms, width, height, poster file
+
+    EXTRACT_TIMEOUT_MS = 8000
+    POSTER_SEEK_MS = 3000
+
+    def __init__(self, poster_dir: str):
+        super().__init__()
+        self._poster_dir = poster_dir
+        self._player = None
+        self._sink = None
+        self._timeout = None
+        self._reset()
+
+    def _reset(self):
+        self._path = ""
+        self._duration = 0
+        self._resolution = QSize()
+        self._poster = ""
+        self._waiting_for_frame = False
+
+    def _create_player(self):
+        self._player = QMediaPlayer(self)
+        self._sink = QVideoSink(self)
+        self._player.setVideoOutput(self._sink)
+        self._player.mediaStatusChanged.connect(self._on_status_changed)
+        self._player.errorOccurred.connect(self._on_error)
+        self._sink.videoFrameChanged.connect(self._on_frame)
+
+        self._timeout = QTimer(self)
+        self._timeout.setSingleShot(True)
+        self._timeout.timeout.connect(self._on_timeout)
+
+    @Slot(str)
+    def extract(self, path: str):
+        if self._player is None:
+            self._create_player()
+
+        self._reset()
+        self._path = path
+        self._timeout.start(self.EXTRACT_TIMEOUT_MS)
+        self._player.setSource(QUrl.fromLocalFile(path))
+
+    @Slot(QMediaPlayer.MediaStatus)
+    def _on_status_changed(self, status):
+        if not self._path:
+            return
+
+        if status == QMediaPlayer.MediaStatus.LoadedMedia and not self._waiting_for_frame:
+            self._duration = max(0, self._player.duration())
+            resolution = self._player.metaData().value(QMediaMetaData.Key.Resolution)
+            if isinstance(resolution, QSize):
+                self._resolution = resolution
+
+            # Skip past black lead-in frames and fades for the poster
+            self._waiting_for_frame = True
+            self._player.setPosition(min(self.POSTER_SEEK_MS, self._duration // 10))
+            self._player.play()
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self._finish()
+
+    @Slot(QVideoFrame)
+    def _on_frame(self, frame):
+        if not self._waiting_for_frame or not frame.isValid():
+            return
+
+        image = frame.toImage()
+        if image.isNull():
+            return
+
+        if not self._resolution.isValid() or self._resolution.isEmpty():
+            self._resolution = frame.size()
+
+        poster_file = QDir(self._poster_dir).filePath(content_key(self._path) + ".jpg")
+        poster = image.scaledToWidth(min(POSTER_WIDTH, image.width()), Qt.TransformationMode.SmoothTransformation)
+        if poster.save(poster_file, "JPG", 85):
+            self._poster = poster_file
+        else:
+            logger.warning(f"Media Metadata: Could not save poster for {self._path}")
+
+        self._finish()
+
+    @Slot(QMediaPlayer.Error, str)
+    def _on_error(self, error, error_string):
+        if self._path:
+            logger.warning(f"Media Metadata: {self._path}: {error_string}")
+            self._finish()
+
+    @Slot()
+    def _on_timeout(self):
+        logger.warning(f"Media Metadata: Timed out reading {self._path}")
+        self._finish()
+
+    def _finish(self):
+        path = self._path
+        if not path:
+            return
+
+        self._timeout.stop()
+        self._waiting_for_frame = False
+        self._player.stop()
+        self._player.setSource(QUrl())
+
+        self.extracted.emit(path, self._duration, self._resolution.width(), self._resolution.height(), self._poster)
+        self._reset()
+
+# GUI thread facade over the shared queue and cache in file_cache.py. Extraction can also be paused outright
+# while a video is on screen.
+class MediaMetadataService(CachedFileService):
+    metadataReady = Signal(str) # Path of a video whose metadata is now available
+
+    THROTTLE_MS = 250
+    SAVE_DELAY_MS = 2000
+
+    def __init__(self, config_dir: str, parent=None):
+        super().__init__(config_dir, METADATA_CACHE_FILE, VideoMetadata, "Media Metadata", parent)
+        self._poster_dir = QDir(config_dir).filePath(POSTER_DIR)
+        if not QDir().mkpath(self._poster_dir):
+            logger.error(f"Media Metadata: Failed to create poster directory {self._poster_dir}")
+
+        worker = _ExtractionWorker(self._poster_dir)
+        worker.extracted.connect(self._on_extracted)
+        self._start_worker(worker, worker.extract)
+
+    # Metadata for a video, or None when it has not been extracted yet or the file has changed since
+    def metadata(self, path: str) -> VideoMetadata | None:
+        return self.entry(path)
+
+    def duration_ms(self, path: str) -> int:
+        entry = self.metadata(path)
+        return entry.duration_ms if entry else 0
+
+    @Slot(str, int, int, int, str)
+    def _on_extracted(self, path, duration_ms, width, height, poster):
+        self._store(VideoMetadata(path, *file_stamp(path), duration_ms, width, height, poster))
+        logger.debug(f"Media Metadata: {QFileInfo(path).fileName()} {width}x{height} {duration_ms} ms")
+        self.metadataReady.emit(path)
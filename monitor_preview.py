@@ -1,10 +1,11 @@
 import logging
 
-from PySide6.QtCore import Slot, Qt, QFileInfo, QUrl, QSize, QRect, QBuffer, QIODevice, QByteArray
-from PySide6.QtGui import QFont, QColor, QMovie, QPixmap, QPainter, QDragEnterEvent, QDropEvent, QGuiApplication, QFontMetrics, QImageReader, QImage, QPalette
+from PySide6.QtCore import Slot, Signal, Qt, QFileInfo, QUrl, QSize, QRect, QBuffer, QIODevice, QByteArray
+from PySide6.QtGui import QFont, QColor, QMovie, QPixmap, QPainter, QDragEnterEvent, QDropEvent, QGuiApplication, QFontMetrics, QImage, QPalette
 from PySide6.QtWidgets import QLabel
 from PySide6.QtNetwork import QNetworkRequest, QNetworkReply
 import utilities
+from transitions import load_scaled_image
 
 # Import our text-overlay rendering engine class
 
@@ -16,6 +17,8 @@ logger = logging.getLogger(__name__)
 # It is responsingle for managing it's internal support for movie playing and scaling, especially cleaning up when required to display a new
 # feature's visuals
 class SmartOverlayLabel(QLabel):
+    framePainted = Signal() # Emitted after each paint so callers can time when new content reached the screen
+
     def __init__(self, parent=None, stretch:bool=True, single_loop:bool = False):
         super().__init__(parent)
         self.stretch = stretch
@@ -156,6 +159,18 @@ class SmartOverlayLabel(QLabel):
 
         self.update()
 
+    # Show a static image file that has already been decoded and scaled for this label (e.g. from a frame cache)
+    def set_background_scaled(self, file_name: str, image: QImage | QPixmap):
+        self._clear_asset()
+        if image.isNull():
+            logger.warning(f"Smart Overlay Set Scaled Background: No image for {file_name}")
+            return
+
+        # Remember the file so a later resize can rescale from the source
+        self.background_file = file_name
+        self.setPixmap(image if isinstance(image, QPixmap) else QPixmap.fromImage(image))
+        self.update()
+
     # The game feature needs the background stretched by default
     def set_text_overlay(
         self,
@@ -277,22 +292,15 @@ class SmartOverlayLabel(QLabel):
 
         # Fallback to static QImageReader (handles static WebP, PNG, JPG, etc.)
         if not is_animated:
-            reader = QImageReader(self.background_file)
-            reader.setAutoTransform(True)
-            new_image = reader.read()
+            # Decode straight to the label size; previews are small and decoding a full photo for them is wasted work
+            new_image = load_scaled_image(self.background_file, self.size(), self.stretch)
 
             if new_image.isNull():
                 logger.warning(f"Smart Overlay: Failed to read image {self.background_file}.")
                 self._clear_asset()
                 return
 
-            target_size = self.size()
-            aspect_mode = Qt.AspectRatioMode.IgnoreAspectRatio if self.stretch else Qt.AspectRatioMode.KeepAspectRatio
-
-            scaled_pixmap = QPixmap.fromImage(
-                new_image.scaled(target_size, aspect_mode, Qt.TransformationMode.SmoothTransformation)
-            )
-            self.setPixmap(scaled_pixmap)
+            self.setPixmap(QPixmap.fromImage(new_image))
 
     # Clears the display and releases all video/image memory buffers explicitly.
     def _clear_asset(self):
@@ -532,6 +540,7 @@ class SmartOverlayLabel(QLabel):
                     painter.drawText(widget_rect, Qt.AlignmentFlag.AlignCenter, self.overlay_text)
 
             painter.end()
+            self.framePainted.emit()
 
 # Manages the display monitors' dashboard previews. Inherits directly
 # from SmartOverlayLabel to share the permanent animation engine.
@@ -0,0 +1,225 @@
+# music_deck.py
+# Two music players, one playing and one standing by, so a playlist moves to its next track without the
+# audible gap of opening and buffering a file after the last one ended. The standby player is primed with the
+# next queue entry while the current track plays; at the end of the track, or a crossfade length before it,
+# the standby starts and the two swap roles. The time from the handover to the new track being heard is
+# measured for every change, primed or not, and recorded with the cue latencies.
+#
+# Each player's volume is the deck volume times a per-track gain from gain_lookup, taken when the player's source
+# changes, so loudness normalization is in place before the track is heard. Volumes and crossfades are set
+# through the fade engine: the deck and track gain form each output's base level and the crossfade ramps its own
+# lane, so an operator's fade or a duck under a sound effect carries on across the handover.
+#
+# Files of stream_min_bytes or more are played from a StreamingFileDevice with bounded read-ahead, and seeks in
+# them prefetch the target before the player moves.
+import logging
+import time
+
+from PySide6.QtCore import QObject, Signal, QUrl, QIODevice, QFileInfo
+from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
+
+from cue_latency import cue_tracer
+from fade_engine import FadeEngine, CURVE_EQUAL_POWER
+from stream_source import StreamingFileDevice
+
+logger = logging.getLogger(__name__)
+
+class MusicDeck(QObject):
+    playerSwapped = Signal(QObject, QObject) # Previous player, the player now playing
+    crossfadeDue = Signal()                  # The playing track is within the crossfade length of its end
+    gapMeasured = Signal(float)              # ms from handover to the next track being heard
+
+    # Statuses in which a primed player can start at once, or as soon as it finishes loading
+    _STARTABLE = (QMediaPlayer.MediaStatus.LoadingMedia, QMediaPlayer.MediaStatus.LoadedMedia,
+                  QMediaPlayer.MediaStatus.BufferingMedia, QMediaPlayer.MediaStatus.BufferedMedia)
+
+    CROSSFADE_LANE = "crossfade"
+
+    def __init__(self, fade_engine: FadeEngine, parent=None):
+        super().__init__(parent)
+        self._fade_engine = fade_engine
+        self.player = self._make_player()
+        self._standby = self._make_player()
+        self._primed_path = ""
+        self.crossfade_ms = 0
+        self.volume = 1.0
+        self.gain_lookup = None   # Callable taking a file path and returning its track gain
+        self._gains = {}          # player -> gain of its current track
+        self.stream_min_bytes = 0 # Files at least this large stream; 0 never streams
+        self._devices = {}        # player -> StreamingFileDevice of its current track
+        self.last_gap_ms = 0.0
+
+        self._crossfade_signalled = False
+        self._gap_player = None
+        self._gap_trace = None
+        self._gap_started_ns = 0
+
+        # The player fading out during a crossfade
+        self._outgoing = None
+
+    def _make_player(self) -> QMediaPlayer:
+        player = QMediaPlayer(self)
+        output = QAudioOutput(player)
+        player.setAudioOutput(output)
+        self._fade_engine.add_target(output, output.setVolume, self.volume)
+        player.positionChanged.connect(lambda position, player=player: self._on_position_changed(player, position))
+        player.sourceChanged.connect(lambda source, player=player: self._on_source_changed(player, source))
+        player.durationChanged.connect(lambda duration, player=player: self._on_duration_changed(player, duration))
+        return player
+
+    # Both players' outputs, for fades that apply to whichever is heard
+    def outputs(self) -> tuple:
+        return (self.player.audioOutput(), self._standby.audioOutput())
+
+    # The volume a player plays at before fades
+    def _level(self, player: QMediaPlayer) -> float:
+        return self.volume * self._gains.get(player, 1.0)
+
+    def _on_source_changed(self, player: QMediaPlayer, source: QUrl):
+        gain = 1.0
+        if self.gain_lookup is not None and source.isLocalFile():
+            gain = self.gain_lookup(source.toLocalFile())
+        self._gains[player] = gain
+        self._fade_engine.set_base(player.audioOutput(), self._level(player))
+
+    # ----------------------------------------------------------------------
+    # Loading and seeking
+    # ----------------------------------------------------------------------
+    # Set a track on player, the playing one by default. Long files stream through a read-ahead buffer.
+    def load(self, path: str, player: QMediaPlayer = None):
+        player = player or self.player
+        previous = self._devices.pop(player, None)
+        url = QUrl.fromLocalFile(path)
+        device = None
+        if self.stream_min_bytes and QFileInfo(path).size() >= self.stream_min_bytes:
+            device = StreamingFileDevice(path, self)
+            if not device.open(QIODevice.OpenModeFlag.ReadOnly):
+                device = None
+
+        if device is not None:
+            self._devices[player] = device
+            player.setSourceDevice(device, url)
+            logger.info(f"Music Deck: Streaming {QFileInfo(path).fileName()}")
+        else:
+            player.setSource(url)
+        self._release(previous)
+
+    def unload(self, player: QMediaPlayer = None):
+        player = player or self.player
+        player.setSource(QUrl())
+        self._release(self._devices.pop(player, None))
+
+    # Stop both players and close any streams
+    def shutdown(self):
+        for player in (self.player, self._standby):
+            player.stop()
+            if player in self._devices:
+                self.unload(player)
+
+    def _release(self, device: StreamingFileDevice | None):
+        if device is not None:
+            device.close()
+            device.deleteLater()
+
+    # Seek the playing track, fetching a streamed file's data at the target first
+    def seek(self, position_ms: int):
+        device = self._devices.get(self.player)
+        if device is not None:
+            device.prefetch(device.seek_index.offset(position_ms))
+        self.player.setPosition(position_ms)
+
+    def _on_duration_changed(self, player: QMediaPlayer, duration: int):
+        device = self._devices.get(player)
+        if device is not None and not device.seek_index.exact:
+            device.seek_index.duration_ms = duration
+
+    # ----------------------------------------------------------------------
+    # Priming and handover
+    # ----------------------------------------------------------------------
+    # Open the next track on the standby player so it is ready to start
+    def prime(self, path: str):
+        if path == self._primed_path:
+            return
+        self._standby.stop()
+        self.load(path, self._standby)
+        self._primed_path = path
+        self._crossfade_signalled = False
+
+    def primed_path(self) -> str:
+        return self._primed_path
+
+    def cancel_prime(self):
+        if self._primed_path:
+            self.unload(self._standby)
+            self._primed_path = ""
+
+    # Start the primed track, with a crossfade of crossfade_ms when above 0, and make its player the playing
+    # one. Returns False when nothing usable is primed; the caller then loads the track itself.
+    def advance(self, path: str, crossfade_ms: int = 0) -> bool:
+        if path != self._primed_path or self._standby.mediaStatus() not in self._STARTABLE:
+            return False
+
+        outgoing = self.player
+        incoming = self._standby
+        self._primed_path = ""
+        self._crossfade_signalled = False
+        self._finish_crossfade()
+
+        incoming.setLoops(outgoing.loops())
+        incoming.setPosition(0)
+        self._fade_engine.set_lane(incoming.audioOutput(), self.CROSSFADE_LANE, 0.0 if crossfade_ms > 0 else 1.0)
+        self.begin_gap_measure(incoming, "Playlist crossfade" if crossfade_ms > 0 else "Playlist gapless")
+        incoming.play()
+
+        self.player = incoming
+        self._standby = outgoing
+        if crossfade_ms > 0:
+            self._outgoing = outgoing
+            self._fade_engine.ramp(incoming.audioOutput(), self.CROSSFADE_LANE, 1.0, crossfade_ms, CURVE_EQUAL_POWER)
+            self._fade_engine.ramp(outgoing.audioOutput(), self.CROSSFADE_LANE, 0.0, crossfade_ms, CURVE_EQUAL_POWER,
+                                   on_finished=self._finish_crossfade)
+        else:
+            outgoing.stop()
+
+        self.playerSwapped.emit(outgoing, incoming)
+        return True
+
+    def set_volume(self, volume: float):
+        self.volume = volume
+        for player in (self.player, self._standby):
+            self._fade_engine.set_base(player.audioOutput(), self._level(player))
+
+    # Complete a running crossfade at once: the incoming player at full volume, the outgoing stopped and
+    # ready to play at full volume when next primed
+    def _finish_crossfade(self):
+        if self._outgoing is not None:
+            self._outgoing.stop()
+            self._fade_engine.set_lane(self._outgoing.audioOutput(), self.CROSSFADE_LANE, 1.0)
+            self._fade_engine.set_lane(self.player.audioOutput(), self.CROSSFADE_LANE, 1.0)
+            self._outgoing = None
+
+    # ----------------------------------------------------------------------
+    # Gap measurement
+    # ----------------------------------------------------------------------
+    # Time from now until player is first heard. Also used for tracks loaded without priming, for comparison.
+    def begin_gap_measure(self, player: QMediaPlayer, label: str = "Playlist cold"):
+        self._gap_player = player
+        self._gap_started_ns = time.perf_counter_ns()
+        self._gap_trace = cue_tracer.start(label)
+
+    def _on_position_changed(self, player: QMediaPlayer, position: int):
+        if player is self._gap_player and position > 0:
+            self.last_gap_ms = (time.perf_counter_ns() - self._gap_started_ns) / 1_000_000
+            cue_tracer.finish(self._gap_trace, "audible")
+            logger.info(f"Music Deck: Next track heard {self.last_gap_ms:.1f} ms after handover ({self._gap_trace.label})")
+            self._gap_player = None
+            self._gap_trace = None
+            self.gapMeasured.emit(self.last_gap_ms)
+
+        # Ask for the handover once per track, when a crossfade is wanted and the next track is ready
+        if (player is self.player and self.crossfade_ms > 0 and self._primed_path and not self._crossfade_signalled
+                and player.loops() == QMediaPlayer.Loops.Once):
+            duration = player.duration()
+            if duration > self.crossfade_ms and duration - position <= self.crossfade_ms:
+                self._crossfade_signalled = True
+                self.crossfadeDue.emit()
@@ -0,0 +1,393 @@
+# osc_codec.py
+# OSC 1.0/1.1 packet encoding and decoding. Decoding reads the datagram in place with precompiled struct
+# unpackers: bundle elements are parsed at their offsets rather than sliced out, and blob arguments are
+# returned as memoryview slices of the original packet. Strings are the only arguments that are copied.
+#
+# Supported type tags:
+#   i int32  f float32  s string  b blob  h int64  t timetag  d float64  S symbol  c char  r RGBA color
+#   m MIDI   T true     F false   N nil   I impulse  [ ] array
+import struct
+from typing import NamedTuple
+
+OSC_BUNDLE_TAG = b"#bundle\0"
+OSC_IMMEDIATE = 1
+OSC_MAX_BUNDLE_DEPTH = 8
+
+# Seconds between the NTP epoch (1900) and the Unix epoch (1970)
+NTP_UNIX_OFFSET = 2208988800
+
+def ntp_to_unix(timetag: int) -> float:
+    return (timetag >> 32) - NTP_UNIX_OFFSET + (timetag & 0xFFFFFFFF) / 4294967296.0
+
+def unix_to_ntp(seconds: float) -> int:
+    whole = int(seconds)
+    return ((whole + NTP_UNIX_OFFSET) << 32) | int((seconds - whole) * 4294967296.0)
+
+_INT32 = struct.Struct(">i")
+_UINT32 = struct.Struct(">I")
+_FLOAT32 = struct.Struct(">f")
+_INT64 = struct.Struct(">q")
+_UINT64 = struct.Struct(">Q")
+_FLOAT64 = struct.Struct(">d")
+
+# 'I' (impulse / infinitum) carries no data; represented by this marker
+class Impulse:
+    def __repr__(self):
+        return "Impulse"
+
+IMPULSE = Impulse()
+
+# Typed wrappers for the values that would otherwise be ambiguous when encoding
+class TimeTag(int):
+    pass
+
+class Symbol(str):
+    pass
+
+class MidiMessage(NamedTuple):
+    port: int
+    status: int
+    data1: int
+    data2: int
+
+class RGBA(NamedTuple):
+    red: int
+    green: int
+    blue: int
+    alpha: int
+
+class OSCDecodeError(ValueError):
+    pass
+
+def _pad4(length: int) -> int:
+    return (length + 3) & ~0x03
+
+def _check(end: int, offset: int, size: int):
+    if offset + size > end:
+        raise OSCDecodeError(f"argument at {offset} overruns packet ending at {end}")
+
+# Decode a bundle into (timetag, [(address, args)]) groups for the bundle and every nested bundle,
+# outermost first
+def parse_bundle(data: bytes) -> list:
+    return _parse_bundle(data, 0, len(data), 0)
+
+def is_bundle(data: bytes) -> bool:
+    return data.startswith(OSC_BUNDLE_TAG)
+
+# Decode any packet into (timetag, [(address, args)]) groups; a plain message is a single immediate group
+def decode_packet(data: bytes) -> list:
+    if is_bundle(data):
+        return [group for group in _parse_bundle(data, 0, len(data), 0) if group[1]]
+    return [(OSC_IMMEDIATE, [parse_message(data)])]
+
+# Each distinct type tag string is compiled once into a plan: runs of fixed size numbers become a single
+# struct unpack, everything else a step of its own. Controllers send the same few messages over and over,
+# so nearly every packet reuses a cached plan.
+_FIXED, _STRING, _SYMBOL, _BLOB, _TIMETAG, _CHAR, _RGBA, _MIDI, _CONSTANT, _OPEN, _CLOSE = range(11)
+_FIXED_CODES = {"i": "i", "f": "f", "h": "q", "d": "d"}
+_CONSTANTS = {"T": True, "F": False, "N": None, "I": IMPULSE}
+_PLAN_CACHE_SIZE = 256
+_plans = {}
+
+def _compile_plan(typetags: bytes) -> tuple:
+    steps = []
+    fixed = ""
+    depth = 0
+    for tag in typetags.decode("ascii", "replace"):
+        if tag in _FIXED_CODES:
+            fixed += _FIXED_CODES[tag]
+            continue
+        if fixed:
+            steps.append((_FIXED, struct.Struct(">" + fixed)))
+            fixed = ""
+
+        if tag == "s":
+            steps.append((_STRING, None))
+        elif tag == "S":
+            steps.append((_SYMBOL, None))
+        elif tag == "b":
+            steps.append((_BLOB, None))
+        elif tag == "t":
+            steps.append((_TIMETAG, None))
+        elif tag == "c":
+            steps.append((_CHAR, None))
+        elif tag == "r":
+            steps.append((_RGBA, None))
+        elif tag == "m":
+            steps.append((_MIDI, None))
+        elif tag in _CONSTANTS:
+            steps.append((_CONSTANT, _CONSTANTS[tag]))
+        elif tag == "[":
+            depth += 1
+            steps.append((_OPEN, None))
+        elif tag == "]":
+            depth -= 1
+            if depth < 0:
+                raise OSCDecodeError("unbalanced ']' in type tags")
+            steps.append((_CLOSE, None))
+        else:
+            # The size of an unknown argument cannot be known, so nothing after it can be trusted
+            raise OSCDecodeError(f"unknown type tag '{tag}'")
+
+    if fixed:
+        steps.append((_FIXED, struct.Struct(">" + fixed)))
+    if depth:
+        raise OSCDecodeError("unterminated array in type tags")
+
+    if len(_plans) >= _PLAN_CACHE_SIZE:
+        _plans.clear()
+    plan = tuple(steps)
+    _plans[typetags] = plan
+    return plan
+
+# Decode a single message. Returns (address, args).
+# Offsets are absolute positions in data, so bundle elements are parsed in place without slicing the packet.
+# OSC's 4 byte alignment holds relative to the packet start because every element begins on a 4 byte boundary.
+def parse_message(data: bytes, start: int = 0, end: int = -1) -> tuple[str, list]:
+    if end < 0:
+        end = len(data)
+    find = data.find
+    terminator = find(b"\0", start, end)
+    if terminator < 0:
+        raise OSCDecodeError("unterminated address")
+    # decode() with no arguments is UTF-8 without the codec lookup
+    address = data[start:terminator].decode().strip()
+    offset = (terminator + 4) & ~0x03
+    if offset >= end:
+        # OSC 1.0 allows messages without a type tag string
+        return address, []
+
+    if data[offset] != 0x2C: # ','
+        raise OSCDecodeError(f"missing type tag string in {address}")
+    terminator = find(b"\0", offset, end)
+    if terminator < 0:
+        raise OSCDecodeError(f"unterminated type tags in {address}")
+    typetags = data[offset + 1:terminator]
+    offset = (terminator + 4) & ~0x03
+
+    plan = _plans.get(typetags)
+    if plan is None:
+        plan = _compile_plan(typetags)
+
+    args = []
+    stack = None # open arrays
+    view = None  # memoryview of data, made for the first blob
+    current = args
+    for kind, unpacker in plan:
+        if kind == _FIXED:
+            if offset + unpacker.size > end:
+                raise OSCDecodeError(f"arguments overrun packet in {address}")
+            current.extend(unpacker.unpack_from(data, offset))
+            offset += unpacker.size
+        elif kind == _STRING or kind == _SYMBOL:
+            terminator = find(b"\0", offset, end)
+            if terminator < 0:
+                raise OSCDecodeError(f"unterminated string in {address}")
+            value = data[offset:terminator].decode()
+            current.append(value if kind == _STRING else Symbol(value))
+            offset = (terminator + 4) & ~0x03
+        elif kind == _CONSTANT:
+            current.append(unpacker)
+        elif kind == _BLOB:
+            if offset + 4 > end:
+                raise OSCDecodeError(f"blob size overruns packet in {address}")
+            (size,) = _INT32.unpack_from(data, offset)
+            offset += 4
+            if size < 0:
+                raise OSCDecodeError(f"negative blob size {size}")
+            if offset + size > end:
+                raise OSCDecodeError(f"blob overruns packet in {address}")
+            # Zero copy: the blob is a view into the received packet
+            if view is None:
+                view = memoryview(data)
+            current.append(view[offset:offset + size])
+            offset += (size + 3) & ~0x03
+        elif kind == _TIMETAG:
+            _check(end, offset, 8)
+            current.append(TimeTag(_UINT64.unpack_from(data, offset)[0]))
+            offset += 8
+        elif kind == _CHAR:
+            _check(end, offset, 4)
+            current.append(chr(_UINT32.unpack_from(data, offset)[0] & 0x10FFFF))
+            offset += 4
+        elif kind == _RGBA:
+            _check(end, offset, 4)
+            current.append(RGBA(*data[offset:offset + 4]))
+            offset += 4
+        elif kind == _MIDI:
+            _check(end, offset, 4)
+            current.append(MidiMessage(*data[offset:offset + 4]))
+            offset += 4
+        elif kind == _OPEN:
+            array = []
+            current.append(array)
+            if stack is None:
+                stack = []
+            stack.append(current)
+            current = array
+        else: # _CLOSE
+            current = stack.pop()
+
+    return address, args
+
+def _parse_bundle(data: bytes, start: int, end: int, depth: int) -> list:
+    if depth >= OSC_MAX_BUNDLE_DEPTH:
+        raise OSCDecodeError("bundles nested too deeply")
+    if end - start < 16 or not data.startswith(OSC_BUNDLE_TAG, start):
+        raise OSCDecodeError("truncated or missing bundle header")
+
+    timetag = _UINT64.unpack_from(data, start + 8)[0]
+    messages = []
+    groups = [(timetag, messages)]
+
+    offset = start + 16
+    while offset < end:
+        _check(end, offset, 4)
+        size = _INT32.unpack_from(data, offset)[0]
+        offset += 4
+        if size <= 0 or size & 0x03 or offset + size > end:
+            raise OSCDecodeError(f"bundle element size {size} is invalid")
+
+        if data.startswith(OSC_BUNDLE_TAG, offset):
+            groups.extend(_parse_bundle(data, offset, offset + size, depth + 1))
+        else:
+            messages.append(parse_message(data, offset, offset + size))
+        offset += size
+
+    return groups
+
+# --- Encoding ---
+def _encode_string(text: str) -> bytes:
+    raw = text.encode("utf-8") + b"\0"
+    return raw + b"\0" * (_pad4(len(raw)) - len(raw))
+
+def _encode_args(args, tags: list, payload: list):
+    for arg in args:
+        if arg is True:
+            tags.append("T")
+        elif arg is False:
+            tags.append("F")
+        elif arg is None:
+            tags.append("N")
+        elif arg is IMPULSE:
+            tags.append("I")
+        elif isinstance(arg, TimeTag):
+            tags.append("t")
+            payload.append(_UINT64.pack(arg))
+        elif isinstance(arg, int):
+            if -0x80000000 <= arg <= 0x7FFFFFFF:
+                tags.append("i")
+                payload.append(_INT32.pack(arg))
+            else:
+                tags.append("h")
+                payload.append(_INT64.pack(arg))
+        elif isinstance(arg, float):
+            tags.append("f")
+            payload.append(_FLOAT32.pack(arg))
+        elif isinstance(arg, Symbol):
+            tags.append("S")
+            payload.append(_encode_string(arg))
+        elif isinstance(arg, str):
+            tags.append("s")
+            payload.append(_encode_string(arg))
+        elif isinstance(arg, (bytes, bytearray, memoryview)):
+            blob = bytes(arg)
+            tags.append("b")
+            payload.append(_INT32.pack(len(blob)) + blob + b"\0" * (_pad4(len(blob)) - len(blob)))
+        elif isinstance(arg, RGBA):
+            tags.append("r")
+            payload.append(bytes(arg))
+        elif isinstance(arg, MidiMessage):
+            tags.append("m")
+            payload.append(bytes(arg))
+        elif isinstance(arg, (list, tuple)):
+            tags.append("[")
+            _encode_args(arg, tags, payload)
+            tags.append("]")
+        else:
+            raise TypeError(f"cannot encode {type(arg).__name__} as an OSC argument")
+
+def encode_message(address: str, args=()) -> bytes:
+    tags = [","]
+    payload = []
+    _encode_args(args, tags, payload)
+    return _encode_string(address) + _encode_string("".join(tags)) + b"".join(payload)
+
+# elements are encoded messages or bundles
+def encode_bundle(timetag: int, elements) -> bytes:
+    parts = [OSC_BUNDLE_TAG, _UINT64.pack(timetag)]
+    for element in elements:
+        parts.append(_INT32.pack(len(element)))
+        parts.append(element)
+    return b"".join(parts)
+
+# --- SLIP framing (OSC 1.1 over stream transports, RFC 1055 double END) ---
+SLIP_END = 0xC0
+SLIP_ESC = 0xDB
+SLIP_ESC_END = 0xDC
+SLIP_ESC_ESC = 0xDD
+SLIP_MAX_FRAME = 1024 * 1024
+
+_SLIP_END_BYTE = bytes([SLIP_END])
+_SLIP_ESC_BYTE = bytes([SLIP_ESC])
+
+def slip_encode(packet: bytes) -> bytes:
+    if SLIP_ESC in packet or SLIP_END in packet:
+        packet = (packet.replace(_SLIP_ESC_BYTE, bytes([SLIP_ESC, SLIP_ESC_ESC]))
+                        .replace(_SLIP_END_BYTE, bytes([SLIP_ESC, SLIP_ESC_END])))
+    return _SLIP_END_BYTE + packet + _SLIP_END_BYTE
+
+# Reassembles SLIP frames from a byte stream that may split or join them anywhere. One per connection.
+class SLIPDecoder:
+    def __init__(self, max_frame: int = SLIP_MAX_FRAME):
+        self._partial = bytearray()
+        self._max_frame = max_frame
+        self._overflowed = False
+        self.dropped_frames = 0 # oversized or badly escaped
+
+    # Returns the complete packets in data; a frame still being received is kept for the next call.
+    # A frame longer than max_frame is discarded up to its closing END so one bad sender cannot exhaust memory.
+    def feed(self, data: bytes) -> list[bytes]:
+        packets = []
+        frames = data.split(_SLIP_END_BYTE)
+        for index, frame in enumerate(frames):
+            last = index == len(frames) - 1
+            if not self._overflowed:
+                self._partial += frame
+                if len(self._partial) > self._max_frame:
+                    self._overflowed = True
+                    self._partial.clear()
+            if last:
+                break
+
+            if self._overflowed:
+                self._overflowed = False
+                self.dropped_frames += 1
+            elif self._partial:
+                # Empty frames between back to back ENDs are padding, not packets
+                packet = self._unescape(bytes(self._partial))
+                if packet is None:
+                    self.dropped_frames += 1
+                else:
+                    packets.append(packet)
+            self._partial.clear()
+        return packets
+
+    @staticmethod
+    def _unescape(frame: bytes) -> bytes | None:
+        if SLIP_ESC not in frame:
+            return frame
+        # Escapes are always pairs, so one pass over the pieces between ESC bytes undoes them
+        pieces = frame.split(_SLIP_ESC_BYTE)
+        out = bytearray(pieces[0])
+        for piece in pieces[1:]:
+            if not piece:
+                return None
+            if piece[0] == SLIP_ESC_END:
+                out.append(SLIP_END)
+            elif piece[0] == SLIP_ESC_ESC:
+                out.append(SLIP_ESC)
+            else:
+                return None
+            out += piece[1:]
+        return bytes(out)
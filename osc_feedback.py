@@ -0,0 +1,242 @@
+# osc_feedback.py
+# Outbound OSC so controllers can show what ImproTron is doing: the scores, the countdown, the music position
+# and track, the sound effect palette and the hot button titles. Features publish values under /state/...
+# addresses. Controllers ask for them once with /query, or subscribe and are pushed changes. Pushes are
+# coalesced, so a subscriber only ever receives the latest value of each address, and rate limited per
+# subscriber so a busy show cannot flood a button panel on theater Wi-Fi.
+#
+#   /query <pattern> [reply port]                     Reply with every state value matching the pattern
+#   /subscribe <pattern> [max rate hz] [reply port]   Push changes matching the pattern, starting with the current values
+#   /unsubscribe [pattern] [reply port]               Stop pushes; all of the sender's subscriptions when no pattern
+#
+# Replies go back to the sender: down the connection for TCP, otherwise to the datagram's source port or the
+# reply port when the controller listens on a different one. UDP subscriptions lapse unless renewed.
+import logging
+import time
+
+from PySide6.QtCore import QObject, Slot, QTimer
+
+from osc_codec import encode_message, encode_bundle, OSC_IMMEDIATE
+from osc_server import OSCMessage, compile_address_pattern
+
+logger = logging.getLogger(__name__)
+
+OSC_QUERY = "/query"
+OSC_SUBSCRIBE = "/subscribe"
+OSC_UNSUBSCRIBE = "/unsubscribe"
+
+# State published by ImproTron
+STATE_SCORE_LEFT = "/state/score/left"          # score
+STATE_SCORE_RIGHT = "/state/score/right"        # score
+STATE_TIMER = "/state/timer"                    # "hh:mm:ss", seconds remaining
+STATE_MUSIC_POSITION = "/state/music/position"  # position s, remaining s, "mm:ss" remaining
+STATE_MUSIC_TRACK = "/state/music/track"        # title, artist
+STATE_MUSIC_ONSETS = "/state/music/onsets"      # onset times s of the loaded track (up to MAX_ONSETS)
+STATE_SFX = "/state/sfx/{}"                     # label, playing (one per palette button)
+STATE_HOT_BUTTON = "/state/hotbutton/{}"        # title (one per hot button)
+STATE_OSC_INGRESS = "/state/osc/ingress"        # queue depth, max depth, received, coalesced, dropped, unparseable
+STATE_OSC_ENDPOINT = "/state/osc/endpoint/{}"   # endpoint, packets, packets/s, busiest sender, its packets/s (one per listener)
+
+# Keep each datagram under a typical Wi-Fi MTU
+MAX_PACKET_BYTES = 1400
+
+# Onsets published for a track; enough for several minutes of music and still within one datagram
+MAX_ONSETS = 240
+
+class _Subscriber:
+    def __init__(self, destination: str, interval_ns: int):
+        self.destination = destination
+        self.interval_ns = interval_ns
+        self.patterns = {} # pattern -> compiled pattern
+        self.dirty = set()
+        self.next_send_ns = 0
+        self.renewed = time.monotonic()
+
+    def matches(self, address: str) -> bool:
+        for compiled in self.patterns.values():
+            if compiled.match(address):
+                return True
+        return False
+
+class OSCFeedback(QObject):
+    DEFAULT_RATE_HZ = 10.0
+    MIN_RATE_HZ = 0.5
+    MAX_RATE_HZ = 30.0
+    MAX_SUBSCRIBERS = 32
+    LEASE_S = 600
+
+    def __init__(self, osc_server, parent=None):
+        super().__init__(parent)
+        self._server = osc_server
+        self._state = {}        # address -> latest args
+        self._subscribers = {}  # destination -> _Subscriber
+
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush)
+
+        osc_server.register_route(OSC_QUERY, self._on_query)
+        osc_server.register_route(OSC_SUBSCRIBE, self._on_subscribe)
+        osc_server.register_route(OSC_UNSUBSCRIBE, self._on_unsubscribe)
+        osc_server.tcpClientDisconnected.connect(self._on_client_disconnected)
+
+    # Record a state value and queue it for every interested subscriber. Unchanged values cost a comparison.
+    def publish(self, address: str, *args):
+        args = list(args)
+        if self._state.get(address) == args:
+            return
+
+        self._state[address] = args
+        queued = False
+        for subscriber in self._subscribers.values():
+            if subscriber.matches(address):
+                subscriber.dirty.add(address)
+                queued = True
+
+        if queued:
+            self._arm()
+
+    def state(self, address: str) -> list | None:
+        return self._state.get(address)
+
+    def subscribers(self) -> list[str]:
+        return list(self._subscribers.keys())
+
+    # ----------------------------------------------------------------------
+    # Requests from controllers
+    # ----------------------------------------------------------------------
+    def _on_query(self, message: OSCMessage):
+        compiled = self._pattern_arg(message)
+        if compiled is None:
+            return
+
+        addresses = [address for address in self._state if compiled.match(address)]
+        destination = self._reply_destination(message, 1)
+        if addresses and destination:
+            self._send(destination, addresses)
+
+    def _on_subscribe(self, message: OSCMessage):
+        compiled = self._pattern_arg(message)
+        destination = self._reply_destination(message, 2)
+        if compiled is None or not destination:
+            return
+
+        rate_hz = self.DEFAULT_RATE_HZ
+        if len(message.args) > 1:
+            try:
+                rate_hz = min(self.MAX_RATE_HZ, max(self.MIN_RATE_HZ, float(message.args[1])))
+            except (ValueError, TypeError):
+                logger.warning(f"OSC Feedback: Invalid rate {message.args[1]} from {message.source}")
+
+        subscriber = self._subscribers.get(destination)
+        if subscriber is None:
+            if len(self._subscribers) >= self.MAX_SUBSCRIBERS:
+                logger.warning(f"OSC Feedback: Refusing subscription from {destination}; "
+                               f"{self.MAX_SUBSCRIBERS} subscribers already")
+                return
+            subscriber = _Subscriber(destination, 0)
+            self._subscribers[destination] = subscriber
+            logger.info(f"OSC Feedback: {destination} subscribed to {message.args[0]}")
+
+        subscriber.interval_ns = int(1_000_000_000 / rate_hz)
+        subscriber.patterns[str(message.args[0])] = compiled
+        subscriber.renewed = time.monotonic()
+
+        # Start the subscriber off with the current values
+        subscriber.dirty.update(address for address in self._state if compiled.match(address))
+        if subscriber.dirty:
+            self._arm()
+
+    def _on_unsubscribe(self, message: OSCMessage):
+        destination = self._reply_destination(message, 1)
+        subscriber = self._subscribers.get(destination)
+        if subscriber is None:
+            return
+
+        if message.args:
+            subscriber.patterns.pop(str(message.args[0]), None)
+        else:
+            subscriber.patterns.clear()
+
+        if not subscriber.patterns:
+            del self._subscribers[destination]
+            logger.info(f"OSC Feedback: {destination} unsubscribed")
+
+    @Slot(str)
+    def _on_client_disconnected(self, source):
+        self._subscribers.pop(source, None)
+
+    def _pattern_arg(self, message: OSCMessage):
+        if not message.args:
+            logger.warning(f"OSC Feedback: {message.address} needs an address pattern")
+            return None
+        try:
+            return compile_address_pattern(str(message.args[0]))
+        except ValueError as e:
+            logger.warning(f"OSC Feedback: Invalid pattern in {message.address}: {e}")
+            return None
+
+    # The sender, or the sender's host at the reply port given in args[port_index]. TCP replies always use
+    # the connection.
+    def _reply_destination(self, message: OSCMessage, port_index: int) -> str:
+        if len(message.args) <= port_index or message.source in self._server.tcp_clients():
+            return message.source
+
+        host, _, _ = message.source.rpartition(":")
+        try:
+            port = int(message.args[port_index])
+        except (ValueError, TypeError):
+            logger.warning(f"OSC Feedback: Invalid reply port {message.args[port_index]} from {message.source}")
+            return message.source
+        return f"{host}:{port}" if host and 0 < port < 65536 else message.source
+
+    # ----------------------------------------------------------------------
+    # Pushes
+    # ----------------------------------------------------------------------
+    # Wake when the earliest subscriber with something to send is next allowed to send
+    def _arm(self):
+        now_ns = time.monotonic_ns()
+        due_ns = min((subscriber.next_send_ns for subscriber in self._subscribers.values() if subscriber.dirty),
+                     default=None)
+        if due_ns is None:
+            return
+
+        delay_ms = max(0, (due_ns - now_ns) // 1_000_000)
+        if not self._flush_timer.isActive() or self._flush_timer.remainingTime() > delay_ms:
+            self._flush_timer.start(delay_ms)
+
+    @Slot()
+    def _flush(self):
+        now_ns = time.monotonic_ns()
+        lease_expiry = time.monotonic() - self.LEASE_S
+        tcp_clients = self._server.tcp_clients()
+
+        for destination, subscriber in list(self._subscribers.items()):
+            if destination not in tcp_clients and subscriber.renewed < lease_expiry:
+                logger.info(f"OSC Feedback: Subscription from {destination} lapsed")
+                del self._subscribers[destination]
+                continue
+
+            if subscriber.dirty and subscriber.next_send_ns <= now_ns:
+                self._send(destination, sorted(subscriber.dirty))
+                subscriber.dirty.clear()
+                subscriber.next_send_ns = now_ns + subscriber.interval_ns
+
+        self._arm()
+
+    # Current values of the addresses as immediate bundles, split so no datagram exceeds the MTU
+    def _send(self, destination: str, addresses: list):
+        elements = []
+        size = 16
+        for address in addresses:
+            element = encode_message(address, self._state[address])
+            if elements and size + 4 + len(element) > MAX_PACKET_BYTES:
+                self._server.send_to(destination, encode_bundle(OSC_IMMEDIATE, elements))
+                elements = []
+                size = 16
+            elements.append(element)
+            size += 4 + len(element)
+
+        if elements:
+            packet = elements[0] if len(elements) == 1 else encode_bundle(OSC_IMMEDIATE, elements)
+            self._server.send_to(destination, packet)
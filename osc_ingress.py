@@ -0,0 +1,408 @@
+# osc_ingress.py
+# The network side of the OSC server, run on its own thread. The worker owns the UDP socket and the TCP
+# listener, reads and decodes packets there and passes dispatch-ready commands to the GUI thread through a
+# bounded queue. A long repaint or image decode on the GUI thread no longer delays reading the socket, and a
+# flood of messages cannot build an unbounded backlog: messages for addresses where only the latest value
+# matters replace their predecessor while it waits, and anything beyond the queue's capacity is dropped and
+# counted.
+#
+# The worker listens on any number of UDP endpoints, one socket each, including multicast groups and IPv6
+# addresses, and counts the traffic of every endpoint and sender so a flooding controller can be found.
+#
+# The worker can also record every packet it reads, with its arrival time, for replay by osc_loadgen.py.
+import logging
+import struct
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, Signal, Slot
+from PySide6.QtNetwork import QUdpSocket, QHostAddress, QTcpServer, QAbstractSocket, QNetworkInterface
+
+from osc_codec import decode_packet, SLIPDecoder, slip_encode, OSC_IMMEDIATE
+
+logger = logging.getLogger(__name__)
+
+# A UDP address to listen on. For a multicast group, interface names the network interface to join it on;
+# empty means the system's choice.
+class OSCEndpoint(NamedTuple):
+    host: str
+    port: int
+    interface: str = ""
+
+    def __str__(self):
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        return f"{host}:{self.port}" + (f"@{self.interface}" if self.interface else "")
+
+# Parse host:port, [ipv6]:port, or group:port@interface for multicast
+def parse_endpoint(text: str) -> OSCEndpoint:
+    address, _, interface = text.strip().partition("@")
+    if address.startswith("["):
+        host, _, port = address[1:].partition("]:")
+    else:
+        host, _, port = address.rpartition(":")
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"'{text}' is not host:port")
+    if QHostAddress(host).isNull():
+        raise ValueError(f"'{host}' is not an IP address")
+    return OSCEndpoint(host, int(port), interface)
+
+# Traffic through one endpoint, counted on the ingress thread. Senders beyond MAX_SOURCES are counted as
+# "other" so a spray of spoofed sources cannot grow the table.
+class EndpointStats:
+    MAX_SOURCES = 64
+
+    def __init__(self, name: str):
+        self.name = name
+        self.bound = False # Set once the endpoint's socket is listening
+        self.packets = 0
+        self.bytes = 0
+        self.sources = {} # host:port -> packets
+
+    def count(self, source: str, size: int):
+        self.packets += 1
+        self.bytes += size
+        sources = self.sources
+        if source in sources:
+            sources[source] += 1
+        elif len(sources) < self.MAX_SOURCES:
+            sources[source] = 1
+        else:
+            sources["other"] = sources.get("other", 0) + 1
+
+OSC_RECORDING_MAGIC = b"ITOSCREC"
+OSC_RECORDING_VERSION = 1
+TRANSPORT_UDP = 0
+TRANSPORT_TCP = 1
+
+# Recording header: magic, version. Each packet: ns since recording started, transport, source length,
+# packet length, then the source (host:port, UTF-8) and the packet exactly as received (unSLIPped for TCP).
+_RECORDING_HEADER = struct.Struct(">8sH")
+_RECORD = struct.Struct(">QBHI")
+
+# Writes packets to a recording. Used only on the ingress thread.
+class OSCRecorder:
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.packets = 0
+        self._file = open(file_name, "wb")
+        self._file.write(_RECORDING_HEADER.pack(OSC_RECORDING_MAGIC, OSC_RECORDING_VERSION))
+        self._start_ns = time.perf_counter_ns()
+
+    def write(self, received_ns: int, transport: int, source: str, data: bytes):
+        source_bytes = source.encode("utf8")
+        self._file.write(_RECORD.pack(max(0, received_ns - self._start_ns), transport, len(source_bytes), len(data)))
+        self._file.write(source_bytes)
+        self._file.write(data)
+        self.packets += 1
+
+    def close(self):
+        self._file.close()
+
+# Yields (ns since recording started, transport, source, packet) for each packet in a recording. A recording
+# cut short, e.g. by a crash, ends at its last complete packet.
+def read_osc_recording(file_name: str):
+    with open(file_name, "rb") as recording:
+        header = recording.read(_RECORDING_HEADER.size)
+        if len(header) < _RECORDING_HEADER.size:
+            raise ValueError(f"{file_name} is not an OSC recording")
+        magic, version = _RECORDING_HEADER.unpack(header)
+        if magic != OSC_RECORDING_MAGIC or version != OSC_RECORDING_VERSION:
+            raise ValueError(f"{file_name} is not an OSC recording, or from an unsupported version")
+
+        while True:
+            record = recording.read(_RECORD.size)
+            if len(record) < _RECORD.size:
+                return
+            offset_ns, transport, source_length, data_length = _RECORD.unpack(record)
+            source = recording.read(source_length)
+            data = recording.read(data_length)
+            if len(source) < source_length or len(data) < data_length:
+                return
+            yield offset_ns, transport, source.decode("utf8", "replace"), data
+
+# Decoded commands waiting for the GUI thread. Each entry is [timetag, [(address, args)], source, received_ns],
+# received_ns being time.perf_counter_ns() when the packet was read.
+class OSCIngressQueue:
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.coalesced_addresses = frozenset() # Replaced, never mutated, so the worker can read it unlocked
+
+        self._lock = threading.Lock()
+        self._entries = deque()
+        self._latest = {} # coalesced address -> its entry still in the queue
+
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    # Returns True when the queue was empty, i.e. the consumer has to be woken
+    def put(self, timetag: int, messages: list, source: str, received_ns: int = 0) -> bool:
+        address = messages[0][0] if len(messages) == 1 and timetag == OSC_IMMEDIATE else None
+        if address not in self.coalesced_addresses:
+            address = None
+
+        with self._lock:
+            self.received += 1
+            if address is not None:
+                entry = self._latest.get(address)
+                if entry is not None:
+                    # Keep the queue position of the first, the value of the latest
+                    entry[1] = messages
+                    entry[2] = source
+                    entry[3] = received_ns
+                    self.coalesced += 1
+                    return False
+
+            if len(self._entries) >= self.capacity:
+                self.dropped += 1
+                return False
+
+            entry = [timetag, messages, source, received_ns]
+            self._entries.append(entry)
+            if address is not None:
+                self._latest[address] = entry
+
+            depth = len(self._entries)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            return depth == 1
+
+    def take_all(self) -> deque:
+        with self._lock:
+            entries = self._entries
+            self._entries = deque()
+            self._latest.clear()
+            return entries
+
+    def depth(self) -> int:
+        return len(self._entries)
+
+# Lives on the ingress thread. Sockets are created in start() so they belong to that thread.
+class OSCIngressWorker(QObject):
+    packetsQueued = Signal()          # The queue went from empty to holding commands
+    clientConnected = Signal(str)     # host:port of a TCP client
+    clientDisconnected = Signal(str)
+
+    RECEIVE_BUFFER_BYTES = 1024 * 1024
+    MAX_REPLY_ROUTES = 1024
+
+    # TCP listens on the host of the first endpoint, at tcp_port when it is above 0
+    def __init__(self, queue: OSCIngressQueue, endpoints: list, tcp_port: int, max_tcp_clients: int):
+        super().__init__()
+        self._queue = queue
+        self._endpoints = list(endpoints)
+        self._tcp_port = tcp_port
+        self._max_tcp_clients = max_tcp_clients
+
+        # Fixed once constructed, so the GUI thread can read the counters without locking
+        self.endpoint_stats = [EndpointStats(str(endpoint)) for endpoint in self._endpoints]
+        self.tcp_stats = None
+        if tcp_port > 0 and self._endpoints:
+            self.tcp_stats = EndpointStats(f"tcp {OSCEndpoint(self._endpoints[0].host, tcp_port)}")
+
+        self._sockets = []
+        self._reply_sockets = {} # host:port -> the socket its last datagram arrived on
+        self._tcp_server = None
+        self._tcp_clients = {} # host:port -> QTcpSocket
+        self._recorder = None
+        self.parse_errors = 0
+
+    @Slot()
+    def start(self):
+        for endpoint, stats in zip(self._endpoints, self.endpoint_stats):
+            self._open_endpoint(endpoint, stats)
+
+        if self.tcp_stats is None:
+            return
+
+        listen_host = QHostAddress(self._endpoints[0].host)
+        self._tcp_server = QTcpServer(self)
+        self._tcp_server.newConnection.connect(self._on_new_connection)
+        if not self._tcp_server.listen(listen_host, self._tcp_port):
+            logger.error(f"OSCServer: Failed to listen for OSC over TCP on {listen_host.toString()}:"
+                         f"{self._tcp_port}: {self._tcp_server.errorString()}")
+        else:
+            self.tcp_stats.bound = True
+            logger.info(f"OSCServer: Listening for OSC over TCP (SLIP) on {listen_host.toString()}:{self._tcp_port}")
+
+    # A multicast group is received by binding the port on every address of the group's family, shared with
+    # other listeners on the machine, then joining the group
+    def _open_endpoint(self, endpoint: OSCEndpoint, stats: EndpointStats):
+        address = QHostAddress(endpoint.host)
+        udp_socket = QUdpSocket(self)
+        if address.isMulticast():
+            ipv6 = address.protocol() == QAbstractSocket.NetworkLayerProtocol.IPv6Protocol
+            any_address = QHostAddress(QHostAddress.SpecialAddress.AnyIPv6 if ipv6 else QHostAddress.SpecialAddress.AnyIPv4)
+            bound = udp_socket.bind(any_address, endpoint.port, QAbstractSocket.BindFlag.ShareAddress |
+                                    QAbstractSocket.BindFlag.ReuseAddressHint)
+        else:
+            bound = udp_socket.bind(address, endpoint.port)
+
+        if not bound:
+            logger.error(f"OSCServer: Failed to bind on {endpoint}: {udp_socket.errorString()}")
+            udp_socket.deleteLater()
+            return
+
+        if address.isMulticast():
+            if endpoint.interface:
+                interface = QNetworkInterface.interfaceFromName(endpoint.interface)
+                joined = interface.isValid() and udp_socket.joinMulticastGroup(address, interface)
+            else:
+                joined = udp_socket.joinMulticastGroup(address)
+            if not joined:
+                logger.error(f"OSCServer: Failed to join multicast group {endpoint}: {udp_socket.errorString()}")
+                udp_socket.close()
+                udp_socket.deleteLater()
+                return
+
+        # Room for a burst of fader messages to wait in the kernel rather than be dropped there
+        udp_socket.setSocketOption(QAbstractSocket.SocketOption.ReceiveBufferSizeSocketOption, self.RECEIVE_BUFFER_BYTES)
+        udp_socket.readyRead.connect(lambda udp_socket=udp_socket, stats=stats: self._on_ready_read(udp_socket, stats))
+        self._sockets.append(udp_socket)
+        stats.bound = True
+        logger.info(f"OSCServer: Listening for OSC on {endpoint}" + (" (multicast)" if address.isMulticast() else ""))
+
+    @Slot()
+    def stop(self):
+        for udp_socket in self._sockets:
+            udp_socket.close()
+        self._sockets.clear()
+        self._reply_sockets.clear()
+        if self._tcp_server is not None and self._tcp_server.isListening():
+            self._tcp_server.close()
+        for client in list(self._tcp_clients.values()):
+            client.abort()
+        self._tcp_clients.clear()
+        self.stop_recording()
+
+    # Record every packet read from now on to file_name, replacing any recording in progress
+    @Slot(str)
+    def start_recording(self, file_name: str):
+        self.stop_recording()
+        try:
+            self._recorder = OSCRecorder(file_name)
+        except OSError as e:
+            logger.error(f"OSCServer: Could not record OSC traffic to {file_name}: {e}")
+            return
+        logger.info(f"OSCServer: Recording OSC traffic to {file_name}")
+
+    @Slot()
+    def stop_recording(self):
+        if self._recorder is None:
+            return
+        recorder = self._recorder
+        self._recorder = None
+        try:
+            recorder.close()
+        except OSError as e:
+            logger.error(f"OSCServer: Failed to finish recording {recorder.file_name}: {e}")
+            return
+        logger.info(f"OSCServer: Recorded {recorder.packets} OSC packets to {recorder.file_name}")
+
+    def is_recording(self) -> bool:
+        return self._recorder is not None
+
+    # Send back down the connection for TCP clients, otherwise as a datagram from the listening socket so
+    # replies pass through the same firewall hole the request came in by
+    @Slot(str, object)
+    def send(self, destination: str, packet: bytes):
+        client = self._tcp_clients.get(destination)
+        if client is not None:
+            client.write(slip_encode(packet))
+            return
+
+        host, _, port = destination.rpartition(":")
+        address = QHostAddress(host.strip("[]"))
+        udp_socket = self._reply_sockets.get(destination)
+        if udp_socket is None:
+            udp_socket = self._socket_for(address)
+        if udp_socket is None or address.isNull() or not port.isdigit():
+            logger.warning(f"OSCServer: Cannot send to '{destination}'")
+            return
+        udp_socket.writeDatagram(packet, address, int(port))
+
+    # The first socket of the destination's address family, for destinations that have not sent anything
+    def _socket_for(self, address: QHostAddress):
+        for udp_socket in self._sockets:
+            if udp_socket.localAddress().protocol() in (address.protocol(),
+                                                        QAbstractSocket.NetworkLayerProtocol.AnyIPProtocol):
+                return udp_socket
+        return self._sockets[0] if self._sockets else None
+
+    def _enqueue(self, data: bytes, source: str, transport: int = TRANSPORT_UDP):
+        received_ns = time.perf_counter_ns()
+        if self._recorder is not None:
+            try:
+                self._recorder.write(received_ns, transport, source, data)
+            except OSError as e:
+                logger.error(f"OSCServer: Stopped recording OSC traffic: {e}")
+                self._recorder = None
+
+        try:
+            groups = decode_packet(data)
+        except Exception as e:
+            self.parse_errors += 1
+            logger.warning(f"OSCServer: Failed to parse OSC message from {source}: {e}")
+            return
+
+        wake = False
+        for timetag, messages in groups:
+            wake = self._queue.put(timetag, messages, source, received_ns) or wake
+        if wake:
+            self.packetsQueued.emit()
+
+    # Replies leave from the socket the sender used, so they pass through the same firewall hole and come from
+    # the port the controller expects
+    def _on_ready_read(self, udp_socket: QUdpSocket, stats: EndpointStats):
+        reply_sockets = self._reply_sockets
+        while udp_socket.hasPendingDatagrams():
+            datagram, host, port = udp_socket.readDatagram(udp_socket.pendingDatagramSize())
+            source = f"{host.toString()}:{port}"
+            data = bytes(datagram)
+            stats.count(source, len(data))
+            if reply_sockets.get(source) is not udp_socket:
+                if len(reply_sockets) >= self.MAX_REPLY_ROUTES:
+                    reply_sockets.clear()
+                reply_sockets[source] = udp_socket
+            self._enqueue(data, source)
+
+    # Each TCP client gets its own SLIP decoder since frames can be split across reads or arrive several at once
+    @Slot()
+    def _on_new_connection(self):
+        while self._tcp_server.hasPendingConnections():
+            client = self._tcp_server.nextPendingConnection()
+            source = f"{client.peerAddress().toString()}:{client.peerPort()}"
+            if len(self._tcp_clients) >= self._max_tcp_clients:
+                logger.warning(f"OSCServer: Refusing TCP client {source}; {self._max_tcp_clients} already connected")
+                client.abort()
+                client.deleteLater()
+                continue
+
+            # Cues are small; send replies without waiting to coalesce them
+            client.setSocketOption(QAbstractSocket.SocketOption.LowDelayOption, 1)
+            decoder = SLIPDecoder()
+            self._tcp_clients[source] = client
+            client.readyRead.connect(lambda client=client, source=source, decoder=decoder:
+                                     self._on_tcp_ready_read(client, source, decoder))
+            client.disconnected.connect(lambda client=client, source=source: self._on_tcp_disconnected(client, source))
+            logger.info(f"OSCServer: TCP client connected from {source}")
+            self.clientConnected.emit(source)
+
+    def _on_tcp_ready_read(self, client, source: str, decoder: SLIPDecoder):
+        dropped = decoder.dropped_frames
+        for packet in decoder.feed(bytes(client.readAll())):
+            self.tcp_stats.count(source, len(packet))
+            self._enqueue(packet, source, TRANSPORT_TCP)
+
+        if decoder.dropped_frames != dropped:
+            logger.warning(f"OSCServer: Dropped {decoder.dropped_frames - dropped} malformed SLIP frame(s) from {source}")
+
+    def _on_tcp_disconnected(self, client, source: str):
+        if self._tcp_clients.get(source) is client:
+            del self._tcp_clients[source]
+        client.deleteLater()
+        logger.info(f"OSCServer: TCP client {source} disconnected")
+        self.clientDisconnected.emit(source)
@@ -0,0 +1,301 @@
+# osc_loadgen.py
+# Load generator for the OSC server. Replays traffic recorded with main.py --osc-record, or synthesizes a
+# weighted mix of show messages, over loopback at a controlled rate and reports delivered throughput, drops
+# and dispatch latency. Packets are sent from a separate process so the sender never competes with the server
+# for the interpreter.
+#
+# By default an OSCServer is started in this process with a counting handler behind every address sent, so
+# each loss is accounted for: packets the kernel dropped before the ingress thread read them, messages the
+# ingress queue coalesced or dropped, and the time from a packet being read to its handler running.
+# --target sends to a running ImproTron instead and prints its /state/osc/ingress counters and /latency
+# histograms.
+#   python osc_loadgen.py --rate 2000 --seconds 5
+#   python osc_loadgen.py --burst 5000 --handler-us 200
+#   python osc_loadgen.py --replay show.oscrec --speed 4
+#   python osc_loadgen.py --mix "/sound/fade:8,/button/press:1" --rate 500 --target 127.0.0.1:9000
+import sys
+import time
+import random
+import socket
+import argparse
+import multiprocessing
+
+from osc_codec import encode_message, encode_bundle, decode_packet, slip_encode, OSC_IMMEDIATE
+from osc_ingress import read_osc_recording
+from osc_server import (OSC_SOUND_PLAY, OSC_SOUND_SEEK, OSC_SOUND_STOP, OSC_SOUND_FADE, OSC_MEDIA_SHOW,
+                        OSC_SPINBOX_CHANGE, OSC_BUTTON_PRESS, OSC_SFX_PLAY, is_address_pattern)
+
+# Arguments sent with each address in a synthesized mix; addresses not listed are sent without arguments
+MESSAGE_ARGS = {
+    OSC_SOUND_FADE: lambda rng: [round(rng.uniform(0.5, 5.0), 2)],
+    OSC_SOUND_SEEK: lambda rng: [float(rng.randrange(180)), "walk", "in"],
+    OSC_SOUND_PLAY: lambda rng: ["walk", "in"],
+    OSC_SOUND_STOP: lambda rng: [],
+    OSC_SPINBOX_CHANGE: lambda rng: [rng.choice(["leftScore", "rightScore"]), float(rng.choice([-1, 1, 5]))],
+    OSC_BUTTON_PRESS: lambda rng: [f"hotPB{rng.randrange(1, 21)}"],
+    OSC_SFX_PLAY: lambda rng: [str(rng.randrange(1, 13))],
+    OSC_MEDIA_SHOW: lambda rng: ["main", "logo"],
+}
+
+# A cue storm: a fader and a scrub bar streaming, with scoring, hot buttons and sound effects in between
+DEFAULT_MIX = "/sound/fade:6,/sound/seek:3,/spinbox/change:2,/button/press:2,/soundfx/play:2,/sound/play:1"
+
+def parse_mix(mix: str) -> list[tuple[str, float]]:
+    weights = []
+    for item in mix.split(","):
+        address, _, weight = item.strip().partition(":")
+        if not address.startswith("/"):
+            raise ValueError(f"'{item}' is not an OSC address")
+        weights.append((address, float(weight) if weight else 1.0))
+    return weights
+
+# (offset ns, packet) for count synthesized packets, spaced evenly at rate or all at once when rate is 0
+def synthesize(mix: list, count: int, rate: float, bundle: int, seed: int) -> list[tuple[int, bytes]]:
+    rng = random.Random(seed)
+    addresses = [address for address, _ in mix]
+    weights = [weight for _, weight in mix]
+    interval_ns = int(1_000_000_000 / rate) if rate > 0 else 0
+
+    schedule = []
+    for index in range(count):
+        messages = [encode_message(address, MESSAGE_ARGS.get(address, lambda rng: [])(rng))
+                    for address in rng.choices(addresses, weights, k=bundle)]
+        packet = messages[0] if bundle == 1 else encode_bundle(OSC_IMMEDIATE, messages)
+        schedule.append((index * interval_ns, packet))
+    return schedule
+
+# The recorded timing divided by speed, or evenly spaced at rate when one is given
+def load_recording(file_name: str, speed: float, rate: float) -> list[tuple[int, bytes]]:
+    schedule = [(offset_ns, data) for offset_ns, transport, source, data in read_osc_recording(file_name)]
+    if not schedule:
+        return schedule
+    if rate > 0:
+        interval_ns = int(1_000_000_000 / rate)
+        return [(index * interval_ns, data) for index, (_, data) in enumerate(schedule)]
+
+    first_ns = schedule[0][0]
+    return [(int((offset_ns - first_ns) / speed), data) for offset_ns, data in schedule]
+
+# Runs in the sender process. Puts (packets sent, seconds taken, packets that failed to send) on results.
+def send_packets(schedule: list, host: str, port: int, tcp: bool, results):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    if tcp:
+        sender = socket.create_connection((host, port))
+        sender.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sender = socket.socket(family, socket.SOCK_DGRAM)
+
+    sent = failed = 0
+    start_ns = time.perf_counter_ns()
+    for offset_ns, packet in schedule:
+        # Sleep through long gaps, send immediately when behind so the average rate holds
+        ahead_s = (start_ns + offset_ns - time.perf_counter_ns()) / 1_000_000_000
+        if ahead_s > 0.001:
+            time.sleep(ahead_s)
+        try:
+            if tcp:
+                sender.sendall(slip_encode(packet))
+            else:
+                sender.sendto(packet, (host, port))
+            sent += 1
+        except OSError:
+            failed += 1
+
+    seconds = (time.perf_counter_ns() - start_ns) / 1_000_000_000
+    sender.close()
+    results.put((sent, seconds, failed))
+
+def addresses_in(schedule: list) -> set:
+    addresses = set()
+    for _, packet in schedule:
+        try:
+            for timetag, messages in decode_packet(packet):
+                addresses.update(address for address, args in messages)
+        except ValueError:
+            pass
+    return addresses
+
+def start_sender(schedule: list, host: str, port: int, tcp: bool):
+    results = multiprocessing.Queue()
+    sender = multiprocessing.Process(target=send_packets, args=(schedule, host, port, tcp, results), daemon=True)
+    sender.start()
+    return sender, results
+
+def report_sent(sent: int, seconds: float, failed: int):
+    rate = f"{sent / seconds:.0f} packets/s" if seconds > 0 else "n/a"
+    print(f"Sent {sent} packets in {seconds:.3f} s ({rate})" + (f", {failed} failed to send" if failed else ""))
+
+# ----------------------------------------------------------------------
+# Against an OSCServer in this process
+# ----------------------------------------------------------------------
+def run_local(schedule: list, args) -> int:
+    from PySide6.QtCore import QCoreApplication, QTimer
+    from osc_server import OSCServer
+    from cue_latency import LatencyHistogram
+
+    app = QCoreApplication(sys.argv)
+    server = OSCServer("127.0.0.1", args.port, tcp_port=args.port if args.tcp else 0)
+    latency = LatencyHistogram()
+    delivered = {"count": 0, "first_ns": 0, "last_ns": 0}
+    handler_ns = args.handler_us * 1000
+
+    # Stands in for the work a real handler does on the GUI thread
+    def count(message):
+        now_ns = time.perf_counter_ns()
+        if message.received_ns:
+            latency.record((now_ns - message.received_ns) / 1_000_000)
+        delivered["count"] += 1
+        delivered["first_ns"] = delivered["first_ns"] or now_ns
+        delivered["last_ns"] = now_ns
+        while time.perf_counter_ns() - now_ns < handler_ns:
+            pass
+
+    for address in addresses_in(schedule):
+        if not is_address_pattern(address):
+            server.register_route(address, count)
+
+    # The first endpoint is the UDP one, TCP is listed last
+    endpoint = server.endpoint_stats()[-1 if args.tcp else 0]
+    if not endpoint["bound"]:
+        print(f"The local server is not listening on {endpoint['endpoint']}; is the port in use?")
+        server.disconnectOSCServer()
+        close_server(app, server)
+        return 1
+
+    sender, results = start_sender(schedule, "127.0.0.1", args.port, args.tcp)
+    settle = {"count": -1, "since": 0.0}
+
+    # Finished once the sender is done and nothing more has arrived for the settle time
+    def poll():
+        if sender.is_alive():
+            return
+        if delivered["count"] != settle["count"]:
+            settle["count"] = delivered["count"]
+            settle["since"] = time.monotonic()
+        elif time.monotonic() - settle["since"] >= args.settle:
+            app.quit()
+
+    poll_timer = QTimer()
+    poll_timer.timeout.connect(poll)
+    poll_timer.start(50)
+    app.exec()
+    server.disconnectOSCServer()
+
+    sent, seconds, failed = results.get()
+    report_sent(sent, seconds, failed)
+
+    stats = server.ingress_stats()
+    lost = max(0, sent - stats["received"] - stats["parse_errors"])
+    print(f"Ingress: {stats['received']} read, ~{lost} lost before reading, {stats['coalesced']} coalesced, "
+          f"{stats['dropped']} dropped (queue full), {stats['parse_errors']} unparseable, max depth {stats['max_depth']}")
+
+    span_s = (delivered["last_ns"] - delivered["first_ns"]) / 1_000_000_000
+    throughput = f"{delivered['count'] / span_s:.0f} messages/s" if span_s > 0 else "n/a"
+    print(f"Delivered: {delivered['count']} messages ({throughput})")
+
+    summary = latency.summary()
+    print(f"Dispatch latency (read to handler): mean {summary['mean']:.3f} ms  p50 {summary['p50']:.3f}  "
+          f"p95 {summary['p95']:.3f}  p99 {summary['p99']:.3f}  max {summary['max']:.3f} ms")
+    close_server(app, server)
+    return 1 if sent and not delivered["count"] else 0
+
+# Destroy the server while the application still exists; left to interpreter shutdown, tearing it down aborts
+def close_server(app, server):
+    server.deleteLater()
+    app.processEvents()
+
+# ----------------------------------------------------------------------
+# Against a running ImproTron
+# ----------------------------------------------------------------------
+# ImproTron publishes its ingress counters every 2 s, so wait that long before asking for them
+STATS_PUBLISH_S = 2.5
+
+def run_target(schedule: list, args) -> int:
+    host, _, port = args.target.rpartition(":")
+    host = host.strip("[]")
+    port = int(port)
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    control = socket.socket(family, socket.SOCK_DGRAM)
+    control.settimeout(0.5)
+
+    if args.reset:
+        control.sendto(encode_message("/latency/reset", []), (host, port))
+
+    sender, results = start_sender(schedule, host, port, args.tcp)
+    sender.join()
+    sent, seconds, failed = results.get()
+    report_sent(sent, seconds, failed)
+
+    time.sleep(max(args.settle, STATS_PUBLISH_S))
+    control.sendto(encode_message("/query", ["/state/osc/ingress"]), (host, port))
+    control.sendto(encode_message("/latency/query", [args.latency_filter]), (host, port))
+    replies = 0
+    while True:
+        try:
+            packet, _ = control.recvfrom(65536)
+        except socket.timeout:
+            break
+        for timetag, messages in decode_packet(packet):
+            for address, values in messages:
+                replies += 1
+                if address == "/state/osc/ingress":
+                    names = ("depth", "max depth", "received", "coalesced", "dropped", "unparseable")
+                    print("Ingress: " + ", ".join(f"{name} {value}" for name, value in zip(names, values)))
+                elif address == "/latency/stage":
+                    name, count, mean, p50, p95, p99, maximum = values
+                    print(f"{name:>32}: {count:6d}  mean {mean:8.3f}  p50 {p50:8.3f}  p95 {p95:8.3f}  "
+                          f"p99 {p99:8.3f}  max {maximum:8.3f} ms")
+    control.close()
+
+    if not replies:
+        print(f"No reply from {args.target}; is ImproTron running with OSC on that port?")
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="ImproTron OSC load generator and replay tool")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="FILE", help="Replay a recording made with main.py --osc-record")
+    source.add_argument("--mix", default=DEFAULT_MIX, help="Weighted addresses to synthesize, address:weight,...")
+    parser.add_argument("--rate", type=float, help="Packets per second, default 1000; for --replay replaces the recorded timing")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of a synthesized run")
+    parser.add_argument("--burst", type=int, default=0, help="Send this many synthesized packets back to back instead")
+    parser.add_argument("--bundle", type=int, default=1, help="Messages per synthesized packet; more than 1 sends bundles")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier when no --rate is given")
+    parser.add_argument("--tcp", action="store_true", help="Send SLIP framed over TCP instead of UDP datagrams")
+    parser.add_argument("--port", type=int, default=9100, help="Port of the OSCServer started for the run")
+    parser.add_argument("--handler-us", type=int, default=0, help="Busy work per delivered message, in microseconds")
+    parser.add_argument("--settle", type=float, default=0.5, help="Seconds without deliveries that end the run")
+    parser.add_argument("--target", metavar="HOST:PORT", help="Send to a running ImproTron instead")
+    parser.add_argument("--reset", action="store_true", help="With --target, clear its latency histograms first")
+    parser.add_argument("--latency-filter", default="", help="With --target, only report latency stages containing this")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.replay:
+        try:
+            schedule = load_recording(args.replay, args.speed, args.rate or 0)
+        except (OSError, ValueError) as e:
+            print(f"Cannot replay {args.replay}: {e}", file=sys.stderr)
+            return 2
+    else:
+        try:
+            mix = parse_mix(args.mix)
+        except ValueError as e:
+            print(f"Invalid --mix: {e}", file=sys.stderr)
+            return 2
+        if args.burst:
+            schedule = synthesize(mix, args.burst, 0, max(1, args.bundle), args.seed)
+        else:
+            rate = args.rate or 1000
+            schedule = synthesize(mix, int(rate * args.seconds), rate, max(1, args.bundle), args.seed)
+
+    if not schedule:
+        print("Nothing to send", file=sys.stderr)
+        return 2
+
+    print(f"{len(schedule)} packets over {schedule[-1][0] / 1_000_000_000:.3f} s scheduled")
+    return run_target(schedule, args) if args.target else run_local(schedule, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,14 @@
+import heapq
 import logging
-import struct
-from PySide6.QtCore import QObject, Signal, Slot, QCoreApplication
-from PySide6.QtNetwork import QUdpSocket, QHostAddress
+import re
+import time
+from typing import NamedTuple
+from PySide6.QtCore import QObject, Signal, Slot, Qt, QCoreApplication, QTimer, QThread
+from PySide6.QtNetwork import QHostAddress
+
+from osc_codec import decode_packet, ntp_to_unix, OSC_IMMEDIATE
+from osc_ingress import OSCIngressQueue, OSCIngressWorker, OSCEndpoint, parse_endpoint
+from cue_latency import cue_tracer
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +18,8 @@ OSC_SOUND_SEEK = "/sound/seek"
 OSC_SOUND_STOP = "/sound/stop"
 OSC_SOUND_STINGER = "/sound/stinger"
 OSC_SOUND_FADE = "/sound/fade"
+OSC_SOUND_CROSSFADE = "/sound/crossfade"
+OSC_SOUND_DUCK = "/sound/duck"
 OSC_SOUND_PLAYLIST = "/sound/playlist"
 OSC_MEDIA_SHOW = "/media/show"
 OSC_MEDIA_MOVIE = "/media/movie"
@@ -19,6 +28,201 @@ OSC_BUTTON_PRESS = "/button/press"
 OSC_SFX_PLAY = "/soundfx/play"
 OSC_SFX_STOP = "/soundfx/stop"
 
+# One decoded OSC message as handed to route handlers
+class OSCMessage(NamedTuple):
+    address: str
+    args: list
+    source: str = ""    # host:port of the sender
+    timetag: int = 1    # NTP timetag of the enclosing bundle; 1 means immediately
+    received_ns: int = 0 # time.perf_counter_ns() when the packet arrived, 0 when unknown
+
+# Characters that make an OSC address a pattern rather than a literal method name
+OSC_PATTERN_CHARS = frozenset("*?[]{}")
+
+def is_address_pattern(address: str) -> bool:
+    return not OSC_PATTERN_CHARS.isdisjoint(address)
+
+# Translate an OSC 1.0 address pattern into a regular expression. Wildcards never cross a '/'. Raises ValueError
+# for a malformed pattern, including character classes such as "[]" or "[z-a]" the regex engine rejects.
+def compile_address_pattern(pattern: str) -> re.Pattern:
+    regex = []
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "*":
+            regex.append("[^/]*")
+        elif char == "?":
+            regex.append("[^/]")
+        elif char == "[":
+            end = pattern.find("]", index + 1)
+            if end < 0:
+                raise ValueError(f"unterminated '[' in {pattern}")
+            body = pattern[index + 1:end]
+            negate = body.startswith("!")
+            if negate:
+                body = body[1:]
+            if not body:
+                raise ValueError(f"empty '[]' in {pattern}")
+            # Keep ranges, escape anything else the regex engine would treat specially
+            body = "".join(c if c == "-" else re.escape(c) for c in body)
+            regex.append(f"[{'^' if negate else ''}{body}]")
+            index = end
+        elif char == "{":
+            end = pattern.find("}", index + 1)
+            if end < 0:
+                raise ValueError(f"unterminated '{{' in {pattern}")
+            choices = pattern[index + 1:end].split(",")
+            regex.append("(?:" + "|".join(re.escape(choice) for choice in choices) + ")")
+            index = end
+        else:
+            regex.append(re.escape(char))
+        index += 1
+
+    try:
+        return re.compile("".join(regex) + r"\Z")
+    except re.error as e:
+        raise ValueError(f"{e} in {pattern}") from e
+
+# Route table for OSC methods. Literal addresses resolve with a single dictionary lookup. Incoming address
+# patterns, and routes registered with a pattern, are compiled once and the resolved handler list for each
+# address is cached, so repeated messages never walk the table. The cache is cleared whenever routes change.
+class OSCDispatcher:
+    RESOLVE_CACHE_SIZE = 1024
+
+    def __init__(self):
+        self._routes = {}           # literal address -> [handlers]
+        self._pattern_routes = {}   # pattern address -> (compiled pattern, [handlers])
+        self._resolved = {}
+
+    def register(self, address: str, handler):
+        if is_address_pattern(address):
+            compiled, handlers = self._pattern_routes.setdefault(address, (compile_address_pattern(address), []))
+            handlers.append(handler)
+        else:
+            self._routes.setdefault(address, []).append(handler)
+        self._resolved.clear()
+
+    # Remove one handler, or every handler for the address when none is given
+    def unregister(self, address: str, handler=None):
+        if is_address_pattern(address):
+            entry = self._pattern_routes.get(address)
+            handlers = entry[1] if entry else None
+        else:
+            handlers = self._routes.get(address)
+
+        if handlers is not None:
+            if handler is None:
+                handlers.clear()
+            elif handler in handlers:
+                handlers.remove(handler)
+
+            if not handlers:
+                self._pattern_routes.pop(address, None)
+                self._routes.pop(address, None)
+        self._resolved.clear()
+
+    def addresses(self) -> list[str]:
+        return sorted(list(self._routes.keys()) + list(self._pattern_routes.keys()))
+
+    # All handlers an address reaches
+    def resolve(self, address: str) -> tuple:
+        handlers = self._resolved.get(address)
+        if handlers is not None:
+            return handlers
+
+        if is_address_pattern(address):
+            try:
+                compiled = compile_address_pattern(address)
+            except ValueError as e:
+                logger.warning(f"OSCServer: Invalid address pattern: {e}")
+                compiled = None
+            matched = []
+            if compiled is not None:
+                for route, route_handlers in self._routes.items():
+                    if compiled.match(route):
+                        matched.extend(route_handlers)
+            handlers = tuple(matched)
+        else:
+            matched = list(self._routes.get(address, ()))
+            for compiled, route_handlers in self._pattern_routes.values():
+                if compiled.match(address):
+                    matched.extend(route_handlers)
+            handlers = tuple(matched)
+
+        # Addresses are client supplied, so keep the cache from growing without bound
+        if len(self._resolved) >= self.RESOLVE_CACHE_SIZE:
+            self._resolved.clear()
+        self._resolved[address] = handlers
+        return handlers
+
+    # Returns the number of handlers the message reached
+    def dispatch(self, message: OSCMessage) -> int:
+        handlers = self.resolve(message.address)
+        for handler in handlers:
+            handler(message)
+        return len(handlers)
+
+# Holds bundles whose timetag is in the future and fires each at its moment. Due times are kept on the
+# monotonic clock, converted once on arrival, so a wall clock adjustment cannot fire a cue early or late.
+# A precise timer is always armed for the earliest bundle only.
+class OSCScheduler(QObject):
+    MAX_AHEAD_S = 24 * 60 * 60
+
+    def __init__(self, execute, parent=None):
+        super().__init__(parent)
+        self._execute = execute
+        self._queue = []
+        self._sequence = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_timeout)
+
+        # How late scheduled bundles actually ran, for checking timer precision
+        self.last_lateness_ms = 0.0
+
+    # Run the messages now if their timetag is immediate or already past, otherwise at the timetag
+    def submit(self, timetag: int, messages: list):
+        delay_s = 0.0 if timetag == OSC_IMMEDIATE else ntp_to_unix(timetag) - time.time()
+        if delay_s <= 0:
+            self._execute(messages)
+            return
+
+        if delay_s > self.MAX_AHEAD_S:
+            logger.warning(f"OSCServer: Dropping bundle scheduled {delay_s:.0f} s ahead")
+            return
+
+        due_ns = time.monotonic_ns() + int(delay_s * 1_000_000_000)
+        self._sequence += 1
+        heapq.heappush(self._queue, (due_ns, self._sequence, messages))
+        self._arm()
+
+    def pending(self) -> int:
+        return len(self._queue)
+
+    def clear(self):
+        self._queue.clear()
+        self._timer.stop()
+
+    def _arm(self):
+        if not self._queue:
+            self._timer.stop()
+            return
+
+        remaining_ms = max(0, (self._queue[0][0] - time.monotonic_ns()) // 1_000_000)
+        self._timer.start(remaining_ms)
+
+    @Slot()
+    def _on_timeout(self):
+        # Run everything now due, keeping the order bundles were scheduled in for equal times
+        now_ns = time.monotonic_ns()
+        while self._queue and self._queue[0][0] <= now_ns + 500_000:
+            due_ns, _, messages = heapq.heappop(self._queue)
+            self.last_lateness_ms = (time.monotonic_ns() - due_ns) / 1_000_000
+            self._execute(messages)
+        self._arm()
+
 class OSCServer(QObject):
     buttonAction = Signal(str)
     spinBoxAction = Signal(str, float)
@@ -29,172 +233,339 @@ class OSCServer(QObject):
     stingerAction = Signal(str)
     sfxPlayAction = Signal(str)
     stopAllSFXSignal = Signal()
-    fadeAction = Signal(float)
+    fadeAction = Signal(float, str, float) # seconds, curve ("" for the default), level to fade to
+    crossfadeAction = Signal(float)
+    duckAction = Signal(float)
     seekAction = Signal(float, str)
-
-    def __init__(self, listen_host="127.0.0.1", listen_port=9000, parent=None):
+    tcpClientDisconnected = Signal(str) # host:port of the client
+    _sendRequested = Signal(str, object)
+    _startRequested = Signal()
+    _stopRequested = Signal()
+    _recordRequested = Signal(str)
+    _stopRecordingRequested = Signal()
+
+    MAX_TCP_CLIENTS = 16
+    INGRESS_CAPACITY = 1024
+
+    # Addresses whose messages carry an absolute value, so a newer one makes any still waiting pointless.
+    # /spinbox/change is relative (it adds to the score) and must never be coalesced.
+    COALESCED_ADDRESSES = (OSC_SOUND_FADE, OSC_SOUND_SEEK)
+
+    # OSC 1.1 over TCP is accepted on the UDP port number unless tcp_port says otherwise; 0 turns it off.
+    # endpoints are further UDP listeners, OSCEndpoints or strings for parse_endpoint, e.g. a second
+    # controller's port, "[::1]:9000" or a multicast group such as "239.0.0.10:9001@eth0".
+    def __init__(self, listen_host="127.0.0.1", listen_port=9000, tcp_port=None, endpoints=(), parent=None):
         super().__init__(parent)
         self.listen_host = QHostAddress(listen_host)
         self.listen_port = listen_port
-        self.socket = QUdpSocket(self)
+        self.tcp_port = listen_port if tcp_port is None else tcp_port
+        self._tcp_clients = set() # host:port of connected TCP clients, mirrored from the ingress thread
+
+        self.endpoints = [OSCEndpoint(listen_host, listen_port)]
+        for endpoint in endpoints:
+            try:
+                endpoint = endpoint if isinstance(endpoint, OSCEndpoint) else parse_endpoint(endpoint)
+            except ValueError as e:
+                logger.error(f"OSCServer: Ignoring endpoint: {e}")
+                continue
+            if endpoint not in self.endpoints:
+                self.endpoints.append(endpoint)
+
+        self.dispatcher = OSCDispatcher()
+        self._register_default_routes()
+        self.scheduler = OSCScheduler(self._execute_messages, self)
+
+        # Sockets are read and packets decoded on the ingress thread; this thread only dispatches
+        self.ingress_queue = OSCIngressQueue(self.INGRESS_CAPACITY)
+        self.ingress_queue.coalesced_addresses = frozenset(self.COALESCED_ADDRESSES)
+        self._reported_drops = 0
+        self._last_drop_report = 0.0
+        self._rate_snapshot = {} # endpoint name -> (monotonic time, packets, {source: packets}) at the last stats call
+
+        self._ingress_thread = QThread()
+        self._ingress = OSCIngressWorker(self.ingress_queue, self.endpoints, self.tcp_port, self.MAX_TCP_CLIENTS)
+        self._ingress.moveToThread(self._ingress_thread)
+        self._ingress.packetsQueued.connect(self._drain_ingress)
+        self._ingress.clientConnected.connect(self._tcp_clients.add)
+        self._ingress.clientDisconnected.connect(self._on_tcp_disconnected)
+        self._sendRequested.connect(self._ingress.send)
+        self._startRequested.connect(self._ingress.start, Qt.ConnectionType.BlockingQueuedConnection)
+        self._stopRequested.connect(self._ingress.stop, Qt.ConnectionType.BlockingQueuedConnection)
+        self._recordRequested.connect(self._ingress.start_recording, Qt.ConnectionType.BlockingQueuedConnection)
+        self._stopRecordingRequested.connect(self._ingress.stop_recording, Qt.ConnectionType.BlockingQueuedConnection)
 
-        # Connect signals
-        self.socket.readyRead.connect(self._on_ready_read)
         QCoreApplication.instance().aboutToQuit.connect(self.disconnectOSCServer)
 
-        self._bind_socket()
+        # Wait for the sockets to be bound so the server is listening once constructed
+        self._ingress_thread.start(QThread.Priority.HighPriority)
+        self._startRequested.emit()
 
     # ----------------------------------------------------------------------
     # Connection management
     # ----------------------------------------------------------------------
-    def _bind_socket(self):
-        if not self.socket.bind(self.listen_host, self.listen_port):
-            logger.error(f"OSCServer: Failed to bind on {self.listen_host.toString()}:{self.listen_port}")
-        else:
-            logger.info(f"OSCServer: Listening for OSC on {self.listen_host.toString()}:{self.listen_port}")
-
     def disconnectOSCServer(self):
-        if self.socket.isValid():
-            self.socket.close()
-            logger.info("OSCServer disconnected cleanly.")
+        if self._ingress_thread.isRunning():
+            self._stopRequested.emit()
+            self._ingress_thread.quit()
+            self._ingress_thread.wait(2000)
+            self._tcp_clients.clear()
+            stats = self.ingress_stats()
+            logger.info(f"OSCServer disconnected cleanly. {stats['received']} received, {stats['coalesced']} coalesced, "
+                        f"{stats['dropped']} dropped, {stats['parse_errors']} unparseable")
+            for endpoint in self.endpoint_stats():
+                logger.info(f"OSCServer: {endpoint['endpoint']} received {endpoint['packets']} packets, "
+                            f"{endpoint['bytes']} bytes; busiest sender {endpoint['busiest'] or 'none'}")
+
+    def tcp_clients(self) -> list[str]:
+        return list(self._tcp_clients)
+
+    @Slot(str)
+    def _on_tcp_disconnected(self, source):
+        self._tcp_clients.discard(source)
+        self.tcpClientDisconnected.emit(source)
+
+    # Send an encoded packet to a message source. The ingress thread owns the sockets, so the send is queued to it.
+    def send_to(self, destination: str, packet: bytes) -> bool:
+        if not self._ingress_thread.isRunning():
+            return False
+        self._sendRequested.emit(destination, packet)
+        return True
+
+    # Make messages to an address replace any still waiting in the ingress queue. Only for addresses whose
+    # messages are idempotent, i.e. carry an absolute value rather than a change.
+    def set_coalesced(self, address: str, coalesced: bool = True):
+        addresses = set(self.ingress_queue.coalesced_addresses)
+        if coalesced:
+            addresses.add(address)
+        else:
+            addresses.discard(address)
+        self.ingress_queue.coalesced_addresses = frozenset(addresses)
+
+    # Capture every packet received, with its arrival time, to a file osc_loadgen.py can replay
+    def start_recording(self, file_name: str) -> bool:
+        if not self._ingress_thread.isRunning():
+            return False
+        self._recordRequested.emit(file_name)
+        return self._ingress.is_recording()
+
+    def stop_recording(self):
+        if self._ingress_thread.isRunning():
+            self._stopRecordingRequested.emit()
+
+    def ingress_stats(self) -> dict:
+        queue = self.ingress_queue
+        return {"depth": queue.depth(), "max_depth": queue.max_depth, "received": queue.received,
+                "coalesced": queue.coalesced, "dropped": queue.dropped, "parse_errors": self._ingress.parse_errors}
+
+    # Traffic per listening endpoint, TCP last. Rates are packets per second since the previous call, for the
+    # endpoint and for its busiest sender over that time, so a controller flooding the server stands out.
+    def endpoint_stats(self) -> list[dict]:
+        now = time.monotonic()
+        endpoints = list(self._ingress.endpoint_stats)
+        if self._ingress.tcp_stats is not None:
+            endpoints.append(self._ingress.tcp_stats)
+
+        result = []
+        for stats in endpoints:
+            packets = stats.packets
+            sources = dict(stats.sources)
+            last_time, last_packets, last_sources = self._rate_snapshot.get(stats.name, (now, packets, sources))
+            elapsed = now - last_time
+            busiest, busiest_packets = "", 0
+            for source, count in sources.items():
+                delta = count - last_sources.get(source, 0)
+                if delta > busiest_packets:
+                    busiest, busiest_packets = source, delta
+            if not busiest and sources:
+                # No traffic since the last call; name the busiest overall
+                busiest = max(sources, key=sources.get)
+
+            result.append({"endpoint": stats.name, "bound": stats.bound, "packets": packets, "bytes": stats.bytes,
+                           "rate": (packets - last_packets) / elapsed if elapsed > 0 else 0.0,
+                           "busiest": busiest, "busiest_rate": busiest_packets / elapsed if elapsed > 0 else 0.0})
+            self._rate_snapshot[stats.name] = (now, packets, sources)
+        return result
 
     # ----------------------------------------------------------------------
     # Data handling
     # ----------------------------------------------------------------------
+    # Everything waiting is taken in one go, so a burst costs one event loop turn however many packets it holds.
+    # Each group is a message or one bundle's messages; the scheduler runs it now or at the bundle's timetag.
     @Slot()
-    def _on_ready_read(self):
-        """Triggered when data is available on the UDP socket."""
-        while self.socket.hasPendingDatagrams():
-            datagram, host, port = self.socket.readDatagram(self.socket.pendingDatagramSize())
-            # --- FIX: Convert QByteArray to Python bytes ---
-            data_bytes = bytes(datagram)
-            try:
-                address, args = self._parse_osc_message(data_bytes)
-                self._dispatch_message(address, args)
-            except Exception as e:
-                logger.warning(f"OSCServer: Failed to parse OSC message from {host.toString()}:{port}: {e}")
+    def _drain_ingress(self):
+        for timetag, messages, source, received_ns in self.ingress_queue.take_all():
+            self._deliver(timetag, messages, source, received_ns)
+
+        dropped = self.ingress_queue.dropped
+        if dropped != self._reported_drops and time.monotonic() - self._last_drop_report >= 1.0:
+            logger.warning(f"OSCServer: Ingress queue full, dropped {dropped - self._reported_drops} message(s)")
+            self._reported_drops = dropped
+            self._last_drop_report = time.monotonic()
+
+    # Decode and dispatch a packet on the calling thread, bypassing the ingress queue
+    def _handle_packet(self, data: bytes, source: str):
+        received_ns = time.perf_counter_ns()
+        for timetag, messages in decode_packet(data):
+            self._deliver(timetag, messages, source, received_ns)
+
+    def _deliver(self, timetag: int, messages: list, source: str, received_ns: int = 0):
+        self.scheduler.submit(timetag, [OSCMessage(address, args, source, timetag, received_ns)
+                                        for address, args in messages])
+
+    def _execute_messages(self, messages: list):
+        for message in messages:
+            self._dispatch_message(message)
 
     # ----------------------------------------------------------------------
-    # Message parsing and routing
+    # Routing
     # ----------------------------------------------------------------------
-    def _parse_osc_message(self, data: bytes):
-        # Parse address
-        address_end = data.find(b'\0')
-        address = data[:address_end].decode('utf-8')
-        offset = (address_end + 4) & ~0x03  # 4-byte alignment
-
-        # Parse typetags
-        type_start = offset
-        type_end = data.find(b'\0', type_start)
-        typetags = data[type_start + 1:type_end].decode('utf-8')  # skip leading comma
-        offset = (type_end + 4) & ~0x03
-
-        # Parse arguments
-        args = []
-        for tag in typetags:
-            if tag == 'i':
-                args.append(struct.unpack('>i', data[offset:offset + 4])[0])
-                offset += 4
-            elif tag == 'f':
-                args.append(struct.unpack('>f', data[offset:offset + 4])[0])
-                offset += 4
-            elif tag == 's':
-                end = data.find(b'\0', offset)
-                val = data[offset:end].decode('utf-8')
-                args.append(val)
-                offset = (end + 4) & ~0x03
-            else:
-                logger.warning(f"OSCServer: Unknown typetag '{tag}' in message {address}")
+    # Feature modules may add their own OSC methods. The handler receives an OSCMessage.
+    def register_route(self, address: str, handler):
+        self.dispatcher.register(address, handler)
+
+    def unregister_route(self, address: str, handler=None):
+        self.dispatcher.unregister(address, handler)
+
+    def _register_default_routes(self):
+        self.register_route(OSC_SOUND_PLAY, self._on_sound_play)
+        self.register_route(OSC_SOUND_PLAYLIST, self._on_sound_playlist)
+        self.register_route(OSC_SOUND_STINGER, self._on_sound_stinger)
+        self.register_route(OSC_SOUND_SEEK, self._on_sound_seek)
+        self.register_route(OSC_SOUND_FADE, self._on_sound_fade)
+        self.register_route(OSC_SOUND_CROSSFADE, self._on_sound_crossfade)
+        self.register_route(OSC_SOUND_DUCK, self._on_sound_duck)
+        self.register_route(OSC_SOUND_STOP, lambda message: self.soundAction.emit(""))  # empty string = stop all
+        self.register_route(OSC_MEDIA_SHOW, lambda message: self.handle_media_action(message.args))
+        self.register_route(OSC_MEDIA_MOVIE, lambda message: self.handle_movie_action(message.args))
+        self.register_route(OSC_SPINBOX_CHANGE, self._on_spinbox_change)
+        self.register_route(OSC_BUTTON_PRESS, self._on_button_press)
+        self.register_route(OSC_SFX_PLAY, self._on_sfx_play)
+        self.register_route(OSC_SFX_STOP, lambda message: self.sfxPlayAction.emit(""))  # empty string = stop all sound fx
+
+    # Dispatch OSC message to every handler registered for its address (or matched by its pattern). Handled
+    # messages are traced from arrival; scheduled bundles from the moment they are due.
+    def _dispatch_message(self, message: OSCMessage):
+        trace = None
+        try:
+            if not self.dispatcher.resolve(message.address):
+                logger.info(f"OSCServer: Unhandled OSC address {message.address} with args {message.args}")
+                return
+
+            trace = cue_tracer.begin(message.address, message.received_ns if message.timetag == OSC_IMMEDIATE else 0)
+            self.dispatcher.dispatch(message)
+        except Exception as e:
+            # One bad message must not cost the rest of the batch
+            logger.warning(f"OSCServer: Failed to handle {message.address} {message.args} from {message.source}: {e}")
+        finally:
+            if trace is not None:
+                cue_tracer.end(trace)
+
+    def _on_sound_play(self, message: OSCMessage):
+        if message.args:
+            self.soundAction.emit(str(message.args[0]))
+        else:
+            logger.warning(f"OSCServer: Missing sound tag list in {message.args}")
 
-        return address.strip(), args
+    def _on_sound_playlist(self, message: OSCMessage):
+        if message.args:
+            self.playlistAction.emit(str(message.args[0]))
+        else:
+            logger.warning(f"OSCServer: Missing playlist in {message.args}")
 
-    # Dispatch OSC message to the correct signal handler
-    def _dispatch_message(self, address: str, args: list):
-        if address == OSC_SOUND_PLAY:
-            if args:
-                self.soundAction.emit(str(args[0]))
-            else:
-                logger.warning(f"OSCServer: Missing sound tag list in {args}")
-        elif address == OSC_SOUND_PLAYLIST:
-            if args:
-                self.playlistAction.emit(str(args[0]))
-            else:
-                logger.warning(f"OSCServer: Missing playlist in {args}")
-        elif address == OSC_SOUND_STINGER:
-            if args:
-                self.stingerAction.emit(str(args[0]))
-            else:
-                logger.warning(f"OSCServer: Missing stinger tag list in {args}")
-        elif address == OSC_SOUND_SEEK:
-            # Check for at least one arg (seek time) and a second arg (tag list)
-            if args and len(args) >= 2:
-                arg_value = args[0] # Get the first argument (potential seek time)
+    def _on_sound_stinger(self, message: OSCMessage):
+        if message.args:
+            self.stingerAction.emit(str(message.args[0]))
+        else:
+            logger.warning(f"OSCServer: Missing stinger tag list in {message.args}")
+
+    def _on_sound_seek(self, message: OSCMessage):
+        args = message.args
+        # Check for at least one arg (seek time) and a second arg (tag list)
+        if args and len(args) >= 2:
+            arg_value = args[0] # Get the first argument (potential seek time)
 
-                try:
-                    # Attempt to convert the first value to a float
-                    float_value = float(arg_value)
+            try:
+                # Attempt to convert the first value to a float
+                float_value = float(arg_value)
 
-                    # Convert the rest of the arguments (args[1:]) into a space-delimited string
-                    tag_string = " ".join(str(arg) for arg in args[1:])
+                # Convert the rest of the arguments (args[1:]) into a space-delimited string
+                tag_string = " ".join(str(arg) for arg in args[1:])
 
-                    # Emit the seek time (float) and the tag string
-                    # NOTE: You MUST define self.seekAction = Signal(float, str)
-                    self.seekAction.emit(float_value, tag_string)
+                # Emit the seek time (float) and the tag string
+                self.seekAction.emit(float_value, tag_string)
 
-                    logger.debug(f"OSC Seek Command: Seek Time={float_value}s, Tags='{tag_string}'")
+                logger.debug(f"OSC Seek Command: Seek Time={float_value}s, Tags='{tag_string}'")
 
-                except (ValueError, TypeError):
-                    logger.error(f"OSCServer: SEEK Command's first argument must be a float (seconds), received '{arg_value}'.")
-            else:
-                logger.warning(f"OSCServer: Missing seek parameter and/or tags in {args}. Requires float (seconds) and at least one tag.")
-        elif address == OSC_SOUND_FADE:
-            if args and args[0] is not None:
+            except (ValueError, TypeError):
+                logger.error(f"OSCServer: SEEK Command's first argument must be a float (seconds), received '{arg_value}'.")
+        else:
+            logger.warning(f"OSCServer: Missing seek parameter and/or tags in {args}. Requires float (seconds) and at least one tag.")
+
+    # Seconds, then optionally a curve name and the level to fade to, in either order: /sound/fade 3 fades out,
+    # /sound/fade 2 equal_power 1.0 fades in, /sound/fade 1.5 0.3 fades down to 30%
+    def _on_sound_fade(self, message: OSCMessage):
+        args = message.args
+        if args and args[0] is not None:
+            # Use try/except to safely attempt conversion
+            try:
+                curve = ""
+                level = 0.0
+                for arg in args[1:]:
+                    if isinstance(arg, str):
+                        curve = arg
+                    else:
+                        level = max(0.0, min(1.0, float(arg)))
+                # If successful, emit a signal that expects a float
+                self.fadeAction.emit(float(args[0]), curve, level)
+            except (ValueError, TypeError):
+                logger.error(f"OSCServer: Fade Command should be a floating numer of seconds {args}")
+        else:
+            logger.warning(f"OSCServer: Missing fade parameter in {args}")
 
-                arg_value = args[0] # Get the first argument
+    # Crossfade length in seconds between playlist tracks; 0 plays them back to back without a gap
+    def _on_sound_crossfade(self, message: OSCMessage):
+        args = message.args
+        if args and args[0] is not None:
+            try:
+                self.crossfadeAction.emit(max(0.0, float(args[0])))
+            except (ValueError, TypeError):
+                logger.error(f"OSCServer: Crossfade Command should be a floating number of seconds {args}")
+        else:
+            logger.warning(f"OSCServer: Missing crossfade parameter in {args}")
 
-                # Use try/except to safely attempt conversion
-                try:
-                    # Attempt to convert the value to a float
-                    float_value = float(arg_value)
+    # dB to lower music by while sound effects play; 0 turns ducking off
+    def _on_sound_duck(self, message: OSCMessage):
+        args = message.args
+        if args and args[0] is not None:
+            try:
+                self.duckAction.emit(abs(float(args[0])))
+            except (ValueError, TypeError):
+                logger.error(f"OSCServer: Duck Command should be a floating number of dB {args}")
+        else:
+            logger.warning(f"OSCServer: Missing duck parameter in {args}")
 
-                    # If successful, emit a signal that expects a float
-                    self.fadeAction.emit(float_value)
+    def _on_spinbox_change(self, message: OSCMessage):
+        if len(message.args) >= 2:
+            self.spinBoxAction.emit(str(message.args[0]), float(message.args[1]))
+        else:
+            logger.warning(f"OSCServer: Invalid spinbox args {message.args}")
 
-                except (ValueError, TypeError):
-                    logger.error(f"OSCServer: Fade Command should be a floating numer of seconds {args}")
+    def _on_button_press(self, message: OSCMessage):
+        button_id = str(message.args[0]) if message.args else ""
+        self.buttonAction.emit(button_id)
 
-            else:
-                logger.warning(f"OSCServer: Missing fade parameter in {args}")
-        elif address == OSC_SOUND_STOP:
-            self.soundAction.emit("")  # empty string = stop all
-        elif address == OSC_MEDIA_SHOW:
-            self.handle_media_action(args)
-        elif address == OSC_MEDIA_MOVIE:
-            self.handle_movie_action(args)
-        elif address == OSC_SPINBOX_CHANGE:
-            if len(args) >= 2:
-                self.spinBoxAction.emit(str(args[0]), float(args[1]))
-            else:
-                logger.warning(f"OSCServer: Invalid spinbox args {args}")
-        elif address == OSC_BUTTON_PRESS:
-            button_id = str(args[0]) if args else ""
-            self.buttonAction.emit(button_id)
-        elif address == OSC_SFX_PLAY:
-            if args:
-                self.sfxPlayAction.emit(str(args[0]))
-            else:
-                logger.warning(f"OSCServer: Missing sound fx tag list in {args}")
-        elif address == OSC_SFX_STOP:
-            self.sfxPlayAction.emit("")  # empty string = stop all sound fx
+    def _on_sfx_play(self, message: OSCMessage):
+        if message.args:
+            self.sfxPlayAction.emit(str(message.args[0]))
         else:
-            logger.info(f"OSCServer: Unhandled OSC address {address} with args {args}")
+            logger.warning(f"OSCServer: Missing sound fx tag list in {message.args}")
 
     # Handles OSC messages for media playback. Expects args[0] to be the monitor name.
     # The remaining args are concatenated into a space-delimited string of search tags.
     def handle_media_action(self, args):
         # Ensure there is at least one argument (the monitor)
         if not args:
-            self.logger.warning("OSCServer: Missing monitor argument for media action.")
+            logger.warning("OSCServer: Missing monitor argument for media action.")
             return
 
         # Extract the monitor name from args[0]
@@ -224,7 +595,7 @@ class OSCServer(QObject):
         """
         # 1. We need at least monitor and file_path (length 2)
         if not args or len(args) < 2:
-            self.logger.warning("OSCServer: Missing arguments. Expected [monitor, file_path, loop_flag].")
+            logger.warning("OSCServer: Missing arguments. Expected [monitor, file_path, loop_flag].")
             return
 
         # 2. Extract monitor and clean path string
@@ -0,0 +1,225 @@
+# palette_loader.py
+# Decodes sound effect palettes on a background thread so switching palettes mid-show never stalls the GUI or
+# leaves buttons silent while they load. A requested palette is read and every WAV decoded into mixer samples
+# off the GUI thread; only when all of its buttons are ready is the whole palette handed over, so the grid
+# swaps in one step. Requests made while another is decoding supersede it.
+#
+# Palettes can be pinned: their samples stay resident, within a byte budget, and switching to them is
+# immediate. Pins decode in the background behind any palette asked for display, which is served first, even
+# part way through a pin. Needs the software mixer; without it palettes load through QSoundEffect as before.
+import logging
+import threading
+import wave
+from collections import deque
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, QThread, QFileInfo, Signal, Slot
+
+from audio_mixer import decode_wav, MixerSample
+from playlist_format import read_playlist
+
+logger = logging.getLogger(__name__)
+
+# One palette button. path is "" for a button the palette leaves empty or whose file is missing; sample is
+# None for a file the mixer cannot decode, which the button then plays through QSoundEffect.
+class PaletteSlot(NamedTuple):
+    path: str
+    sample: MixerSample | None
+
+def palette_bytes(slots: list) -> int:
+    return sum(slot.sample.frames.nbytes for slot in slots if slot.sample is not None)
+
+# Lives on the loader thread. Jobs are taken from the loader's queues, display requests ahead of pins.
+class _PaletteWorker(QObject):
+    slotReady = Signal(int, str, int, int)  # request id, palette file, buttons ready, buttons in the palette
+    paletteReady = Signal(int, str, list)   # request id, palette file, PaletteSlots in button order
+
+    def __init__(self, sample_rate: int, channels: int, is_current, take_job):
+        super().__init__()
+        self._sample_rate = sample_rate
+        self._channels = channels
+        self._is_current = is_current
+        self._take_job = take_job
+
+    @Slot()
+    def run(self):
+        while (job := self._take_job(True)) is not None:
+            self._load(*job)
+
+    # Load the display request waiting, if any, ahead of the pin in progress
+    def _serve_display(self):
+        while (job := self._take_job(False)) is not None:
+            self._load(*job)
+
+    def _load(self, request_id: int, palette_file: str, buttons: int, pin: bool):
+        entries = read_playlist(palette_file)[:buttons]
+        slots = []
+        decoded = {} # A file used on several buttons is decoded once
+        for entry in entries:
+            if pin:
+                self._serve_display()
+            if not self._is_current(request_id):
+                logger.debug(f"Palette Loader: Superseded while loading {palette_file}")
+                return
+
+            info = QFileInfo(entry.path)
+            if not info.exists():
+                slots.append(PaletteSlot("", None))
+            else:
+                path = info.absoluteFilePath()
+                if path not in decoded:
+                    decoded[path] = self._decode(path)
+                slots.append(PaletteSlot(path, decoded[path]))
+            self.slotReady.emit(request_id, palette_file, len(slots), len(entries))
+
+        self.paletteReady.emit(request_id, palette_file, slots)
+
+    def _decode(self, path: str) -> MixerSample | None:
+        if QFileInfo(path).suffix().lower() != "wav":
+            return None
+        try:
+            frames = decode_wav(path, self._sample_rate, self._channels)
+        except (OSError, EOFError, wave.Error, ValueError) as e:
+            logger.warning(f"Palette Loader: Cannot decode {path}: {e}")
+            return None
+        return MixerSample(path, frames, self._sample_rate)
+
+# GUI thread facade
+class PaletteLoader(QObject):
+    paletteLoaded = Signal(str, list)  # Palette file and its PaletteSlots, all decoded
+    progress = Signal(str, int, int)   # Palette file, buttons ready, buttons in the palette
+    pinsChanged = Signal()             # A pin was added, dropped or refused
+    _wakeRequested = Signal()
+
+    def __init__(self, sample_rate: int, channels: int, budget_bytes: int, parent=None):
+        super().__init__(parent)
+        self.budget_bytes = budget_bytes
+        self._resident = {}   # Pinned palette file -> PaletteSlots
+        self._pinning = {}    # Palette file being decoded for a pin -> request id
+        self._request_id = 0
+        # Read by the loader thread: the request id of the palette to show next, older show requests being
+        # abandoned, and the request ids of pins, which never are
+        self._wanted = 0
+        self._pin_ids = set()
+        # Jobs waiting for the loader thread: the one display request, and pins in the order they were made
+        self._display_job = None
+        self._pin_jobs = deque()
+        self._wanted_lock = threading.Lock()
+
+        self._thread = QThread()
+        self._worker = _PaletteWorker(sample_rate, channels, self._is_current, self._take_job)
+        self._worker.moveToThread(self._thread)
+        self._wakeRequested.connect(self._worker.run)
+        self._worker.slotReady.connect(self._on_slot_ready)
+        self._worker.paletteReady.connect(self._on_palette_ready)
+        self._thread.start(QThread.Priority.LowPriority)
+
+    # Load a palette for display. Returns its slots at once when pinned; otherwise decodes it in the background
+    # and emits paletteLoaded when it is ready. A palette whose pin is still decoding is shown when the pin
+    # completes rather than decoded twice.
+    def request(self, palette_file: str, buttons: int) -> list | None:
+        slots = self._resident.get(palette_file)
+        pin_id = self._pinning.get(palette_file)
+        with self._wanted_lock:
+            self._display_job = None
+            if slots is not None:
+                self._wanted = 0
+            elif pin_id is not None:
+                self._wanted = pin_id
+            else:
+                self._request_id += 1
+                self._wanted = self._request_id
+                self._display_job = (self._request_id, palette_file, buttons, False)
+            queued = self._display_job is not None
+        if slots is not None:
+            return slots
+
+        if queued:
+            self._wakeRequested.emit()
+        return None
+
+    # Keep a palette decoded in memory so switching to it is immediate
+    def pin(self, palette_file: str, buttons: int):
+        if palette_file in self._resident or palette_file in self._pinning:
+            return
+        with self._wanted_lock:
+            self._request_id += 1
+            request_id = self._request_id
+            self._pin_ids.add(request_id)
+            self._pin_jobs.append((request_id, palette_file, buttons, True))
+        self._pinning[palette_file] = request_id
+        self._wakeRequested.emit()
+
+    def unpin(self, palette_file: str):
+        request_id = self._pinning.pop(palette_file, None)
+        with self._wanted_lock:
+            self._pin_ids.discard(request_id)
+        if self._resident.pop(palette_file, None) is not None:
+            logger.info(f"Palette Loader: Released {QFileInfo(palette_file).completeBaseName()}, "
+                        f"{self.resident_bytes() // (1024 * 1024)} MB resident")
+        self.pinsChanged.emit()
+
+    def is_pinned(self, palette_file: str) -> bool:
+        return palette_file in self._resident or palette_file in self._pinning
+
+    def pinned(self) -> list[str]:
+        return list(self._resident) + list(self._pinning)
+
+    def resident_bytes(self) -> int:
+        return sum(palette_bytes(slots) for slots in self._resident.values())
+
+    def shutdown(self):
+        with self._wanted_lock:
+            self._wanted = -1
+            self._pin_ids.clear()
+            self._display_job = None
+            self._pin_jobs.clear()
+        self._pinning.clear()
+        self._thread.quit()
+        self._thread.wait(2000)
+
+    # Called from the loader thread. Pins are never abandoned; show requests are once a newer one is made.
+    def _is_current(self, request_id: int) -> bool:
+        with self._wanted_lock:
+            return request_id == self._wanted or request_id in self._pin_ids
+
+    # Called from the loader thread: the next job, the display request first, or None when there is nothing
+    # to do. Pins are only handed out when pins is set.
+    def _take_job(self, pins: bool):
+        with self._wanted_lock:
+            if self._display_job is not None:
+                job, self._display_job = self._display_job, None
+                return job
+            while pins and self._pin_jobs:
+                job = self._pin_jobs.popleft()
+                # An unpinned palette is still loaded when it is the one waiting to be shown
+                if job[0] in self._pin_ids or job[0] == self._wanted:
+                    return job
+            return None
+
+    @Slot(int, str, int, int)
+    def _on_slot_ready(self, request_id: int, palette_file: str, ready: int, total: int):
+        if request_id == self._wanted:
+            self.progress.emit(palette_file, ready, total)
+
+    @Slot(int, str, list)
+    def _on_palette_ready(self, request_id: int, palette_file: str, slots: list):
+        if self._pinning.get(palette_file) == request_id:
+            del self._pinning[palette_file]
+            with self._wanted_lock:
+                self._pin_ids.discard(request_id)
+            size = palette_bytes(slots)
+            if self.resident_bytes() + size > self.budget_bytes:
+                logger.warning(f"Palette Loader: {QFileInfo(palette_file).completeBaseName()} needs "
+                               f"{size // (1024 * 1024)} MB and would exceed the "
+                               f"{self.budget_bytes // (1024 * 1024)} MB palette budget; not kept in memory")
+            else:
+                self._resident[palette_file] = slots
+                logger.info(f"Palette Loader: Pinned {QFileInfo(palette_file).completeBaseName()}, "
+                            f"{self.resident_bytes() // (1024 * 1024)} MB resident")
+            self.pinsChanged.emit()
+
+        if request_id == self._wanted:
+            with self._wanted_lock:
+                self._wanted = 0
+            self.paletteLoaded.emit(palette_file, slots)
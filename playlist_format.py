@@ -0,0 +1,169 @@
+# playlist_format.py
+# Versioned binary format shared by slide shows (.ssh), sound queues (.sdq) and sound effect palettes (.sfx).
+#
+# Layout (little endian):
+#   header  : magic "ITPL", u16 version, u8 kind, u8 reserved, u32 entry count
+#   entries : u32 record length, then u64 size, i64 modified (ms since epoch), u32 duration (ms),
+#             u16 width, u16 height, u8 media type, u8 flags, u16 path length, UTF-8 path
+#
+# Each record carries the file metadata captured when the playlist was saved so a load does not need to touch
+# every file. Records are length prefixed so later versions can append fields without breaking older readers.
+# Files are read through mmap and parsed in place. Older JSON files ({"slide0": path, ...}) still load.
+import json
+import logging
+import mmap
+import re
+import struct
+from typing import NamedTuple
+
+from PySide6.QtCore import Qt, QFileInfo, QSaveFile, QIODevice
+
+logger = logging.getLogger(__name__)
+
+PLAYLIST_MAGIC = b"ITPL"
+PLAYLIST_VERSION = 1
+
+# Playlist kinds
+KIND_SLIDES = 1
+KIND_SOUND_QUEUE = 2
+KIND_SFX_PALETTE = 3
+
+# Media types recorded per entry
+MEDIA_UNKNOWN = 0
+MEDIA_IMAGE = 1
+MEDIA_ANIMATION = 2
+MEDIA_VIDEO = 3
+MEDIA_AUDIO = 4
+
+# Item data role used by list widgets to keep a saved media length alongside the QFileInfo in UserRole
+PlaylistDurationRole = Qt.ItemDataRole.UserRole + 200
+
+_HEADER = struct.Struct("<4sHBBI")
+_RECORD_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<QqIHHBBH")
+
+class PlaylistEntry(NamedTuple):
+    path: str
+    media_type: int = MEDIA_UNKNOWN
+    size: int = 0
+    modified_ms: int = 0
+    duration_ms: int = 0
+    width: int = 0
+    height: int = 0
+
+    # True when the file on disk still matches the metadata captured at save time
+    def is_current(self) -> bool:
+        info = QFileInfo(self.path)
+        return (info.exists() and info.size() == self.size
+                and info.lastModified().toMSecsSinceEpoch() == self.modified_ms)
+
+# Build an entry from a file on disk, capturing its size and modification time
+def entry_for_path(path: str, media_type: int = MEDIA_UNKNOWN, duration_ms: int = 0,
+                   width: int = 0, height: int = 0) -> PlaylistEntry:
+    info = QFileInfo(path)
+    size = info.size() if info.exists() else 0
+    modified = info.lastModified().toMSecsSinceEpoch() if info.exists() else 0
+    return PlaylistEntry(path, media_type, size, modified, duration_ms, width, height)
+
+def write_playlist(file_name: str, kind: int, entries) -> bool:
+    records = [_HEADER.pack(PLAYLIST_MAGIC, PLAYLIST_VERSION, kind, 0, len(entries))]
+    for entry in entries:
+        path_bytes = entry.path.encode("utf-8")
+        body = _RECORD.pack(max(0, entry.size), entry.modified_ms, max(0, min(entry.duration_ms, 0xFFFFFFFF)),
+                            min(entry.width, 0xFFFF), min(entry.height, 0xFFFF), entry.media_type, 0,
+                            len(path_bytes)) + path_bytes
+        records.append(_RECORD_LENGTH.pack(len(body)))
+        records.append(body)
+
+    # Atomic Save using QSaveFile
+    save_file = QSaveFile(file_name)
+    if not save_file.open(QIODevice.WriteOnly):
+        logger.error(f"Playlist: Could not save {file_name}: {save_file.errorString()}")
+        return False
+
+    save_file.write(b"".join(records))
+    if not save_file.commit():
+        logger.error(f"Playlist: Failed to commit {file_name}")
+        return False
+
+    return True
+
+# Load any playlist, binary or legacy JSON. Returns the entries in playlist order, or an empty list on error.
+# A legacy slot left empty is an entry whose path is "".
+def read_playlist(file_name: str) -> list[PlaylistEntry]:
+    try:
+        with open(file_name, "rb") as playlist_file:
+            try:
+                mapped = mmap.mmap(playlist_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Zero length files cannot be mapped
+                logger.warning(f"Playlist: {file_name} is empty")
+                return []
+
+            with mapped:
+                if mapped[:len(PLAYLIST_MAGIC)] == PLAYLIST_MAGIC:
+                    return _read_binary(file_name, mapped)
+                return _read_legacy_json(file_name, mapped[:])
+    except OSError as e:
+        logger.error(f"Playlist: Could not open {file_name}: {e}")
+        return []
+
+def _read_binary(file_name: str, mapped: mmap.mmap) -> list[PlaylistEntry]:
+    view = memoryview(mapped)
+    try:
+        _, version, _, _, count = _HEADER.unpack_from(view, 0)
+        if version > PLAYLIST_VERSION:
+            logger.warning(f"Playlist: {file_name} is version {version}, reading the fields this version knows")
+
+        entries = []
+        offset = _HEADER.size
+        for _ in range(count):
+            (record_length,) = _RECORD_LENGTH.unpack_from(view, offset)
+            offset += _RECORD_LENGTH.size
+            if offset + record_length > len(view):
+                raise ValueError(f"record at {offset} runs past the end of the file")
+
+            size, modified, duration, width, height, media_type, _, path_length = _RECORD.unpack_from(view, offset)
+            path_start = offset + _RECORD.size
+            if record_length < _RECORD.size + path_length:
+                # The path would spill into the next record; the rest of the file still parses
+                logger.warning(f"Playlist: Skipping a corrupt record at {offset} in {file_name}")
+            else:
+                path = bytes(view[path_start:path_start + path_length]).decode("utf-8")
+                entries.append(PlaylistEntry(path, media_type, size, modified, duration, width, height))
+            offset += record_length
+        return entries
+    except (struct.error, UnicodeDecodeError, ValueError) as e:
+        logger.error(f"Playlist: {file_name} is truncated or corrupt: {e}")
+        return []
+    finally:
+        view.release()
+
+def _read_legacy_json(file_name: str, raw_data: bytes) -> list[PlaylistEntry]:
+    try:
+        playlist_data = json.loads(raw_data.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        logger.error(f"Playlist: Invalid JSON format in {file_name}: {e}")
+        return []
+
+    if not isinstance(playlist_data, dict):
+        logger.error(f"Playlist: Unexpected JSON layout in {file_name}")
+        return []
+
+    # Empty slots stay in place as entries with no path, so later palette sounds keep their buttons
+    entries = []
+    for path in legacy_ordered_paths(playlist_data):
+        if not isinstance(path, str):
+            logger.warning(f"Playlist: Ignoring {path!r} in {file_name}, which is not a file path")
+            path = ""
+        entries.append(entry_for_path(path) if path else PlaylistEntry(""))
+    return entries
+
+# Legacy files key entries slide0..slideN / sound0..soundN. A string sort places slide10 before slide2,
+# so order by the numeric suffix instead.
+def legacy_ordered_paths(playlist_data: dict) -> list[str]:
+    def key_number(key):
+        match = re.search(r"(\d+)$", key)
+        return int(match.group(1)) if match else 0
+
+    return [playlist_data[key] for key in sorted(playlist_data.keys(), key=key_number)]
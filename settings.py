@@ -21,6 +21,7 @@ class Settings:
         'documentDirectory': QStandardPaths.writableLocation(QStandardPaths.DocumentsLocation),
         'lastHotButton': "",
         'oscPort': 9000,
+        'oscEndpoints': "",
         'gamesFile': "",
         'mainLocation': QPoint(0, 0),
         'auxLocation': QPoint(0, 0),
@@ -35,7 +36,17 @@ class Settings:
         'officialGraphic': "",
         'djGraphic': "",
         'rosterTextSize': 10,
-        'leftTeamFirst' : False
+        'leftTeamFirst' : False,
+        'transitionType': "fade",
+        'transitionDuration': 300,
+        'musicCrossfadeMs': 0,
+        'musicNormalize': True,
+        'musicTargetLufs': -16.0,
+        'seekSnapMs': 150,
+        'duckUnderSfxDb': 0.0,
+        'pinnedPalettes': "",
+        'paletteBudgetMb': 256,
+        'streamMinMb': 64
     }
 
     def __init__(self):
@@ -300,6 +311,79 @@ class Settings:
     def get_osc_port(self):
         return int(self._get('oscPort'))
 
+    # Additional OSC listeners as endpoint strings, e.g. "192.168.1.20:9000" or "239.0.0.10:9001@eth0"
+    def set_osc_endpoints(self, endpoints: list):
+        self._set('oscEndpoints', ",".join(endpoint.strip() for endpoint in endpoints if endpoint.strip()))
+
+    def get_osc_endpoints(self):
+        return [endpoint.strip() for endpoint in str(self._get('oscEndpoints')).split(",") if endpoint.strip()]
+
+    def set_transition_type(self, kind: str):
+        self._set('transitionType', kind)
+
+    def get_transition_type(self):
+        return self._get('transitionType')
+
+    def set_transition_duration(self, duration_ms: int):
+        self._set('transitionDuration', duration_ms)
+
+    def get_transition_duration(self):
+        return int(self._get('transitionDuration'))
+
+    # Crossfade between playlist tracks; 0 means back to back with the next track preloaded
+    def set_music_crossfade_ms(self, crossfade_ms: int):
+        self._set('musicCrossfadeMs', crossfade_ms)
+
+    def get_music_crossfade_ms(self):
+        return int(self._get('musicCrossfadeMs'))
+
+    # Loudness normalization of music tracks that have been analyzed. Tracks louder than the target are turned down.
+    def set_music_normalize(self, normalize: bool):
+        self._set('musicNormalize', normalize)
+
+    def get_music_normalize(self):
+        return self._getbool('musicNormalize')
+
+    def set_music_target_lufs(self, target_lufs: float):
+        self._set('musicTargetLufs', target_lufs)
+
+    def get_music_target_lufs(self):
+        return float(self._get('musicTargetLufs'))
+
+    # How far /sound/seek may move to land on an onset in the track; 0 seeks exactly
+    def set_seek_snap_ms(self, snap_ms: int):
+        self._set('seekSnapMs', snap_ms)
+
+    def get_seek_snap_ms(self):
+        return int(self._get('seekSnapMs'))
+
+    # How far music drops while a sound effect plays, in dB below its level; 0 leaves it alone
+    def set_duck_under_sfx_db(self, duck_db: float):
+        self._set('duckUnderSfxDb', duck_db)
+
+    def get_duck_under_sfx_db(self):
+        return float(self._get('duckUnderSfxDb'))
+
+    # Sound palettes kept decoded in memory, by name, and the memory they may use between them
+    def set_pinned_palettes(self, names: list):
+        self._set('pinnedPalettes', "|".join(names))
+
+    def get_pinned_palettes(self):
+        return [name for name in str(self._get('pinnedPalettes')).split("|") if name]
+
+    def set_palette_budget_mb(self, budget_mb: int):
+        self._set('paletteBudgetMb', budget_mb)
+
+    def get_palette_budget_mb(self):
+        return int(self._get('paletteBudgetMb'))
+
+    # Music files at least this large play through a bounded read-ahead buffer; 0 turns streaming off
+    def set_stream_min_mb(self, stream_min_mb: int):
+        self._set('streamMinMb', stream_min_mb)
+
+    def get_stream_min_mb(self):
+        return int(self._get('streamMinMb'))
+
     def set_last_hot_button_file(self, path):
         self._set('lastHotButton', path)
 
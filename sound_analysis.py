@@ -0,0 +1,408 @@
+# sound_analysis.py
+# Background analysis of the sound library: title, artist, duration and loudness. Each file is opened by a
+# QMediaPlayer without an audio output for its metadata, then decoded in full to measure its integrated loudness
+# (ITU-R BS.1770, in LUFS) and sample peak. WAV files are parsed directly; other formats go through
+# QAudioDecoder. Both run on a low priority worker thread, one file at a time.
+#
+# Results are cached on disk by file_cache.py, valid for as long as the file's size and modification time are
+# unchanged, so playback can look up a track's normalization gain the moment it is loaded rather than measure
+# anything itself.
+#
+# Loudness is measured in the frequency domain: the audio is cut into 100 ms segments, the K-weighting filter's
+# power response is applied to each segment's spectrum and Parseval's theorem gives the weighted energy. The
+# 400 ms gating blocks overlap by 75%, so each is the mean of four segments. Every step is a NumPy operation over
+# many segments at once. The same decode feeds a WaveformBuilder, so the overview and onsets of each track (see
+# waveform.py) come at no extra cost. NumPy is optional; without it only metadata is collected.
+import logging
+import math
+import wave
+from collections import OrderedDict
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, Signal, Slot, QTimer, QUrl, QFileInfo, QDir
+from PySide6.QtMultimedia import QMediaPlayer, QMediaMetaData, QAudioDecoder, QAudioFormat
+
+from audio_mixer import pcm_to_float
+from file_cache import CachedFileService, file_unchanged, file_stamp
+from media_metadata import content_key
+from waveform import WaveformBuilder, WaveformSummary, WAVEFORM_DIR
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_FILE = "sound_analysis.json"
+
+class SoundAnalysis(NamedTuple):
+    path: str
+    size: int = 0
+    modified_ms: int = 0
+    duration_ms: int = 0
+    title: str = ""
+    artist: str = ""
+    loudness: float | None = None # Integrated loudness, LUFS
+    peak: float | None = None     # Sample peak, dBFS
+    waveform: str = ""            # Overview file, see waveform.py
+
+    # True when the file on disk is still the one that was analyzed
+    def is_current(self) -> bool:
+        return file_unchanged(self.path, self.size, self.modified_ms)
+
+    # Linear gain that brings the track to target_lufs. Only attenuates, as a player's volume cannot go above 1.
+    def gain_to(self, target_lufs: float) -> float:
+        if self.loudness is None:
+            return 1.0
+        return min(1.0, 10.0 ** ((target_lufs - self.loudness) / 20.0))
+
+# ----------------------------------------------------------------------
+# Loudness measurement
+# ----------------------------------------------------------------------
+# Power response of a biquad at the given frequencies
+def _biquad_power(b, a, frequencies, sample_rate: int):
+    z = np.exp(-2j * np.pi * frequencies / sample_rate)
+    response = (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+    return np.abs(response) ** 2
+
+# K-weighting (BS.1770 pre-filter: a +4 dB high shelf and a 38 Hz high pass) as weights on the rfft bins of
+# segment_frames long segments, including the factor of 2 for the bins that stand for both halves of the spectrum
+def k_weighting(segment_frames: int, sample_rate: int):
+    frequencies = np.fft.rfftfreq(segment_frames, 1.0 / sample_rate)
+
+    gain = 10.0 ** (4.0 / 40.0)
+    w0 = 2.0 * math.pi * 1500.0 / sample_rate
+    alpha = math.sin(w0) / (2.0 * (1.0 / math.sqrt(2.0)))
+    cos_w0 = math.cos(w0)
+    shelf_b = (gain * ((gain + 1) + (gain - 1) * cos_w0 + 2 * math.sqrt(gain) * alpha),
+               -2 * gain * ((gain - 1) + (gain + 1) * cos_w0),
+               gain * ((gain + 1) + (gain - 1) * cos_w0 - 2 * math.sqrt(gain) * alpha))
+    shelf_a = ((gain + 1) - (gain - 1) * cos_w0 + 2 * math.sqrt(gain) * alpha,
+               2 * ((gain - 1) - (gain + 1) * cos_w0),
+               (gain + 1) - (gain - 1) * cos_w0 - 2 * math.sqrt(gain) * alpha)
+
+    w0 = 2.0 * math.pi * 38.0 / sample_rate
+    alpha = math.sin(w0) / (2.0 * 0.5)
+    cos_w0 = math.cos(w0)
+    high_pass_b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    high_pass_a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    weights = (_biquad_power(shelf_b, shelf_a, frequencies, sample_rate) *
+               _biquad_power(high_pass_b, high_pass_a, frequencies, sample_rate))
+    weights[1:(segment_frames + 1) // 2] *= 2.0
+    return weights
+
+# Integrated loudness and sample peak of audio fed to it in pieces of any length
+class LoudnessMeter:
+    SEGMENT_S = 0.1
+    SEGMENTS_PER_BLOCK = 4  # 400 ms gating blocks with 75% overlap
+    CHUNK_SEGMENTS = 100    # Segments transformed at once, bounding the memory of the spectra
+    ABSOLUTE_GATE = -70.0
+    RELATIVE_GATE = -10.0
+
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self.peak = 0.0
+        self._segment_frames = max(1, int(round(sample_rate * self.SEGMENT_S)))
+        self._weights = k_weighting(self._segment_frames, sample_rate)
+        self._pending = np.zeros((0, channels), dtype=np.float32)
+        self._energies = []     # Per segment mean square, K-weighted and summed over channels
+
+    # frames is a float array of shape (frames, channels) in [-1, 1]
+    def add(self, frames):
+        if not len(frames):
+            return
+        self.frames += len(frames)
+        self.peak = max(self.peak, float(np.abs(frames).max()))
+
+        data = np.concatenate((self._pending, frames)) if len(self._pending) else frames
+        segment = self._segment_frames
+        step = segment * self.CHUNK_SEGMENTS
+        whole = len(data) // segment * segment
+        for start in range(0, whole, step):
+            segments = data[start:min(whole, start + step)].reshape(-1, segment, self.channels)
+            spectra = np.fft.rfft(segments, axis=1)
+            power = spectra.real ** 2 + spectra.imag ** 2
+            energy = np.einsum("sbc,b->s", power, self._weights)
+            self._energies.append(energy / (segment * segment))
+        self._pending = np.array(data[whole:], dtype=np.float32)
+
+    # Integrated loudness in LUFS, or None for silence or audio shorter than a segment
+    def loudness(self) -> float | None:
+        if not self._energies:
+            return None
+        energies = np.concatenate(self._energies)
+        if len(energies) >= self.SEGMENTS_PER_BLOCK:
+            blocks = np.convolve(energies, np.full(self.SEGMENTS_PER_BLOCK, 1.0 / self.SEGMENTS_PER_BLOCK), mode="valid")
+        else:
+            blocks = np.array([energies.mean()])
+
+        with np.errstate(divide="ignore"):
+            block_loudness = -0.691 + 10.0 * np.log10(blocks)
+        gated = blocks[block_loudness > self.ABSOLUTE_GATE]
+        if not len(gated):
+            return None
+        relative_gate = -0.691 + 10.0 * math.log10(gated.mean()) + self.RELATIVE_GATE
+        gated = blocks[block_loudness > max(self.ABSOLUTE_GATE, relative_gate)]
+        return round(-0.691 + 10.0 * math.log10(gated.mean()), 2)
+
+    def peak_db(self) -> float | None:
+        return round(20.0 * math.log10(self.peak), 2) if self.peak > 0.0 else None
+
+# Read a PCM WAV file directly at its own rate and channel count, chunk_s seconds at a time, so an hour long
+# file is never held in memory whole. Yields float32 frames of shape (frames, channels); the first item is the
+# (sample rate, channels) tuple. Raises OSError, EOFError, wave.Error or ValueError for files it cannot read.
+def read_wav_chunks(file_name: str, chunk_s: float = 1.0):
+    with wave.open(file_name, "rb") as wav:
+        sample_rate = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        if width not in (1, 2, 3, 4):
+            raise ValueError(f"unsupported sample width {width}")
+        yield sample_rate, channels
+
+        chunk_frames = max(1, int(sample_rate * chunk_s))
+        while True:
+            raw = wav.readframes(chunk_frames)
+            if not raw:
+                return
+            yield pcm_to_float(raw, width, channels)
+
+_SAMPLE_TYPES = {QAudioFormat.SampleFormat.UInt8: ("u1", 128.0, 128.0),
+                 QAudioFormat.SampleFormat.Int16: ("<i2", 0.0, 32768.0),
+                 QAudioFormat.SampleFormat.Int32: ("<i4", 0.0, 2147483648.0),
+                 QAudioFormat.SampleFormat.Float: ("<f4", 0.0, 1.0)}
+
+# ----------------------------------------------------------------------
+# Worker
+# ----------------------------------------------------------------------
+# Lives on the analysis thread. The player and decoder are created there on first use so their backends are owned
+# by that thread.
+class _AnalysisWorker(QObject):
+    analyzed = Signal(str, int, str, str, object, object, str) # path, duration ms, title, artist, loudness, peak, waveform
+
+    ANALYZE_TIMEOUT_MS = 60000
+
+    def __init__(self, waveform_dir: str):
+        super().__init__()
+        self._waveform_dir = waveform_dir
+        self._player = None
+        self._decoder = None
+        self._timeout = None
+        self._reset()
+
+    def _reset(self):
+        self._path = ""
+        self._duration = 0
+        self._title = ""
+        self._artist = ""
+        self._meter = None
+        self._waveform = None
+
+    def _create(self):
+        self._player = QMediaPlayer(self)
+        self._player.mediaStatusChanged.connect(self._on_status_changed)
+        self._player.errorOccurred.connect(self._on_player_error)
+
+        self._decoder = QAudioDecoder(self)
+        self._decoder.bufferReady.connect(self._on_buffer_ready)
+        self._decoder.finished.connect(self._finish)
+        self._decoder.error.connect(self._on_decoder_error)
+
+        self._timeout = QTimer(self)
+        self._timeout.setSingleShot(True)
+        self._timeout.timeout.connect(self._on_timeout)
+
+    @Slot(str)
+    def analyze(self, path: str):
+        if self._player is None:
+            self._create()
+
+        self._reset()
+        self._path = path
+        self._timeout.start(self.ANALYZE_TIMEOUT_MS)
+        self._player.setSource(QUrl.fromLocalFile(path))
+
+    @Slot(QMediaPlayer.MediaStatus)
+    def _on_status_changed(self, status):
+        if not self._path or self._meter is not None:
+            return
+
+        if status == QMediaPlayer.MediaStatus.LoadedMedia:
+            self._duration = max(0, self._player.duration())
+            metadata = self._player.metaData()
+            self._title = str(metadata.stringValue(QMediaMetaData.Key.Title) or "")
+            self._artist = str(metadata.stringValue(QMediaMetaData.Key.ContributingArtist) or
+                               metadata.stringValue(QMediaMetaData.Key.AlbumArtist) or
+                               metadata.stringValue(QMediaMetaData.Key.Author) or "")
+            self._player.setSource(QUrl())
+            self._measure()
+        elif status == QMediaPlayer.MediaStatus.InvalidMedia:
+            self._finish()
+
+    def _measure(self):
+        if np is None:
+            self._finish()
+            return
+
+        if self._path.lower().endswith(".wav"):
+            try:
+                chunks = read_wav_chunks(self._path)
+                sample_rate, channels = next(chunks)
+                self._start_measuring(sample_rate, channels)
+                for frames in chunks:
+                    self._add(frames)
+            except (OSError, EOFError, wave.Error, ValueError):
+                self._meter = None # Compressed or unusual WAV; let the decoder try it
+            else:
+                self._finish()
+                return
+
+        self._meter = False # Decoding; the meter is made for the first buffer's format
+        self._decoder.setSource(QUrl.fromLocalFile(self._path))
+        self._decoder.start()
+
+    @Slot()
+    def _on_buffer_ready(self):
+        buffer = self._decoder.read()
+        if not buffer.isValid() or not self._path:
+            return
+
+        audio_format = buffer.format()
+        sample_type = _SAMPLE_TYPES.get(audio_format.sampleFormat())
+        if sample_type is None:
+            logger.warning(f"Sound Analysis: Unsupported sample format in {self._path}")
+            self._decoder.stop()
+            self._finish()
+            return
+
+        channels = audio_format.channelCount()
+        if not self._meter:
+            self._start_measuring(audio_format.sampleRate(), channels)
+        dtype, offset, scale = sample_type
+        samples = np.frombuffer(buffer.constData(), dtype=dtype, count=buffer.sampleCount())
+        self._add(((samples.astype(np.float32) - offset) / scale).reshape(-1, channels))
+
+    def _start_measuring(self, sample_rate: int, channels: int):
+        self._meter = LoudnessMeter(sample_rate, channels)
+        self._waveform = WaveformBuilder(sample_rate, channels)
+
+    def _add(self, frames):
+        self._meter.add(frames)
+        self._waveform.add(frames)
+
+    @Slot(QMediaPlayer.Error, str)
+    def _on_player_error(self, error, error_string):
+        if self._path and self._meter is None:
+            logger.warning(f"Sound Analysis: {self._path}: {error_string}")
+            self._finish()
+
+    @Slot(QAudioDecoder.Error)
+    def _on_decoder_error(self, error):
+        if self._path:
+            logger.warning(f"Sound Analysis: Could not decode {self._path}: {self._decoder.errorString()}")
+            self._meter = None
+            self._finish()
+
+    @Slot()
+    def _on_timeout(self):
+        logger.warning(f"Sound Analysis: Timed out analyzing {self._path}")
+        self._meter = None
+        self._finish()
+
+    @Slot()
+    def _finish(self):
+        path = self._path
+        if not path:
+            return
+
+        # Stopping the decoder can emit finished again
+        self._path = ""
+        self._timeout.stop()
+        self._decoder.stop()
+        self._player.setSource(QUrl())
+
+        meter = self._meter
+        loudness = meter.loudness() if meter else None
+        peak = meter.peak_db() if meter else None
+        if not self._duration and meter:
+            self._duration = meter.frames * 1000 // meter.sample_rate
+
+        waveform_file = ""
+        if meter and self._waveform.frames:
+            waveform_file = QDir(self._waveform_dir).filePath(content_key(path) + ".wfm")
+            if not self._waveform.save(waveform_file):
+                waveform_file = ""
+
+        self.analyzed.emit(path, self._duration, self._title, self._artist, loudness, peak, waveform_file)
+        self._reset()
+
+# ----------------------------------------------------------------------
+# Service
+# ----------------------------------------------------------------------
+# GUI thread facade over the shared queue and cache in file_cache.py.
+class SoundAnalysisService(CachedFileService):
+    analysisReady = Signal(str) # Path of a sound whose analysis is now available
+
+    THROTTLE_MS = 100
+    SAVE_DELAY_MS = 5000
+    MAX_OPEN_WAVEFORMS = 8
+
+    def __init__(self, config_dir: str, parent=None):
+        super().__init__(config_dir, ANALYSIS_CACHE_FILE, SoundAnalysis, "Sound Analysis", parent)
+        waveform_dir = QDir(config_dir).filePath(WAVEFORM_DIR)
+        if not QDir().mkpath(waveform_dir):
+            logger.error(f"Sound Analysis: Failed to create waveform directory {waveform_dir}")
+        self._waveforms = OrderedDict() # waveform file -> WaveformSummary, least recently used first
+
+        worker = _AnalysisWorker(waveform_dir)
+        worker.analyzed.connect(self._on_analyzed)
+        self._start_worker(worker, worker.analyze)
+
+    # Analysis of a sound, or None when it has not been analyzed yet or the file has changed since
+    def analysis(self, path: str) -> SoundAnalysis | None:
+        return self.entry(path)
+
+    # Gain that normalizes a sound to target_lufs; 1.0 while it is unanalyzed
+    def gain(self, path: str, target_lufs: float) -> float:
+        entry = self.analysis(path)
+        return entry.gain_to(target_lufs) if entry else 1.0
+
+    # Memory mapped overview of a sound, or None when there is none yet
+    def waveform(self, path: str) -> WaveformSummary | None:
+        entry = self.analysis(path)
+        if entry is None or not entry.waveform:
+            return None
+
+        summary = self._waveforms.get(entry.waveform)
+        if summary is None:
+            summary = WaveformSummary.load(entry.waveform)
+            if summary is None:
+                return None
+            self._waveforms[entry.waveform] = summary
+            while len(self._waveforms) > self.MAX_OPEN_WAVEFORMS:
+                self._waveforms.popitem(last=False)
+        self._waveforms.move_to_end(entry.waveform)
+        return summary
+
+    # Queue sounds for analysis, skipping those already analyzed
+    def request_all(self, paths: list[str]):
+        for path in paths:
+            self.request(path)
+        if self._pending:
+            logger.info(f"Sound Analysis: {len(self._pending)} sounds to analyze")
+
+    # Entries measured before overviews were kept have a loudness but no waveform
+    def _needs_work(self, path: str) -> bool:
+        entry = self.analysis(path)
+        return entry is None or (not entry.waveform and entry.loudness is not None and np is not None)
+
+    @Slot(str, int, str, str, object, object, str)
+    def _on_analyzed(self, path, duration_ms, title, artist, loudness, peak, waveform):
+        self._waveforms.pop(waveform, None)
+        self._store(SoundAnalysis(path, *file_stamp(path), duration_ms, title, artist, loudness, peak, waveform))
+        logger.debug(f"Sound Analysis: {QFileInfo(path).fileName()} {duration_ms} ms, {loudness} LUFS, peak {peak} dBFS")
+        self.analysisReady.emit(path)
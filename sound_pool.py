@@ -0,0 +1,130 @@
+# sound_pool.py
+# Preloaded sound effects for OSC triggers. Each sample keeps a few QSoundEffect voices that stay loaded
+# between plays, so a trigger only has to start an idle voice rather than read and decode the file first.
+# A sample retriggered while its voices are all busy adds another voice up to the per-sample limit, taking a
+# spare idle voice from another sample when the pool as a whole is full. Beyond that the sample's voice that
+# started longest ago is cut off and restarted.
+# Rapid fire buzzers and horns therefore start within an audio buffer and never pile up unbounded.
+import logging
+import time
+from collections import OrderedDict
+
+from PySide6.QtCore import QObject, Slot, QUrl
+from PySide6.QtMultimedia import QSoundEffect
+
+logger = logging.getLogger(__name__)
+
+class _Voice:
+    __slots__ = ("effect", "started")
+
+    def __init__(self, effect: QSoundEffect):
+        self.effect = effect
+        self.started = 0.0
+
+class SoundEffectPool(QObject):
+    MAX_VOICES_PER_SAMPLE = 4
+    MAX_SAMPLES = 32
+    MAX_VOICES = 48   # A voice per preloaded sample plus room for overlapping retriggers
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._samples = OrderedDict() # file -> [_Voice], least recently played first
+        self._voice_count = 0
+        self.volume = 1.0
+        self.stolen = 0
+
+    # Load a sample ahead of its first trigger. Loading is asynchronous; the first voice decodes the file and
+    # later voices for the same file share the decoded data.
+    def preload(self, file: str):
+        if file not in self._samples:
+            self._make_room()
+            self._samples[file] = [self._new_voice(file)]
+
+    # Preload several files, up to the sample limit
+    def preload_all(self, files: list[str]):
+        for file in files[:self.MAX_SAMPLES]:
+            self.preload(file)
+        logger.info(f"Sound Pool: Preloading {min(len(files), self.MAX_SAMPLES)} sound effects")
+
+    def play(self, file: str) -> bool:
+        voices = self._samples.get(file)
+        if voices is None:
+            self.preload(file)
+            voices = self._samples[file]
+        self._samples.move_to_end(file)
+        if voices[0].effect.status() == QSoundEffect.Status.Error:
+            return False
+
+        voice = self._idle_voice(voices)
+        if voice is None:
+            if len(voices) < self.MAX_VOICES_PER_SAMPLE and (self._voice_count < self.MAX_VOICES or
+                                                              self._reclaim_spare_voice(file)):
+                voice = self._new_voice(file)
+                voices.append(voice)
+            else:
+                voice = min(voices, key=lambda voice: voice.started)
+                voice.effect.stop()
+                self.stolen += 1
+
+        voice.effect.setVolume(self.volume)
+        voice.effect.play() # Plays once loaded when the voice is still loading
+        voice.started = time.monotonic()
+        return True
+
+    @Slot()
+    def stop_all(self):
+        for voices in self._samples.values():
+            for voice in voices:
+                voice.effect.stop()
+
+    # Drop every sample, e.g. after the sound library is reindexed
+    def clear(self):
+        for file in list(self._samples):
+            self._release(file)
+
+    def playing(self) -> int:
+        return sum(voice.effect.isPlaying() for voices in self._samples.values() for voice in voices)
+
+    def _idle_voice(self, voices: list) -> _Voice | None:
+        for voice in voices:
+            if not voice.effect.isPlaying() and voice.effect.status() != QSoundEffect.Status.Error:
+                return voice
+        return None
+
+    # Free an idle voice beyond the first of another sample, least recently played sample first
+    def _reclaim_spare_voice(self, keep_file: str) -> bool:
+        for file, voices in self._samples.items():
+            if file == keep_file or len(voices) < 2:
+                continue
+            voice = self._idle_voice(voices)
+            if voice is not None:
+                voices.remove(voice)
+                voice.effect.deleteLater()
+                self._voice_count -= 1
+                return True
+        return False
+
+    def _new_voice(self, file: str) -> _Voice:
+        effect = QSoundEffect(self)
+        effect.setSource(QUrl.fromLocalFile(file))
+        effect.statusChanged.connect(lambda effect=effect, file=file: self._on_status_changed(effect, file))
+        self._voice_count += 1
+        return _Voice(effect)
+
+    def _on_status_changed(self, effect: QSoundEffect, file: str):
+        if effect.status() == QSoundEffect.Status.Error:
+            logger.warning(f"Sound Pool: Could not load {file}")
+
+    # Evict the least recently played samples that are silent
+    def _make_room(self):
+        for file in list(self._samples):
+            if len(self._samples) < self.MAX_SAMPLES:
+                return
+            if not any(voice.effect.isPlaying() for voice in self._samples[file]):
+                self._release(file)
+
+    def _release(self, file: str):
+        for voice in self._samples.pop(file, []):
+            voice.effect.stop()
+            voice.effect.deleteLater()
+            self._voice_count -= 1
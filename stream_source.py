@@ -0,0 +1,240 @@
+# stream_source.py
+# Long music beds (intermission and pre-show files that run for an hour) are handed to the music player through
+# StreamingFileDevice rather than as a file URL. A reader thread keeps a fixed size ring buffer filled ahead of
+# the player's read position, so a slow disk or network share never starves playback and memory stays the same
+# however long the file is. A seek outside the buffered window moves the window; the music deck asks for the
+# target to be prefetched, located through the file's SeekIndex, before the player seeks, so the data is usually
+# waiting when the player gets there.
+import logging
+import struct
+import threading
+import time
+
+from PySide6.QtCore import QIODevice, QFileInfo
+
+logger = logging.getLogger(__name__)
+
+# Byte offset of a time in a file. PCM WAV files are indexed exactly from their header; for other formats the
+# offset is estimated from the duration once the player knows it, which is close for constant bit rates.
+class SeekIndex:
+    def __init__(self, path: str, size: int):
+        self.size = size
+        self.duration_ms = 0
+        self.exact = False
+        self._data_offset = 0
+        self._data_size = size
+        self._sample_rate = 0
+        self._block_align = 0
+        if path.lower().endswith(".wav"):
+            try:
+                self._read_wav_header(path)
+            except (OSError, struct.error) as e:
+                logger.warning(f"Seek Index: Cannot read the header of {path}: {e}")
+
+    def _read_wav_header(self, path: str):
+        with open(path, "rb") as file:
+            riff, _, wave_id = struct.unpack("<4sI4s", file.read(12))
+            if riff != b"RIFF" or wave_id != b"WAVE":
+                return
+            sample_rate = block_align = 0
+            while True:
+                header = file.read(8)
+                if len(header) < 8:
+                    return
+                chunk_id, chunk_size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = file.read(min(chunk_size, 16))
+                    _, _, sample_rate, _, block_align = struct.unpack("<HHIIH", fmt[:14])
+                    file.seek(chunk_size - len(fmt) + (chunk_size & 1), 1)
+                elif chunk_id == b"data":
+                    break
+                else:
+                    # Chunks are padded to an even length
+                    file.seek(chunk_size + (chunk_size & 1), 1)
+
+            if sample_rate and block_align:
+                self._data_offset = file.tell()
+                self._data_size = min(chunk_size, self.size - self._data_offset)
+                self._sample_rate = sample_rate
+                self._block_align = block_align
+                self.duration_ms = self._data_size // block_align * 1000 // sample_rate
+                self.exact = True
+
+    # -1 when the offset is not known yet
+    def offset(self, position_ms: int) -> int:
+        position_ms = max(0, position_ms)
+        if self.exact:
+            frame = position_ms * self._sample_rate // 1000
+            return self._data_offset + min(frame * self._block_align, self._data_size)
+        if self.duration_ms > 0:
+            return min(self.size, self.size * position_ms // self.duration_ms)
+        return -1
+
+# A random access device over a file, read ahead into a ring buffer by a thread of its own. readData and seek
+# are called from the player's demuxer thread, prefetch and close from the GUI thread.
+class StreamingFileDevice(QIODevice):
+    RING_BYTES = 8 * 1024 * 1024     # About 47 s of 16 bit stereo at 44.1 kHz
+    BEHIND_BYTES = 1024 * 1024       # Kept behind the read position for the demuxer's short look backs
+    CHUNK_BYTES = 256 * 1024
+    PREFETCH_LEAD_BYTES = 64 * 1024  # Prefetch from a little before a seek target, where the demuxer may land
+    READ_TIMEOUT_S = 5.0
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self._size = QFileInfo(path).size()
+        self.seek_index = SeekIndex(path, self._size)
+
+        self._ring = bytearray(self.RING_BYTES)
+        self._cond = threading.Condition()
+        self._start = 0          # File offset of the oldest byte held
+        self._end = 0            # File offset just past the newest byte held
+        self._read_pos = 0       # Where the player is reading
+        self._generation = 0     # Bumped when the window moves, so a read in flight is discarded
+        self._prefetch_at = -1   # Offset the reader should fetch a chunk from next
+        self._prefetched = (0, b"")
+        self._closed = True
+        self._thread = None
+
+    def open(self, mode) -> bool:
+        try:
+            file = open(self.path, "rb")
+        except OSError as e:
+            logger.error(f"Streaming: Cannot open {self.path}: {e}")
+            return False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, args=(file,), name="StreamReader", daemon=True)
+        self._thread.start()
+        return super().open(mode)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+        super().close()
+
+    def isSequential(self) -> bool:
+        return False
+
+    def size(self) -> int:
+        return self._size
+
+    def bytesAvailable(self) -> int:
+        with self._cond:
+            held = max(0, self._end - self.pos()) if self._holds(self.pos()) else 0
+        return held + super().bytesAvailable()
+
+    def seek(self, pos: int) -> bool:
+        with self._cond:
+            if self._holds(pos):
+                self._read_pos = pos
+            else:
+                self._move_window(pos)
+            self._cond.notify_all()
+        return super().seek(pos)
+
+    # Start reading at offset ahead of a seek there, without disturbing what is playing now
+    def prefetch(self, offset: int):
+        if offset < 0:
+            return
+        offset = max(0, offset - self.PREFETCH_LEAD_BYTES)
+        with self._cond:
+            if self._holds(offset) or self._prefetched[0] <= offset < self._prefetched[0] + len(self._prefetched[1]):
+                return
+            self._prefetch_at = offset
+            self._cond.notify_all()
+
+    def readData(self, maxlen: int) -> bytes:
+        position = self.pos()
+        with self._cond:
+            if not self._holds(position):
+                self._move_window(position)
+            self._read_pos = position
+            self._cond.notify_all()
+
+            deadline = time.monotonic() + self.READ_TIMEOUT_S
+            while self._end <= position < self._size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"Streaming: No data for {self.path} at {position} after {self.READ_TIMEOUT_S} s")
+                    return b""
+                self._cond.wait(remaining)
+
+            count = min(maxlen, self._end - position)
+            if self._closed or count <= 0:
+                return b""
+            data = self._copy_out(position, count)
+            # Room has been freed for the reader
+            self._cond.notify_all()
+        return data
+
+    def writeData(self, data) -> int:
+        return -1
+
+    # The methods below are called with the lock held
+    def _holds(self, offset: int) -> bool:
+        return self._start <= offset <= self._end
+
+    # Restart the window at offset, from a prefetched chunk when one covers it
+    def _move_window(self, offset: int):
+        self._generation += 1
+        self._start = self._end = self._read_pos = offset
+        prefetched_at, data = self._prefetched
+        if prefetched_at <= offset < prefetched_at + len(data):
+            self._copy_in(offset, memoryview(data)[offset - prefetched_at:])
+        self._prefetched = (0, b"")
+
+    def _copy_in(self, offset: int, data):
+        index = offset % self.RING_BYTES
+        first = min(len(data), self.RING_BYTES - index)
+        self._ring[index:index + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+        self._end = offset + len(data)
+        self._start = max(self._start, self._end - self.RING_BYTES)
+
+    def _copy_out(self, offset: int, count: int) -> bytes:
+        index = offset % self.RING_BYTES
+        first = min(count, self.RING_BYTES - index)
+        return bytes(self._ring[index:index + first]) + bytes(self._ring[:count - first])
+
+    # Reader thread
+    def _run(self, file):
+        with file:
+            while True:
+                with self._cond:
+                    while not self._closed and self._prefetch_at < 0 and (
+                            self._end >= self._size or self._end - self._read_pos >= self.RING_BYTES - self.BEHIND_BYTES):
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                    generation = self._generation
+                    if self._prefetch_at >= 0:
+                        offset, count = self._prefetch_at, self.CHUNK_BYTES
+                        self._prefetch_at = -1
+                        prefetch = True
+                    else:
+                        offset = self._end
+                        count = min(self.CHUNK_BYTES,
+                                    self.RING_BYTES - self.BEHIND_BYTES - (self._end - self._read_pos))
+                        prefetch = False
+
+                try:
+                    file.seek(offset)
+                    data = file.read(count)
+                except OSError as e:
+                    logger.error(f"Streaming: Read failed in {self.path} at {offset}: {e}")
+                    data = b""
+
+                with self._cond:
+                    if prefetch:
+                        self._prefetched = (offset, data)
+                    elif generation == self._generation and offset == self._end:
+                        if not data:
+                            # The file ended early, e.g. it was truncated while playing
+                            self._size = offset
+                        else:
+                            self._copy_in(offset, data)
+                    self._cond.notify_all()
@@ -0,0 +1,205 @@
+# thumbnail_cache.py
+# Content addressed thumbnail cache for the media views. Thumbnails are stored on disk in the configuration
+# directory under a key built from the file's path, modification time and size, so a replaced file gets a
+# fresh thumbnail and unchanged files are never decoded twice. Thumbnails are made lazily on a small worker
+# pool and only for rows a view actually paints, so scrolling thousands of results stays smooth.
+import logging
+from collections import OrderedDict, deque
+
+from PySide6.QtCore import QObject, Signal, Slot, Qt, QSize, QDir, QFileInfo, QRunnable, QThreadPool, QTimer
+from PySide6.QtGui import QImage, QImageReader, QIcon, QPixmap
+from PySide6.QtWidgets import QApplication, QStyle, QStyledItemDelegate, QStyleOptionViewItem
+
+from media_metadata import content_key
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_SIZE = QSize(96, 64)
+
+# Decodes (or reloads) one thumbnail on a pool thread
+class _ThumbnailTask(QRunnable):
+    def __init__(self, cache, path: str, source: str, thumbnail_file: str):
+        super().__init__()
+        self._cache = cache
+        self._path = path
+        self._source = source
+        self._thumbnail_file = thumbnail_file
+
+    def run(self):
+        image = QImage(self._thumbnail_file) if QFileInfo.exists(self._thumbnail_file) else QImage()
+        if image.isNull():
+            reader = QImageReader(self._source)
+            reader.setAutoTransform(True)
+            if reader.size().isValid():
+                # Let the decoder do the scaling; far cheaper than decoding a full photo
+                reader.setScaledSize(reader.size().scaled(THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio))
+            image = reader.read()
+            if not image.isNull():
+                image = image.scaled(THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                                     Qt.TransformationMode.SmoothTransformation)
+                if not image.save(self._thumbnail_file, "JPG", 85):
+                    logger.warning(f"Thumbnail Cache: Could not save {self._thumbnail_file}")
+
+        self._cache._loaded.emit(self._path, image)
+
+class ThumbnailCache(QObject):
+    thumbnailReady = Signal(str)
+    _loaded = Signal(str, QImage)
+
+    MEMORY_ENTRIES = 600
+    MAX_QUEUED = 200
+
+    # Videos have no image to decode; their poster frame from the metadata service is used instead.
+    # is_video tells which files are worth asking the service about.
+    def __init__(self, config_dir: str, metadata_service=None, is_video=None, parent=None):
+        super().__init__(parent)
+        self._thumbnail_dir = QDir(config_dir).filePath(THUMBNAIL_DIR)
+        if not QDir().mkpath(self._thumbnail_dir):
+            logger.error(f"Thumbnail Cache: Failed to create {self._thumbnail_dir}")
+
+        self._metadata_service = metadata_service
+        self._is_video = is_video
+        self._awaiting_metadata = set()
+        if metadata_service is not None:
+            metadata_service.metadataReady.connect(self._on_metadata_ready)
+
+        self._icons = OrderedDict()
+        self._failed = set()
+        self._in_flight = set()
+        self._queue = deque()
+        self._image_suffixes = {bytes(fmt).decode("ascii").lower() for fmt in QImageReader.supportedImageFormats()}
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self._loaded.connect(self._on_loaded)
+
+    # The thumbnail if it is ready, otherwise None with the thumbnail queued. Safe to call on every paint.
+    def thumbnail(self, path: str) -> QIcon | None:
+        if not path:
+            return None
+
+        icon = self._icons.get(path)
+        if icon is not None:
+            self._icons.move_to_end(path)
+            return icon
+
+        if path not in self._failed and path not in self._in_flight and path not in self._queue:
+            self._queue.append(path)
+            # Only the most recent requests matter; older ones were for rows long since scrolled past
+            while len(self._queue) > self.MAX_QUEUED:
+                self._queue.popleft()
+            self._pump()
+
+        return None
+
+    # Forget everything in memory, e.g. after the library is re-indexed. Disk entries stay valid.
+    def clear(self):
+        self._icons.clear()
+        self._failed.clear()
+        self._queue.clear()
+
+    # Newest first so the rows on screen now are served before rows scrolled past
+    def _pump(self):
+        while self._queue and len(self._in_flight) < self._pool.maxThreadCount():
+            path = self._queue.pop()
+            source = self._source_for(path)
+            if source is None:
+                continue
+
+            self._in_flight.add(path)
+            thumbnail_file = QDir(self._thumbnail_dir).filePath(content_key(path) + ".jpg")
+            self._pool.start(_ThumbnailTask(self, path, source, thumbnail_file))
+
+    # The file to make a thumbnail from, or None when there is none (yet)
+    def _source_for(self, path: str) -> str | None:
+        suffix = QFileInfo(path).suffix().lower()
+        if suffix in self._image_suffixes:
+            return path
+
+        if self._metadata_service is None or self._is_video is None or not self._is_video(path):
+            self._failed.add(path)
+            return None
+
+        video = self._metadata_service.metadata(path)
+        if video is None:
+            # Not examined yet; the service answers through metadataReady
+            self._awaiting_metadata.add(path)
+            self._metadata_service.request(path)
+            return None
+
+        if not video.poster:
+            self._failed.add(path)
+            return None
+
+        return video.poster
+
+    @Slot(str, QImage)
+    def _on_loaded(self, path, image):
+        self._in_flight.discard(path)
+        if image.isNull():
+            self._failed.add(path)
+        else:
+            self._icons[path] = QIcon(QPixmap.fromImage(image))
+            while len(self._icons) > self.MEMORY_ENTRIES:
+                self._icons.popitem(last=False)
+            self.thumbnailReady.emit(path)
+
+        self._pump()
+
+    @Slot(str)
+    def _on_metadata_ready(self, path):
+        if path in self._awaiting_metadata:
+            self._awaiting_metadata.discard(path)
+            self._queue.append(path)
+            self._pump()
+
+# Path lookup for models that keep either the path or a QFileInfo in UserRole
+def path_from_user_role(index) -> str:
+    data = index.data(Qt.ItemDataRole.UserRole)
+    if isinstance(data, QFileInfo):
+        return data.absoluteFilePath()
+    return data if isinstance(data, str) else ""
+
+# Draws the cached thumbnail as the item's decoration. path_for_index maps a model index to a file path
+# (or "" for rows without one, like folders) since each view keeps the path in a different role.
+class ThumbnailDelegate(QStyledItemDelegate):
+    def __init__(self, cache: ThumbnailCache, path_for_index, view):
+        super().__init__(view)
+        self._cache = cache
+        self._path_for_index = path_for_index
+        self._view = view
+
+        # Many thumbnails finish together while scrolling; repaint once for the batch
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(30)
+        self._repaint_timer.timeout.connect(self._view.viewport().update)
+        self._cache.thumbnailReady.connect(lambda path: self._repaint_timer.start())
+
+        # Fixed row heights let the view skip measuring every row of a long list
+        view.setIconSize(THUMBNAIL_SIZE)
+        if hasattr(view, "setUniformItemSizes"):
+            view.setUniformItemSizes(True)
+        else:
+            view.setUniformRowHeights(True)
+
+    # The thumbnail is looked up in paint, not initStyleOption, so size calculations never queue work for
+    # rows that are off screen
+    def paint(self, painter, option, index):
+        view_option = QStyleOptionViewItem(option)
+        self.initStyleOption(view_option, index)
+
+        icon = self._cache.thumbnail(self._path_for_index(index))
+        if icon is not None:
+            view_option.icon = icon
+            view_option.features |= QStyleOptionViewItem.ViewItemFeature.HasDecoration
+        view_option.decorationSize = THUMBNAIL_SIZE
+
+        style = view_option.widget.style() if view_option.widget else QApplication.style()
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, view_option, painter, view_option.widget)
+
+    # Rows are sized for a thumbnail up front so rows do not jump in height as thumbnails arrive
+    def sizeHint(self, option, index):
+        size = super().sizeHint(option, index)
+        return size.expandedTo(QSize(size.width(), THUMBNAIL_SIZE.height() + 4))
@@ -0,0 +1,364 @@
+# transitions.py
+# Software (GPU-less) transition compositor for the projector displays. Frames are plain QImages so the
+# whole pipeline runs without a window system and can be benchmarked headless with the offscreen platform.
+import logging
+import threading
+from collections import OrderedDict
+
+from PySide6.QtCore import (QObject, Signal, Slot, Qt, QTimer, QElapsedTimer, QSize, QPoint, QEasingCurve, QFileInfo,
+                            QRunnable, QThreadPool)
+from PySide6.QtGui import QImage, QImageReader, QImageIOHandler, QPainter, QMovie
+from PySide6.QtWidgets import QWidget
+
+logger = logging.getLogger(__name__)
+
+TRANSITION_CUT = "cut"
+TRANSITION_FADE = "fade"
+TRANSITION_SLIDE = "slide"
+TRANSITION_TYPES = (TRANSITION_CUT, TRANSITION_FADE, TRANSITION_SLIDE)
+
+# Decodes an image file straight to the requested display size. Letting the reader scale during the decode
+# is considerably cheaper for JPEGs than decoding full resolution and scaling afterwards.
+def load_scaled_image(file_name: str, size: QSize, stretch: bool) -> QImage:
+    reader = QImageReader(file_name)
+    reader.setAutoTransform(True)
+
+    source_size = reader.size()
+    if source_size.isValid() and not size.isEmpty():
+        # Rotated EXIF images report the stored size, not the displayed one
+        if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+            source_size = source_size.transposed()
+
+        aspect_mode = Qt.AspectRatioMode.IgnoreAspectRatio if stretch else Qt.AspectRatioMode.KeepAspectRatio
+        target_size = source_size.scaled(size, aspect_mode)
+        if target_size.width() < source_size.width() or target_size.height() < source_size.height():
+            if reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+                target_size = target_size.transposed()
+            reader.setScaledSize(target_size)
+
+    image = reader.read()
+    if image.isNull():
+        logger.warning(f"Frame Cache: Failed to read image {file_name}: {reader.errorString()}")
+        return image
+
+    # The reader only scales down. Small sources still need scaling up to fill the display.
+    if not size.isEmpty():
+        aspect_mode = Qt.AspectRatioMode.IgnoreAspectRatio if stretch else Qt.AspectRatioMode.KeepAspectRatio
+        expected = image.size().scaled(size, aspect_mode)
+        if expected != image.size():
+            image = image.scaled(expected, aspect_mode, Qt.TransformationMode.SmoothTransformation)
+
+    return image
+
+# True when the file can only ever be a single frame, so it is safe to pre-decode into the frame cache
+def is_static_image(file_name: str) -> bool:
+    suffix = QFileInfo(file_name).suffix().lower()
+    return bytes(suffix, "ascii") not in QMovie.supportedFormats()
+
+# Byte bounded LRU cache of images already scaled to a display size. Entries can be pinned so frames needed
+# instantly (hot buttons) are never evicted. Guarded by a lock so worker threads can warm it.
+class FrameCache:
+    DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._frames = OrderedDict()
+        self._pinned = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    # The modification time is part of the key so a file replaced on disk (e.g. a synced promo folder) is reloaded
+    @staticmethod
+    def key(file_name: str, size: QSize, stretch: bool):
+        modified = QFileInfo(file_name).lastModified().toMSecsSinceEpoch()
+        return (file_name, modified, size.width(), size.height(), bool(stretch))
+
+    def get(self, key) -> QImage | None:
+        with self._lock:
+            image = self._frames.get(key)
+            if image is not None:
+                self._frames.move_to_end(key)
+            return image
+
+    def insert(self, key, image: QImage):
+        if image.isNull():
+            return
+
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self._bytes -= old.sizeInBytes()
+
+            self._frames[key] = image
+            self._bytes += image.sizeInBytes()
+            self._evict()
+
+    def pin(self, key):
+        with self._lock:
+            self._pinned.add(key)
+
+    def unpin(self, key):
+        with self._lock:
+            self._pinned.discard(key)
+            self._evict()
+
+    def pinned(self) -> set:
+        with self._lock:
+            return set(self._pinned)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._pinned.clear()
+            self._bytes = 0
+
+    def size_in_bytes(self) -> int:
+        return self._bytes
+
+    # Returns the cached frame or decodes and caches it
+    def scaled_image(self, file_name: str, size: QSize, stretch: bool) -> QImage:
+        key = self.key(file_name, size, stretch)
+        image = self.get(key)
+        if image is None:
+            image = load_scaled_image(file_name, size, stretch)
+            self.insert(key, image)
+        return image
+
+    # Oldest unpinned entries go first. Must be called with the lock held.
+    def _evict(self):
+        if self._bytes <= self._max_bytes:
+            return
+
+        for key in list(self._frames.keys()):
+            if self._bytes <= self._max_bytes:
+                break
+            if key in self._pinned:
+                continue
+            self._bytes -= self._frames.pop(key).sizeInBytes()
+
+# Decodes one file into the frame cache on a pool thread
+class _PrewarmTask(QRunnable):
+    def __init__(self, prewarmer, key, file_name: str, size: QSize, stretch: bool):
+        super().__init__()
+        self._prewarmer = prewarmer
+        self._key = key
+        self._file_name = file_name
+        self._size = QSize(size)
+        self._stretch = stretch
+
+    def run(self):
+        cache = self._prewarmer.cache()
+        if cache.get(self._key) is None:
+            cache.insert(self._key, load_scaled_image(self._file_name, self._size, self._stretch))
+        self._prewarmer.frameWarmed.emit(self._key)
+
+# Fills and pins frame cache entries in the background so the first push of a file is as fast as the next.
+# frameWarmed is delivered on the owner's thread once a frame is in the cache.
+class FramePrewarmer(QObject):
+    frameWarmed = Signal(object)
+
+    def __init__(self, cache: FrameCache, parent=None):
+        super().__init__(parent)
+        self._cache = cache
+        self._pinned_keys = set()
+
+    def cache(self) -> FrameCache:
+        return self._cache
+
+    # Replace the pinned set with the given files at the given display size. Files that can animate are skipped
+    # as they are never served from the frame cache. Returns the keys now pinned.
+    def prewarm(self, file_names, size: QSize, stretch: bool) -> set:
+        keys = {}
+        if not size.isEmpty():
+            for file_name in file_names:
+                if file_name and QFileInfo.exists(file_name) and is_static_image(file_name):
+                    keys[FrameCache.key(file_name, size, stretch)] = file_name
+
+        for key in self._pinned_keys - keys.keys():
+            self._cache.unpin(key)
+
+        for key, file_name in keys.items():
+            self._cache.pin(key)
+            QThreadPool.globalInstance().start(_PrewarmTask(self, key, file_name, size, stretch))
+
+        self._pinned_keys = set(keys.keys())
+        return set(self._pinned_keys)
+
+# Blends two frames at a fixed frame rate. Progress is derived from the wall clock so a late tick skips ahead
+# instead of slowing the transition down. When a frame cannot be composed inside the frame budget, or the event
+# loop stalls past it, the compositor falls back to a hard cut so the projector never shows a stuttering blend.
+class TransitionCompositor(QObject):
+    frameReady = Signal()
+    finished = Signal()
+
+    DEFAULT_FPS = 60
+
+    def __init__(self, fps: int = DEFAULT_FPS, parent=None):
+        super().__init__(parent)
+
+        self._kind = TRANSITION_CUT
+        self._duration_ms = 0
+        self._from_frame = QImage()
+        self._to_frame = QImage()
+        self._output = QImage()
+        self._easing = QEasingCurve(QEasingCurve.Type.InOutQuad)
+
+        self._clock = QElapsedTimer()
+        self._frame_clock = QElapsedTimer()
+        self._last_tick_ms = 0
+
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._on_tick)
+        self.set_frame_rate(fps)
+
+        # Statistics for the last transition, used by the headless benchmark
+        self.frames_rendered = 0
+        self.missed_deadline = False
+        self.frame_times_ms = []
+
+    def set_frame_rate(self, fps: int):
+        fps = max(1, int(fps))
+        self._interval_ms = max(1, round(1000 / fps))
+        self._budget_ms = 1000.0 / fps
+        self._timer.setInterval(self._interval_ms)
+
+    def frame_budget_ms(self) -> float:
+        return self._budget_ms
+
+    def is_active(self) -> bool:
+        return self._timer.isActive()
+
+    def current_frame(self) -> QImage:
+        return self._output
+
+    # Set up the frames to blend without starting the clock. Used directly when composing frames offline.
+    def load_frames(self, from_frame: QImage, to_frame: QImage, kind: str = TRANSITION_FADE):
+        self._kind = kind if kind in TRANSITION_TYPES else TRANSITION_CUT
+        self._to_frame = to_frame.convertToFormat(QImage.Format.Format_RGB32)
+        self._from_frame = from_frame.convertToFormat(QImage.Format.Format_RGB32)
+
+        if not self._from_frame.isNull() and self._from_frame.size() != self._to_frame.size():
+            self._from_frame = self._from_frame.scaled(self._to_frame.size(), Qt.AspectRatioMode.IgnoreAspectRatio,
+                                                       Qt.TransformationMode.FastTransformation)
+
+        self._output = QImage(self._to_frame.size(), QImage.Format.Format_RGB32)
+
+    # Begin a transition. A cut, a zero duration or missing frames complete immediately.
+    def start(self, from_frame: QImage, to_frame: QImage, kind: str = TRANSITION_FADE, duration_ms: int = 300):
+        self._timer.stop()
+        self.load_frames(from_frame, to_frame, kind)
+        self._duration_ms = max(0, int(duration_ms))
+
+        self.frames_rendered = 0
+        self.missed_deadline = False
+        self.frame_times_ms = []
+
+        if self._kind == TRANSITION_CUT or self._duration_ms == 0 or self._from_frame.isNull() or self._to_frame.isNull():
+            self._finish()
+            return
+
+        self.render_frame(0.0)
+        self.frameReady.emit()
+
+        self._clock.start()
+        self._last_tick_ms = 0
+        self._timer.start()
+
+    def stop(self):
+        if self._timer.isActive():
+            self._finish()
+
+    # Compose a single frame for the given progress (0.0 - 1.0) into the output image
+    def render_frame(self, progress: float) -> QImage:
+        eased = self._easing.valueForProgress(min(1.0, max(0.0, progress)))
+        painter = QPainter(self._output)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+
+        if self._kind == TRANSITION_SLIDE:
+            offset = int(self._output.width() * eased)
+            painter.drawImage(QPoint(-offset, 0), self._from_frame)
+            painter.drawImage(QPoint(self._output.width() - offset, 0), self._to_frame)
+        elif self._kind == TRANSITION_FADE:
+            painter.drawImage(0, 0, self._from_frame)
+            painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+            painter.setOpacity(eased)
+            painter.drawImage(0, 0, self._to_frame)
+        else:
+            painter.drawImage(0, 0, self._to_frame)
+
+        painter.end()
+        return self._output
+
+    @Slot()
+    def _on_tick(self):
+        elapsed = self._clock.elapsed()
+
+        # The event loop stalled for longer than a frame; blending on would visibly jump so cut instead
+        if elapsed - self._last_tick_ms > self._interval_ms + self._budget_ms:
+            self._miss_deadline(f"tick late by {elapsed - self._last_tick_ms - self._interval_ms} ms")
+            return
+        self._last_tick_ms = elapsed
+
+        progress = elapsed / self._duration_ms
+        if progress >= 1.0:
+            self._finish()
+            return
+
+        self._frame_clock.start()
+        self.render_frame(progress)
+        frame_ms = self._frame_clock.nsecsElapsed() / 1_000_000
+        self.frame_times_ms.append(frame_ms)
+        self.frames_rendered += 1
+
+        if frame_ms > self._budget_ms:
+            self._miss_deadline(f"frame took {frame_ms:.1f} ms")
+            return
+
+        self.frameReady.emit()
+
+    def _miss_deadline(self, reason: str):
+        logger.debug(f"Transition Compositor: deadline missed ({reason}), cutting to the next frame")
+        self.missed_deadline = True
+        self._finish()
+
+    def _finish(self):
+        self._timer.stop()
+        self._release_frames()
+        self.finished.emit()
+
+    def _release_frames(self):
+        self._from_frame = QImage()
+        self._to_frame = QImage()
+
+# Sits above a display's stacked widget and shows the compositor output while a transition runs
+class TransitionOverlay(QWidget):
+    framePainted = Signal()
+
+    def __init__(self, compositor: TransitionCompositor, parent=None):
+        super().__init__(parent)
+        self._compositor = compositor
+
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.hide()
+
+        self._compositor.frameReady.connect(self._on_frame_ready)
+        self._compositor.finished.connect(self.hide)
+
+    @Slot()
+    def _on_frame_ready(self):
+        if not self.isVisible():
+            self.show()
+            self.raise_()
+        self.update()
+
+    def paintEvent(self, event):
+        frame = self._compositor.current_frame()
+        if frame.isNull():
+            return
+
+        painter = QPainter(self)
+        painter.drawImage(self.rect(), frame)
+        painter.end()
+        self.framePainted.emit()
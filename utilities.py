@@ -102,3 +102,58 @@ def team_font(color):
 # Utility encapsulating the ui code to find widgets by name
 def findWidget(ui, type, widgetName):
     return ui.findChild(type, widgetName)
+
+# Name lookup for the widgets OSC drives (push buttons, score spin boxes), built with one walk of the widget
+# tree so remote presses resolve with a dictionary lookup instead of a findChild search of the whole panel.
+# A destroyed widget drops out of the registry, and tracking a widget under a name already in use replaces the
+# old one. Names that match nothing are remembered too, so a controller repeating a bad name does not search
+# the panel every time; that memory is dropped whenever a widget is tracked, so a widget created at runtime
+# should be passed to track().
+class WidgetRegistry:
+    MAX_MISSES = 1024 # Names come from the network, so keep the misses bounded
+
+    def __init__(self, ui, types):
+        self._ui = ui
+        self._types = tuple(types)
+        self._widgets = {} # (type, object name) -> widget
+        self._misses = set() # (type, object name) with no widget
+        self.rebuild()
+
+    def rebuild(self):
+        self._widgets.clear()
+        self._misses.clear()
+        for widget_type in self._types:
+            for widget in self._ui.findChildren(widget_type):
+                self.track(widget, widget_type)
+
+    def track(self, widget, widget_type):
+        name = widget.objectName()
+        if not name:
+            return
+        self._misses.clear()
+        key = (widget_type, name)
+        if self._widgets.get(key) is widget:
+            return
+        self._widgets[key] = widget
+        widget.destroyed.connect(lambda obj=None, key=key, widget=widget: self._forget(key, widget))
+
+    def _forget(self, key, widget):
+        if self._widgets.get(key) is widget:
+            del self._widgets[key]
+            self._misses.clear()
+
+    def find(self, widget_type, widgetName):
+        key = (widget_type, widgetName)
+        widget = self._widgets.get(key)
+        if widget is None and widget_type in self._types and key not in self._misses:
+            widget = self._ui.findChild(widget_type, widgetName)
+            if widget is not None:
+                self.track(widget, widget_type)
+            else:
+                if len(self._misses) >= self.MAX_MISSES:
+                    self._misses.clear()
+                self._misses.add(key)
+        return widget
+
+    def __len__(self):
+        return len(self._widgets)
@@ -0,0 +1,279 @@
+# waveform.py
+# Waveform overviews of the sound library and the onsets (hits) in them. While the background sound analysis
+# decodes a track, a WaveformBuilder keeps the minimum and maximum of each 512 frame bucket of the mono mix, plus
+# two coarser zoom levels each 8 times wider, and finds onsets from the spectral flux of 1024 frame hops. The
+# result is written to a small file in the configuration directory that WaveformSummary memory maps, so showing
+# a track's waveform reads only the pages of the zoom level being drawn.
+#
+# File layout, little endian: header (magic, sample rate, bucket frames, levels, frames, onset count), the onset
+# times in ms as uint32, then each level's min/max pairs as int8, finest level first.
+#
+# Building and reading overviews needs NumPy; without it there are none and the view stays empty.
+import logging
+import math
+import struct
+
+from PySide6.QtCore import Qt, Signal, QLineF, QSize
+from PySide6.QtGui import QPainter, QPen, QPalette
+from PySide6.QtWidgets import QWidget, QSizePolicy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+WAVEFORM_DIR = "waveforms"
+WAVEFORM_MAGIC = b"ITWAVE01"
+_HEADER = struct.Struct("<8sIIIII")
+
+BUCKET_FRAMES = 512 # Finest level; about 11 ms at 48 kHz
+LEVEL_FACTOR = 8
+LEVELS = 3
+
+# Reduce min/max pairs to a level LEVEL_FACTOR times coarser
+def _coarser(pairs):
+    padded = -(-len(pairs) // LEVEL_FACTOR) * LEVEL_FACTOR
+    if padded != len(pairs):
+        pairs = np.concatenate((pairs, np.repeat(pairs[-1:], padded - len(pairs), axis=0)))
+    groups = pairs.reshape(-1, LEVEL_FACTOR, 2)
+    return np.stack((groups[:, :, 0].min(axis=1), groups[:, :, 1].max(axis=1)), axis=1)
+
+# Builds the overview and onsets of audio fed to it in pieces of any length
+class WaveformBuilder:
+    ONSET_FRAMES = 1024
+    ONSET_WINDOW_S = 1.0      # Span of the local average an onset must stand out from
+    ONSET_RATIO = 1.5
+    ONSET_MIN_GAP_MS = 100
+
+    def __init__(self, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames = 0
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pairs = []          # Finest level min/max pairs per processed piece
+        self._flux = []           # Spectral flux per onset hop
+        self._window = np.hanning(self.ONSET_FRAMES).astype(np.float32)
+        self._last_spectrum = None
+
+    # frames is a float array of shape (frames, channels) in [-1, 1]
+    def add(self, frames):
+        if not len(frames):
+            return
+        self.frames += len(frames)
+        mono = frames.mean(axis=1, dtype=np.float32) if frames.shape[1] > 1 else frames[:, 0]
+        data = np.concatenate((self._pending, mono)) if len(self._pending) else mono
+        whole = len(data) // self.ONSET_FRAMES * self.ONSET_FRAMES
+        if whole:
+            self._process(data[:whole])
+        self._pending = np.array(data[whole:], dtype=np.float32)
+
+    def _process(self, data):
+        buckets = data.reshape(-1, BUCKET_FRAMES)
+        self._pairs.append(np.stack((buckets.min(axis=1), buckets.max(axis=1)), axis=1))
+
+        # Rises in log magnitude, summed over the spectrum, from one hop to the next
+        spectra = np.log1p(100.0 * np.abs(np.fft.rfft(data.reshape(-1, self.ONSET_FRAMES) * self._window, axis=1)))
+        previous = self._last_spectrum if self._last_spectrum is not None else spectra[:1]
+        rises = np.diff(np.concatenate((previous, spectra)), axis=0)
+        self._flux.append(np.maximum(rises, 0.0).sum(axis=1))
+        self._last_spectrum = spectra[-1:]
+
+    # Onset times in ms: peaks of the flux that stand out from their surroundings, at least ONSET_MIN_GAP_MS apart
+    def onsets_ms(self):
+        if not self._flux:
+            return np.zeros(0, dtype=np.uint32)
+        flux = np.concatenate(self._flux)
+        hop_ms = self.ONSET_FRAMES * 1000.0 / self.sample_rate
+
+        span = max(3, int(self.ONSET_WINDOW_S * 1000.0 / hop_ms) | 1)
+        window = np.ones(span)
+        local = np.convolve(flux, window, mode="same") / np.convolve(np.ones(len(flux)), window, mode="same")
+        floor = 0.1 * flux.mean()
+        peak = np.ones(len(flux), dtype=bool)
+        peak[1:] &= flux[1:] >= flux[:-1]
+        peak[:-1] &= flux[:-1] > flux[1:]
+        candidates = np.flatnonzero(peak & (flux > self.ONSET_RATIO * local + floor))
+
+        # Of onsets closer than the minimum gap keep the strongest
+        min_gap = max(1, int(self.ONSET_MIN_GAP_MS / hop_ms))
+        blocked = np.zeros(len(flux), dtype=bool)
+        kept = []
+        for index in candidates[np.argsort(-flux[candidates], kind="stable")]:
+            if not blocked[index]:
+                kept.append(index)
+                blocked[max(0, index - min_gap + 1):index + min_gap] = True
+        return (np.sort(np.array(kept, dtype=np.float64)) * hop_ms).astype(np.uint32)
+
+    def levels(self) -> list:
+        pairs = self._pairs[:]
+        if len(self._pending):
+            tail = self._pending
+            pairs.append(np.array([[tail[i:i + BUCKET_FRAMES].min(), tail[i:i + BUCKET_FRAMES].max()]
+                                   for i in range(0, len(tail), BUCKET_FRAMES)], dtype=np.float32))
+        finest = np.concatenate(pairs) if pairs else np.zeros((1, 2), dtype=np.float32)
+        finest = np.clip(np.round(finest * 127.0), -127, 127).astype(np.int8)
+        levels = [finest]
+        for _ in range(LEVELS - 1):
+            levels.append(_coarser(levels[-1]))
+        return levels
+
+    def save(self, file_name: str) -> bool:
+        onsets = self.onsets_ms()
+        levels = self.levels()
+        try:
+            with open(file_name, "wb") as wave_file:
+                wave_file.write(_HEADER.pack(WAVEFORM_MAGIC, self.sample_rate, BUCKET_FRAMES, len(levels),
+                                             self.frames, len(onsets)))
+                wave_file.write(onsets.astype("<u4").tobytes())
+                for level in levels:
+                    wave_file.write(level.tobytes())
+        except OSError as e:
+            logger.warning(f"Waveform: Could not save {file_name}: {e}")
+            return False
+        return True
+
+# A saved overview, memory mapped
+class WaveformSummary:
+    def __init__(self, sample_rate: int, bucket_frames: int, frames: int, onsets, levels: list):
+        self.sample_rate = sample_rate
+        self.bucket_frames = bucket_frames
+        self.frames = frames
+        self.onsets = onsets
+        self._levels = levels
+
+    # The overview in file_name, or None when it cannot be read
+    @classmethod
+    def load(cls, file_name: str):
+        try:
+            with open(file_name, "rb") as wave_file:
+                header = wave_file.read(_HEADER.size)
+            magic, sample_rate, bucket_frames, level_count, frames, onset_count = _HEADER.unpack(header)
+            if magic != WAVEFORM_MAGIC or not sample_rate or not bucket_frames:
+                raise ValueError("not a waveform file")
+
+            offset = _HEADER.size
+            onsets = np.memmap(file_name, dtype="<u4", mode="r", offset=offset, shape=(onset_count,)) if onset_count \
+                else np.zeros(0, dtype=np.uint32)
+            offset += 4 * onset_count
+            levels = []
+            buckets = max(1, -(-frames // bucket_frames))
+            for _ in range(level_count):
+                levels.append(np.memmap(file_name, dtype=np.int8, mode="r", offset=offset, shape=(buckets, 2)))
+                offset += 2 * buckets
+                buckets = -(-buckets // LEVEL_FACTOR)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Waveform: Could not read {file_name}: {e}")
+            return None
+        return cls(sample_rate, bucket_frames, frames, onsets, levels)
+
+    def duration_ms(self) -> int:
+        return self.frames * 1000 // self.sample_rate
+
+    # Minimum and maximum, in [-1, 1], of each of columns equal slices of start_ms to end_ms
+    def envelope(self, start_ms: int, end_ms: int, columns: int):
+        frames_per_column = max(1.0, (end_ms - start_ms) * self.sample_rate / 1000.0 / max(1, columns))
+        # The coarsest level that still has a bucket for every column
+        level = 0
+        while (level + 1 < len(self._levels) and
+               self.bucket_frames * LEVEL_FACTOR ** (level + 1) <= frames_per_column):
+            level += 1
+        pairs = self._levels[level]
+        bucket_ms = self.bucket_frames * LEVEL_FACTOR ** level * 1000.0 / self.sample_rate
+
+        edges = np.linspace(start_ms / bucket_ms, end_ms / bucket_ms, columns + 1)
+        starts = np.clip(edges[:-1].astype(np.int64), 0, len(pairs) - 1)
+        mins = np.minimum.reduceat(pairs[:, 0], starts).astype(np.float32) / 127.0
+        maxs = np.maximum.reduceat(pairs[:, 1], starts).astype(np.float32) / 127.0
+        # reduceat runs each slice to the next start, so the last one would reach the end of the track
+        last = min(len(pairs), max(int(math.ceil(edges[-1])), starts[-1] + 1))
+        mins[-1] = pairs[starts[-1]:last, 0].min() / 127.0
+        maxs[-1] = pairs[starts[-1]:last, 1].max() / 127.0
+        return mins, maxs
+
+    # The onset nearest to position_ms when one is within within_ms, otherwise position_ms
+    def snap(self, position_ms: int, within_ms: int) -> int:
+        if not len(self.onsets) or within_ms <= 0:
+            return position_ms
+        index = int(np.searchsorted(self.onsets, position_ms))
+        nearest = min((int(self.onsets[i]) for i in (index - 1, index) if 0 <= i < len(self.onsets)),
+                      key=lambda onset: abs(onset - position_ms))
+        return nearest if abs(nearest - position_ms) <= within_ms else position_ms
+
+# Overview of the playing track under the mini player. Clicking seeks, snapping to a nearby onset.
+class WaveformView(QWidget):
+    seekRequested = Signal(int) # Position in ms
+
+    SNAP_PIXELS = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.setMinimumHeight(36)
+        self.setCursor(Qt.CursorShape.PointingHandCursor)
+        self._summary = None
+        self._duration_ms = 0
+        self._position_ms = 0
+        self._lines = None # Cached (width, height, lines) of the envelope
+
+    def sizeHint(self) -> QSize:
+        return QSize(200, 40)
+
+    def set_waveform(self, summary: WaveformSummary | None, duration_ms: int = 0):
+        self._summary = summary
+        self._duration_ms = duration_ms or (summary.duration_ms() if summary else 0)
+        self._position_ms = 0
+        self._lines = None
+        self.update()
+
+    def set_position(self, position_ms: int):
+        if self._summary is None or not self._duration_ms:
+            return
+        # Repaint only when the play head moves by a pixel
+        old_x = self._x_for(self._position_ms)
+        self._position_ms = position_ms
+        if self._x_for(position_ms) != old_x:
+            self.update()
+
+    def _x_for(self, position_ms: int) -> int:
+        return int(position_ms * self.width() / self._duration_ms) if self._duration_ms else 0
+
+    def resizeEvent(self, event):
+        self._lines = None
+        super().resizeEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        palette = self.palette()
+        painter.fillRect(self.rect(), palette.color(QPalette.ColorRole.Base))
+        if self._summary is None or not self._duration_ms or self.width() < 2:
+            return
+
+        width, height = self.width(), self.height()
+        if self._lines is None or self._lines[:2] != (width, height):
+            mins, maxs = self._summary.envelope(0, self._duration_ms, width)
+            middle = height / 2.0
+            self._lines = (width, height, [QLineF(x, middle - top * middle, x, middle - bottom * middle)
+                                           for x, (bottom, top) in enumerate(zip(mins.tolist(), maxs.tolist()))])
+        lines = self._lines[2]
+
+        played = min(len(lines), max(0, self._x_for(self._position_ms)))
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.Highlight), 1))
+        painter.drawLines(lines[:played])
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.Mid), 1))
+        painter.drawLines(lines[played:])
+
+        # Onset ticks along the bottom edge
+        painter.setPen(QPen(palette.color(QPalette.ColorRole.Text), 1))
+        scale = width / self._duration_ms
+        painter.drawLines([QLineF(onset * scale, height - 4, onset * scale, height)
+                           for onset in self._summary.onsets.tolist()])
+
+    def mousePressEvent(self, event):
+        if self._summary is None or not self._duration_ms or event.button() != Qt.MouseButton.LeftButton:
+            super().mousePressEvent(event)
+            return
+        ms_per_pixel = self._duration_ms / max(1, self.width())
+        position_ms = int(event.position().x() * ms_per_pixel)
+        self.seekRequested.emit(self._summary.snap(position_ms, int(self.SNAP_PIXELS * ms_per_pixel)))